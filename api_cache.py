@@ -0,0 +1,120 @@
+# api_cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Hashable, Iterable
+
+
+class ResponseCache:
+    """
+    Caché en memoria para respuestas del API.
+    Cada entrada tiene su propio TTL y etiquetas para invalidación explícita.
+    Se expulsan las entradas menos usadas (LRU) al superar el número máximo
+    de entradas o de bytes.
+    Las entradas expiradas se conservan (hasta ser expulsadas) junto con sus
+    validadores ETag/Last-Modified para poder revalidarlas con peticiones condicionales.
+    Es segura para usar desde varios hilos.
+    """
+
+    def __init__(self, max_entries: int = 256, max_bytes: int = 16 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable):
+        """Devuelve el dato si la entrada existe y no ha expirado, si no None"""
+        with self._lock:
+            entrada = self._entradas.get(key)
+            if entrada is None or entrada["expira"] <= time.monotonic():
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(key)
+            self.hits += 1
+            return entrada["data"]
+
+    def get_stale(self, key: Hashable):
+        """
+        Devuelve la entrada completa aunque haya expirado (para revalidar o
+        mostrar el último dato conocido), o None
+        """
+        with self._lock:
+            entrada = self._entradas.get(key)
+            if entrada is not None:
+                self._entradas.move_to_end(key)
+            return entrada
+
+    def set(
+        self,
+        key: Hashable,
+        data,
+        size: int,
+        ttl: float,
+        tags: Iterable[str] = (),
+        etag: str = None,
+        last_modified: str = None
+        ):
+        """Guarda un dato con su tamaño en bytes, TTL en segundos, etiquetas y validadores"""
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._quitar(key)
+            self._entradas[key] = {
+                "data": data,
+                "size": size,
+                "expira": time.monotonic() + ttl,
+                "guardado": time.monotonic(),
+                "tags": set(tags),
+                "etag": etag,
+                "last_modified": last_modified,
+            }
+            self._bytes += size
+            while self._entradas and (len(self._entradas) > self.max_entries or self._bytes > self.max_bytes):
+                _, expulsada = self._entradas.popitem(last=False)
+                self._bytes -= expulsada["size"]
+                self.evictions += 1
+
+    def refresh(self, key: Hashable, ttl: float):
+        """Renueva el TTL de una entrada tras una revalidación (304)"""
+        with self._lock:
+            entrada = self._entradas.get(key)
+            if entrada is not None:
+                entrada["expira"] = time.monotonic() + ttl
+                entrada["guardado"] = time.monotonic()
+
+    def _quitar(self, key: Hashable):
+        entrada = self._entradas.pop(key, None)
+        if entrada is not None:
+            self._bytes -= entrada["size"]
+
+    def invalidate(self, key: Hashable):
+        """Elimina una entrada concreta"""
+        with self._lock:
+            self._quitar(key)
+
+    def invalidate_tags(self, *tags: str):
+        """Elimina todas las entradas que tengan alguna de las etiquetas indicadas"""
+        tags = set(tags)
+        with self._lock:
+            for key in [k for k, e in self._entradas.items() if e["tags"] & tags]:
+                self._quitar(key)
+
+    def clear(self):
+        with self._lock:
+            self._entradas.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict:
+        """Contadores de aciertos, fallos y ocupación actual"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entradas": len(self._entradas),
+                "bytes": self._bytes,
+            }
@@ -1,21 +1,189 @@
 # api_client.py
-import requests
+import asyncio
+import base64
+import hashlib
+import json
 from typing import List, Dict
 import os
+import random
+import socket
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
 from dotenv import load_dotenv
-import jwt
-from datetime import datetime
+from datetime import datetime, timezone
+from api_cache import ResponseCache
+from multipart_stream import MultipartStreamEncoder, detectar_content_type
+from upload_index import UploadIndex
+
+# requests y jwt se cargan con _cargar_http() al crear la sesión HTTP, no al importar el módulo
+requests = None
+jwt = None
+_http_lock = threading.Lock()
 
 load_dotenv()
 API_URL = os.getenv("API_URL", "http://localhost:8000")
 
+# Timeouts en segundos (conexión, lectura) por tipo de endpoint
+API_CONNECT_TIMEOUT = float(os.getenv("API_CONNECT_TIMEOUT", "5"))
+API_TIMEOUTS = {
+    "auth": (API_CONNECT_TIMEOUT, float(os.getenv("API_AUTH_READ_TIMEOUT", "10"))),
+    "listado": (API_CONNECT_TIMEOUT, float(os.getenv("API_LIST_READ_TIMEOUT", "20"))),
+    "subida": (API_CONNECT_TIMEOUT, float(os.getenv("API_UPLOAD_READ_TIMEOUT", "120"))),
+}
+
+# Pool de conexiones y keep-alive
+API_POOL_CONNECTIONS = int(os.getenv("API_POOL_CONNECTIONS", "4"))
+API_POOL_MAXSIZE = int(os.getenv("API_POOL_MAXSIZE", "10"))
+API_KEEPALIVE = os.getenv("API_KEEPALIVE", "1") != "0"
+API_KEEPALIVE_IDLE = int(os.getenv("API_KEEPALIVE_IDLE", "60"))
+
+# Reintentos (GET y POST con clave de idempotencia): intentos totales, backoff exponencial con jitter
+# y presupuesto máximo de tiempo en segundos para todos los intentos
+API_RETRY_MAX_ATTEMPTS = int(os.getenv("API_RETRY_MAX_ATTEMPTS", "3"))
+API_RETRY_BACKOFF_BASE = float(os.getenv("API_RETRY_BACKOFF_BASE", "0.5"))
+API_RETRY_BACKOFF_MAX = float(os.getenv("API_RETRY_BACKOFF_MAX", "8"))
+API_RETRY_BUDGET = float(os.getenv("API_RETRY_BUDGET", "30"))
+API_RETRY_STATUS = {429, 502, 503, 504}
+
+# Caché de respuestas: TTL en segundos por endpoint y límites de tamaño
+API_CACHE_TTL = {
+    "perfil": float(os.getenv("API_CACHE_TTL_PERFIL", "300")),
+    "paciente": float(os.getenv("API_CACHE_TTL_PACIENTE", "120")),
+    "citas": float(os.getenv("API_CACHE_TTL_CITAS", "30")),
+    "historial": float(os.getenv("API_CACHE_TTL_HISTORIAL", "60")),
+}
+API_CACHE_MAX_ENTRIES = int(os.getenv("API_CACHE_MAX_ENTRIES", "256"))
+API_CACHE_MAX_BYTES = int(os.getenv("API_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+# Precarga tras el login: peticiones simultáneas como máximo
+API_PREFETCH_CONCURRENCY = int(os.getenv("API_PREFETCH_CONCURRENCY", "2"))
+
+# Funciones opcionales que el backend puede anunciar en /Medico/capacidades
+API_CAPACIDADES = ("dedup_imagenes", "uploads_reanudables", "atencion_stream", "pacientes_batch", "historial_paginado")
+
+# Información de varios pacientes: ids por petición al endpoint por lotes y
+# peticiones individuales simultáneas cuando el backend no lo tiene
+API_PACIENTES_BATCH_MAX = int(os.getenv("API_PACIENTES_BATCH_MAX", "50"))
+API_PACIENTES_CONCURRENCY = int(os.getenv("API_PACIENTES_CONCURRENCY", "4"))
+
+# Subidas reanudables: tamaño de bloque, intentos seguidos sin avanzar y
+# presupuesto de tiempo en segundos para reconectar antes de rendirse
+API_UPLOAD_CHUNK = int(os.getenv("API_UPLOAD_CHUNK", str(1024 * 1024)))
+API_UPLOAD_MAX_ATTEMPTS = int(os.getenv("API_UPLOAD_MAX_ATTEMPTS", "8"))
+API_UPLOAD_RESUME_BUDGET = float(os.getenv("API_UPLOAD_RESUME_BUDGET", "300"))
+
+# Índice local de hashes de imágenes ya aceptadas por el backend
+API_UPLOAD_INDEX = os.getenv(
+    "API_UPLOAD_INDEX",
+    os.path.join(os.path.expanduser("~"), ".medico_interfaz", "imagenes_subidas.json")
+)
+
+
+def _cargar_http():
+    """
+    Importa requests y jwt la primera vez que se necesitan.
+    Tardan decenas de ms en cargarse; así no retrasan la pantalla de login.
+    """
+    global requests, jwt
+    with _http_lock:
+        if requests is None:
+            import jwt as _jwt
+            import requests as _requests
+            jwt = _jwt
+            requests = _requests
+
+
+def _keepalive_adapter():
+    """
+    HTTPAdapter que activa TCP keep-alive en los sockets del pool para
+    detectar conexiones muertas en lugar de quedar colgado esperando.
+    """
+    from requests.adapters import HTTPAdapter
+    from urllib3.connection import HTTPConnection
+
+    class KeepAliveAdapter(HTTPAdapter):
+        def init_poolmanager(self, *args, **kwargs):
+            if API_KEEPALIVE:
+                opciones = list(HTTPConnection.default_socket_options)
+                opciones.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+                if hasattr(socket, "TCP_KEEPIDLE"):
+                    opciones.append((socket.IPPROTO_TCP, socket.TCP_KEEPIDLE, API_KEEPALIVE_IDLE))
+                if hasattr(socket, "TCP_KEEPINTVL"):
+                    opciones.append((socket.IPPROTO_TCP, socket.TCP_KEEPINTVL, 10))
+                if hasattr(socket, "TCP_KEEPCNT"):
+                    opciones.append((socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3))
+                kwargs["socket_options"] = opciones
+            super().init_poolmanager(*args, **kwargs)
+
+    return KeepAliveAdapter(pool_connections=API_POOL_CONNECTIONS, pool_maxsize=API_POOL_MAXSIZE)
+
+
 class APIClient:
     def __init__(self):
-        self.session = requests.Session()
+        # La sesión HTTP se crea en el primer uso (o antes, en segundo plano, con precalentar())
+        self._session = None
+        self._session_lock = threading.Lock()
         self.token = None
         self.user_id = None
         self.rol_id = None
 
+        self.cache = ResponseCache(API_CACHE_MAX_ENTRIES, API_CACHE_MAX_BYTES)
+        self._sesion = 0  # cambia en cada login/logout; las respuestas de una sesión anterior no se guardan
+        self._capacidades = None
+        self.upload_index = UploadIndex(API_UPLOAD_INDEX, API_URL)
+        self._uploads = {}  # sha256 -> upload_id de las subidas reanudables en curso
+        self._pacientes_lock = threading.Lock()
+        self._pacientes_en_vuelo = {}  # paciente_id -> Future con su información
+        self._vuelos_lock = threading.Lock()
+        self._vuelos = {}  # (método, URL, parámetros, Authorization) -> GET en curso
+
+        # Contadores para métricas (se actualizan desde varios hilos)
+        self._metrics_lock = threading.Lock()
+        self.metrics = {
+            "reintentos": 0,
+            "reintentos_agotados": 0,
+            "respuestas_304": 0,
+            "bytes_ahorrados_304": 0,
+            "imagenes_deduplicadas": 0,
+            "bytes_ahorrados_dedup": 0,
+            "bloques_reenviados": 0,
+            "subidas_reanudadas": 0,
+            "respuestas_repetidas": 0,
+            "llamadas_compartidas": 0,
+        }
+
+    @property
+    def session(self):
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    _cargar_http()
+                    session = requests.Session()
+                    adapter = _keepalive_adapter()
+                    session.mount("http://", adapter)
+                    session.mount("https://", adapter)
+                    if not API_KEEPALIVE:
+                        session.headers["Connection"] = "close"
+                    self._session = session
+        return self._session
+
+    def precalentar(self):
+        """Carga requests/jwt y crea la sesión HTTP; pensado para un hilo tras pintar el login"""
+        inicio = time.perf_counter()
+        self.session
+        print(f"[API] Cliente HTTP listo en {time.perf_counter() - inicio:.3f}s")
+
+    def _contar(self, nombre: str, cantidad: int = 1):
+        with self._metrics_lock:
+            self.metrics[nombre] = self.metrics.get(nombre, 0) + cantidad
+
+    def get_metrics(self) -> Dict:
+        """Devuelve una copia de los contadores del cliente"""
+        with self._metrics_lock:
+            return dict(self.metrics)
+
     def _decode_token(self, token: str) -> Dict:
         """
         Decodifica el JWT sin verificar la firma (solo lectura)
@@ -36,9 +204,12 @@ class APIClient:
             print(f"[DEBUG DECODE] Error decodificando token: {e}")
             return {"error": f"Error al decodificar: {str(e)}"}
 
-    def _handle_response(self, response: requests.Response) -> Dict:
+    def _handle_response(self, response: "requests.Response", cached=None) -> Dict:
         if response.status_code == 200:
             return response.json()
+        elif response.status_code == 304 and cached is not None:
+            # No modificado: el cuerpo guardado sigue siendo válido
+            return cached
         elif response.status_code == 401:
             self.token = None
             self.session.headers.pop("Authorization", None)
@@ -58,7 +229,7 @@ class APIClient:
             response = self.session.post(f"{API_URL}/Usuario/login", json={
                 "nombre_usuario": username,
                 "contrasena": password
-            })
+            }, timeout=API_TIMEOUTS["auth"])
             
             if response.status_code == 200:
                 data = response.json()
@@ -89,6 +260,9 @@ class APIClient:
                     }
                 
                 # ✅ TODO OK: Guardar token y configurar sesión
+                self.cache.clear()
+                self._sesion += 1
+                self._capacidades = None
                 self.token = token
                 self.session.headers.update({"Authorization": f"Bearer {self.token}"})
                 
@@ -102,6 +276,13 @@ class APIClient:
                 "message": "Credenciales inválidas"
             }
             
+        except requests.Timeout:
+            print("[API] Timeout en login")
+            self._clear_session()
+            return {
+                "success": False,
+                "message": "El servidor no respondió a tiempo"
+            }
         except Exception as e:
             print(f"[API] Error login: {e}")
             self._clear_session()
@@ -116,72 +297,887 @@ class APIClient:
         self.user_id = None
         self.rol_id = None
         self.session.headers.pop("Authorization", None)
+        self.cache.clear()
+        self._sesion += 1
+
+    def logout(self):
+        """Cierra la sesión: olvida el token y todo lo guardado en caché"""
+        print(f"[API] Cierre de sesión del usuario {self.user_id}")
+        self._clear_session()
+        self._capacidades = None
+
+    def invalidar_cache(self, *tags: str):
+        """
+        Invalida las respuestas en caché con las etiquetas indicadas
+        ("perfil", "citas", "historial", "paciente:<id>"). Sin etiquetas vacía todo.
+        """
+        if tags:
+            self.cache.invalidate_tags(*tags)
+        else:
+            self.cache.clear()
+
+    def get_cache_stats(self) -> Dict:
+        return self.cache.stats()
+
+    def _cache_key(self, path: str, params: Dict = None):
+        return (path, tuple(sorted((params or {}).items())))
+
+    def _retry_after(self, response: "requests.Response"):
+        """Segundos indicados en la cabecera Retry-After (número o fecha HTTP), o None"""
+        valor = response.headers.get("Retry-After")
+        if not valor:
+            return None
+        try:
+            return max(0.0, float(valor))
+        except ValueError:
+            pass
+        try:
+            fecha = parsedate_to_datetime(valor)
+            return max(0.0, (fecha - datetime.now(timezone.utc)).total_seconds())
+        except (TypeError, ValueError):
+            return None
+
+    def _backoff(self, intento: int) -> float:
+        """Backoff exponencial con jitter completo"""
+        tope = min(API_RETRY_BACKOFF_MAX, API_RETRY_BACKOFF_BASE * (2 ** (intento - 1)))
+        return random.uniform(0, tope)
+
+    def _get(self, path: str, params: Dict = None, tipo: str = "listado", cache: str = None, tags=()) -> Dict:
+        """
+        GET compartido: si ya hay uno igual en curso (mismo método, URL, parámetros
+        y token) se espera su resultado o su error en lugar de repetir la petición.
+        Ver _hacer_get para reintentos y caché.
+        """
+        clave = ("GET", f"{API_URL}{path}", tuple(sorted((params or {}).items())),
+                 self.session.headers.get("Authorization"))
+        with self._vuelos_lock:
+            vuelo = self._vuelos.get(clave)
+            propio = vuelo is None
+            if propio:
+                vuelo = self._vuelos[clave] = {"listo": threading.Event(), "resultado": None, "error": None}
+        if not propio:
+            self._contar("llamadas_compartidas")
+            vuelo["listo"].wait()
+            if vuelo["error"] is not None:
+                raise vuelo["error"]
+            return vuelo["resultado"]
+
+        try:
+            vuelo["resultado"] = self._hacer_get(path, params, tipo, cache, tags)
+            return vuelo["resultado"]
+        except Exception as e:
+            vuelo["error"] = e
+            raise
+        finally:
+            with self._vuelos_lock:
+                self._vuelos.pop(clave, None)
+            vuelo["listo"].set()
+
+    def _hacer_get(self, path: str, params: Dict = None, tipo: str = "listado", cache: str = None, tags=()) -> Dict:
+        """
+        GET con el timeout del tipo de endpoint indicado.
+        Reintenta ante 429/502/503/504, timeouts y conexiones caídas con backoff
+        exponencial, respetando Retry-After y el presupuesto total de tiempo.
+        Solo se usa para GET idempotentes; los POST nunca pasan por aquí.
+        Si se indica `cache` (clave de API_CACHE_TTL) las respuestas correctas se
+        guardan en caché con ese TTL y las etiquetas dadas. Al expirar, la entrada
+        se revalida con If-None-Match/If-Modified-Since y un 304 reutiliza el cuerpo guardado.
+        Los errores de red se devuelven como {"error": ...} igual que _handle_response.
+        Una respuesta que llega después de un login/logout no se guarda en caché.
+        """
+        sesion = self._sesion
+        key = None
+        stale = None
+        headers = {}
+        if cache:
+            key = self._cache_key(path, params)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+            stale = self.cache.get_stale(key)
+            if stale is not None:
+                if stale["etag"]:
+                    headers["If-None-Match"] = stale["etag"]
+                if stale["last_modified"]:
+                    headers["If-Modified-Since"] = stale["last_modified"]
+                if not headers:
+                    stale = None
+
+        inicio = time.monotonic()
+        intento = 0
+        while True:
+            intento += 1
+            response = None
+            error = None
+            espera = None
+            try:
+                response = self.session.get(
+                    f"{API_URL}{path}",
+                    params=params,
+                    headers=headers,
+                    timeout=API_TIMEOUTS[tipo]
+                )
+            except requests.Timeout:
+                print(f"[API] Timeout en GET {path} (intento {intento})")
+                error = {"error": "El servidor no respondió a tiempo. Intente nuevamente."}
+            except requests.ConnectionError as e:
+                print(f"[API] Error de conexión en GET {path} (intento {intento}): {e}")
+                error = {"error": "No se pudo conectar con el servidor."}
+
+            if response is not None:
+                if response.status_code == 304 and stale is not None:
+                    self.cache.refresh(key, API_CACHE_TTL[cache])
+                    self._contar("respuestas_304")
+                    self._contar("bytes_ahorrados_304", stale["size"])
+                    return self._handle_response(response, cached=stale["data"])
+                if response.status_code not in API_RETRY_STATUS:
+                    data = self._handle_response(response)
+                    if key is not None and "error" not in data and sesion == self._sesion:
+                        self.cache.set(
+                            key,
+                            data,
+                            len(response.content),
+                            API_CACHE_TTL[cache],
+                            (cache, *tags),
+                            etag=response.headers.get("ETag"),
+                            last_modified=response.headers.get("Last-Modified")
+                        )
+                    return data
+                espera = self._retry_after(response)
+
+            if intento >= API_RETRY_MAX_ATTEMPTS:
+                break
+            if espera is None:
+                espera = self._backoff(intento)
+            if time.monotonic() - inicio + espera > API_RETRY_BUDGET:
+                break
+
+            self._contar("reintentos")
+            print(f"[API] Reintentando GET {path} en {espera:.2f}s")
+            time.sleep(espera)
+
+        self._contar("reintentos_agotados")
+        return error if response is None else self._handle_response(response)
 
     def get_profile(self) -> Dict:
-        response = self.session.get(f"{API_URL}/Usuario/perfil")
-        return self._handle_response(response)
+        return self._get("/Usuario/perfil", tipo="auth", cache="perfil")
 
     def get_citas_aprobadas(self) -> List[Dict]:
-        response = self.session.get(f"{API_URL}/Medico/citas/aprobadas")
-        data = self._handle_response(response)
-        return data.get("citas_aprobadas", []) if "error" not in data else []
+        citas = self.revalidar_citas_aprobadas()
+        return citas if citas is not None else []
+
+    def revalidar_citas_aprobadas(self):
+        """Igual que get_citas_aprobadas pero retorna None si la petición falló, para no confundirlo con una lista vacía"""
+        data = self._get("/Medico/citas/aprobadas", cache="citas")
+        return data.get("citas_aprobadas", []) if "error" not in data else None
+
+    def peek_citas_aprobadas(self):
+        """
+        Último listado de citas conocido sin tocar la red, aunque haya expirado.
+        Retorna (citas, antigüedad en segundos) o (None, None) si nunca se cargó
+        """
+        entrada = self.cache.get_stale(self._cache_key("/Medico/citas/aprobadas"))
+        if entrada is None:
+            return None, None
+        return entrada["data"].get("citas_aprobadas", []), time.monotonic() - entrada["guardado"]
 
-    def get_historial_medico(self, nombre: str = None, identificacion: str = None) -> List[Dict]:
+    def get_historial_medico(
+        self,
+        nombre: str = None,
+        identificacion: str = None,
+        page: int = None,
+        limit: int = None,
+        cursor: str = None
+        ):
+        """
+        Historial médico del doctor.
+        Sin `limit` ni `cursor` retorna la lista completa (List[Dict]).
+        Con paginación retorna un diccionario de página:
+        {"items", "page", "limit", "total", "next_cursor", "has_more"}
+        """
         params = {}
         if nombre:
             params["nombre"] = nombre
         if identificacion:
             params["identificacion"] = identificacion
-        response = self.session.get(f"{API_URL}/Medico/historial", params=params)
-        data = self._handle_response(response)
-        return data.get("historial", []) if "error" not in data else []
+
+        paginado = limit is not None or cursor is not None
+        if paginado:
+            if cursor is not None:
+                params["cursor"] = cursor
+            else:
+                params["page"] = page or 1
+            if limit is not None:
+                params["limit"] = limit
+
+        data = self._get("/Medico/historial", params=params, cache="historial")
+        items = data.get("historial", []) if "error" not in data else []
+        if not paginado:
+            return items
+        return self._pagina_historial(data, items, page or 1, limit)
+
+    def _pagina_historial(self, data: Dict, items: List[Dict], page: int, limit: int) -> Dict:
+        """Normaliza la respuesta paginada (o no) del backend a un diccionario de página"""
+        pagina = {
+            "items": items,
+            "page": data.get("page", page),
+            "limit": data.get("limit", limit),
+            "total": data.get("total"),
+            "next_cursor": data.get("next_cursor"),
+            "has_more": False,
+        }
+        if "error" in data:
+            pagina["error"] = data["error"]
+        elif "has_more" in data:
+            pagina["has_more"] = bool(data["has_more"])
+        elif pagina["next_cursor"] is not None:
+            pagina["has_more"] = True
+        elif pagina["total"] is not None:
+            pagina["has_more"] = pagina["page"] * (pagina["limit"] or len(items)) < pagina["total"]
+        elif limit is not None and ("page" in data or "limit" in data or self.get_capacidades()["historial_paginado"]):
+            # Pagina pero sin total ni cursor: una página llena puede tener otra detrás
+            pagina["has_more"] = len(items) == limit
+        # Sin indicios de paginación el backend ignoró page/limit y devolvió todo
+        return pagina
 
     def get_paciente_info(self, paciente_id: int) -> Dict:
-        response = self.session.get(f"{API_URL}/Medico/paciente/{paciente_id}")
-        data = self._handle_response(response)
+        data = self._get(f"/Medico/paciente/{paciente_id}", cache="paciente", tags=(f"paciente:{paciente_id}",))
         return data if "error" not in data else {}
 
+    def _guardar_paciente(self, paciente_id, info: Dict, sesion: int):
+        """Guarda en caché la información de un paciente como si viniera de /Medico/paciente/{id}"""
+        if not info or sesion != self._sesion:
+            return
+        self.cache.set(
+            self._cache_key(f"/Medico/paciente/{paciente_id}"),
+            info,
+            len(json.dumps(info, default=str)),
+            API_CACHE_TTL["paciente"],
+            ("paciente", f"paciente:{paciente_id}")
+        )
+
+    def _pedir_pacientes_lote(self, ids: List) -> Dict:
+        """
+        GET /Medico/pacientes?ids=1,2,3 -> {"pacientes": {"<id>": {...}}}
+        Retorna {paciente_id: info}; los ids que falten en la respuesta quedan con {}.
+        """
+        sesion = self._sesion
+        encontrados = {}
+        for i in range(0, len(ids), API_PACIENTES_BATCH_MAX):
+            parte = ids[i:i + API_PACIENTES_BATCH_MAX]
+            data = self._get("/Medico/pacientes", params={"ids": ",".join(str(p) for p in parte)})
+            if "error" in data:
+                raise RuntimeError(data["error"])
+            pacientes = {str(k): v for k, v in data.get("pacientes", {}).items()}
+            for paciente_id in parte:
+                info = pacientes.get(str(paciente_id)) or {}
+                self._guardar_paciente(paciente_id, info, sesion)
+                encontrados[paciente_id] = info
+        return encontrados
+
+    def _pedir_pacientes_individual(self, ids: List) -> Dict:
+        """Una petición por paciente, como máximo API_PACIENTES_CONCURRENCY a la vez"""
+        with ThreadPoolExecutor(max_workers=max(1, min(API_PACIENTES_CONCURRENCY, len(ids)))) as pool:
+            return dict(zip(ids, pool.map(self.get_paciente_info, ids)))
+
+    def get_pacientes_info(self, ids: List) -> Dict:
+        """
+        Información de varios pacientes: {paciente_id: info} ({} si no se encontró).
+        Los que están en caché no se piden. El resto se pide en una sola petición
+        si el backend anuncia "pacientes_batch" y, si no (o si el lote falla),
+        con peticiones individuales en paralelo.
+        Un id que otra llamada ya está pidiendo no se vuelve a pedir: se espera su resultado.
+        """
+        resultado = {}
+        propios = {}
+        ajenos = {}
+        with self._pacientes_lock:
+            for paciente_id in dict.fromkeys(i for i in ids if i is not None):
+                cached = self.cache.get(self._cache_key(f"/Medico/paciente/{paciente_id}"))
+                if cached is not None:
+                    resultado[paciente_id] = cached
+                elif paciente_id in self._pacientes_en_vuelo:
+                    ajenos[paciente_id] = self._pacientes_en_vuelo[paciente_id]
+                else:
+                    propios[paciente_id] = self._pacientes_en_vuelo[paciente_id] = Future()
+
+        if propios:
+            pendientes = list(propios)
+            encontrados = {}
+            try:
+                if self.get_capacidades().get("pacientes_batch"):
+                    try:
+                        encontrados = self._pedir_pacientes_lote(pendientes)
+                    except Exception as e:
+                        print(f"[API] Falló la consulta por lotes de pacientes, se piden uno a uno: {e}")
+                if not encontrados:
+                    encontrados = self._pedir_pacientes_individual(pendientes)
+                print(f"[API] Información de {len(pendientes)} pacientes obtenida")
+            finally:
+                with self._pacientes_lock:
+                    for paciente_id, futuro in propios.items():
+                        self._pacientes_en_vuelo.pop(paciente_id, None)
+                        futuro.set_result(encontrados.get(paciente_id, {}))
+            resultado.update(encontrados)
+
+        for paciente_id, futuro in ajenos.items():
+            resultado[paciente_id] = futuro.result()
+        return {p: resultado[p] for p in dict.fromkeys(ids) if p in resultado}
+
+    def peek_paciente_info(self, paciente_id: int):
+        """
+        Información del paciente guardada en caché sin tocar la red, aunque haya expirado.
+        Retorna (info, antigüedad en segundos) o (None, None) si no se ha pedido
+        """
+        entrada = self.cache.get_stale(self._cache_key(f"/Medico/paciente/{paciente_id}"))
+        if entrada is None:
+            return None, None
+        return entrada["data"], time.monotonic() - entrada["guardado"]
+
+    def get_capacidades(self) -> Dict:
+        """
+        Funciones opcionales que anuncia el backend en /Medico/capacidades.
+        Si el endpoint no existe (backend antiguo) todas quedan desactivadas.
+        La respuesta se recuerda hasta el próximo login; los errores de red no.
+        """
+        if self._capacidades is not None:
+            return self._capacidades
+        capacidades = {c: False for c in API_CAPACIDADES}
+        try:
+            response = self.session.get(f"{API_URL}/Medico/capacidades", timeout=API_TIMEOUTS["auth"])
+        except requests.RequestException as e:
+            print(f"[API] No se pudieron consultar las capacidades del backend: {e}")
+            return capacidades
+        if response.status_code == 200:
+            data = response.json()
+            capacidades = {c: bool(data.get(c)) for c in API_CAPACIDADES}
+        elif response.status_code not in (404, 405, 501):
+            return capacidades
+        print(f"[API] Capacidades del backend: {capacidades}")
+        self._capacidades = capacidades
+        return capacidades
+
+    def _offset_upload(self, upload_id: str):
+        """Bytes que el backend ya tiene de una subida, o None si la sesión ya no existe"""
+        response = self.session.get(f"{API_URL}/Medico/uploads/{upload_id}", timeout=API_TIMEOUTS["listado"])
+        if response.status_code == 404:
+            return None
+        if response.status_code != 200:
+            raise requests.ConnectionError(f"Error {response.status_code} al consultar la subida")
+        return int(response.json().get("offset", 0))
+
+    def _es_reintentable(self, response: "requests.Response") -> bool:
+        """
+        Errores del envío de una atención que se pueden reintentar: sesión expirada,
+        429, 5xx o un 409 de una clave que el backend todavía está procesando
+        """
+        return response.status_code >= 500 or response.status_code in (401, 429) or self._en_proceso(response)
+
+    def _en_proceso(self, response: "requests.Response") -> bool:
+        """True si es un 409 sin "faltantes": el backend sigue procesando la misma clave"""
+        if response.status_code != 409:
+            return False
+        try:
+            return "faltantes" not in response.json()
+        except (ValueError, TypeError):
+            return True
+
+    def _error_envio(self, response: "requests.Response") -> Dict:
+        """{"error": ...} de una respuesta fallida, marcado "reintentable" según _es_reintentable"""
+        result = self._handle_response(response)
+        if "error" in result and self._es_reintentable(response):
+            result["reintentable"] = True
+        return result
+
+    def _subir_reanudable(self, img, sha256: str, avance=None) -> Dict:
+        """
+        Sube un archivo por bloques de API_UPLOAD_CHUNK a /Medico/uploads.
+        Cada bloque lleva su offset y su SHA-256 (Upload-Checksum); si la conexión
+        se cae se consulta el offset confirmado por el backend y se continúa desde ahí.
+        La sesión se recuerda por hash para reanudarla también en un nuevo intento.
+        avance(bytes_confirmados) se llama tras cada bloque aceptado.
+        Retorna {"upload_id": ...} o {"error": ...} (con "reintentable" si es un 401, 429 o 5xx)
+        """
+        total = os.path.getsize(img.path)
+        upload_id = self._uploads.get(sha256)
+        offset = None
+        inicio = time.monotonic()
+        intento = 0
+        with open(img.path, "rb") as f:
+            while True:
+                espera = None
+                try:
+                    if upload_id is not None and offset is None:
+                        offset = self._offset_upload(upload_id)
+                        if offset is None:
+                            upload_id = None
+                            self._uploads.pop(sha256, None)
+                        elif offset > 0:
+                            self._contar("subidas_reanudadas")
+                            print(f"[API] Reanudando subida de {img.name} desde {offset} bytes")
+                    if upload_id is None:
+                        response = self.session.post(
+                            f"{API_URL}/Medico/uploads",
+                            json={
+                                "nombre": img.name,
+                                "bytes": total,
+                                "sha256": sha256,
+                                "content_type": detectar_content_type(img.path, img.name),
+                            },
+                            timeout=API_TIMEOUTS["listado"]
+                        )
+                        if response.status_code not in (200, 201):
+                            return self._error_envio(response)
+                        creada = response.json()
+                        upload_id = creada["upload_id"]
+                        offset = int(creada.get("offset", 0))
+                        self._uploads[sha256] = upload_id
+
+                    if avance is not None:
+                        avance(offset)
+                    if offset >= total:
+                        return {"upload_id": upload_id}
+
+                    f.seek(offset)
+                    bloque = f.read(API_UPLOAD_CHUNK)
+                    checksum = base64.b64encode(hashlib.sha256(bloque).digest()).decode("ascii")
+                    response = self.session.patch(
+                        f"{API_URL}/Medico/uploads/{upload_id}",
+                        data=bloque,
+                        headers={
+                            "Content-Type": "application/offset+octet-stream",
+                            "Upload-Offset": str(offset),
+                            "Upload-Checksum": f"sha256 {checksum}",
+                        },
+                        timeout=API_TIMEOUTS["subida"]
+                    )
+                    if response.status_code in (200, 204):
+                        offset = int(response.headers.get("Upload-Offset", offset + len(bloque)))
+                        intento = 0
+                        continue
+                    if response.status_code in (404, 409):
+                        # Sesión expirada u offset desfasado: se vuelve a consultar
+                        offset = None
+                    elif response.status_code == 460:
+                        # El bloque llegó dañado: se reenvía
+                        self._contar("bloques_reenviados")
+                    elif response.status_code in API_RETRY_STATUS:
+                        espera = self._retry_after(response)
+                    else:
+                        return self._error_envio(response)
+                except (requests.Timeout, requests.ConnectionError) as e:
+                    print(f"[API] Conexión perdida subiendo {img.name}: {e}")
+                    offset = None
+
+                intento += 1
+                if espera is None:
+                    espera = self._backoff(intento)
+                if intento >= API_UPLOAD_MAX_ATTEMPTS or time.monotonic() - inicio + espera > API_UPLOAD_RESUME_BUDGET:
+                    return {
+                        "error": f"No se pudo subir {img.name}. Intente nuevamente para reanudar la subida.",
+                        "reintentable": True
+                    }
+                time.sleep(espera)
+
+    def _post_atencion(
+        self,
+        data: List,
+        imagenes: List,
+        hashes: List[str],
+        referencias: set,
+        uploads: Dict,
+        dedup: bool,
+        on_progress=None,
+        idempotency_key: str = None,
+        stream: bool = False
+        ):
+        """
+        Envía el formulario de la atención en streaming.
+        Con `dedup` o subidas reanudables se agrega `imagenes_sha256` (hashes de todas
+        las imágenes, en orden), un campo `imagenes_ref` por cada imagen en `referencias`
+        y un `imagenes_upload` por cada subida ya completada; esas imágenes no viajan como archivo.
+        Con `idempotency_key` el POST es seguro de repetir: se reintenta igual que los GET
+        (timeouts, conexiones caídas, 429/502/503/504 y 409 mientras el backend aún procesa
+        la misma clave) con la misma cabecera Idempotency-Key.
+        Con `stream` se piden los resultados como NDJSON y la respuesta no se descarga
+        de una vez (ver _leer_resultados_stream).
+        """
+        campos = list(data)
+        if dedup or uploads:
+            campos.append(("imagenes_sha256", json.dumps(hashes)))
+            campos.extend(("imagenes_ref", h) for h in hashes if h in referencias)
+            campos.extend(("imagenes_upload", uploads[h]) for h in hashes if h in uploads)
+        files = [
+            ("imagenes", img.name, img.path, detectar_content_type(img.path, img.name))
+            for img, h in zip(imagenes, hashes)
+            if h not in referencias and h not in uploads
+        ]
+
+        inicio = time.monotonic()
+        intento = 0
+        while True:
+            intento += 1
+            body = MultipartStreamEncoder(campos, files, on_progress=on_progress)
+            headers = {"Content-Type": body.content_type}
+            if idempotency_key:
+                headers["Idempotency-Key"] = idempotency_key
+            if stream:
+                headers["Accept"] = "application/x-ndjson, application/json"
+            response = None
+            try:
+                response = self.session.post(
+                    f"{API_URL}/Medico/atencion",
+                    data=body,
+                    headers=headers,
+                    timeout=API_TIMEOUTS["subida"],
+                    stream=stream
+                )
+            except (requests.Timeout, requests.ConnectionError) as e:
+                if not idempotency_key:
+                    raise
+                print(f"[API] Error de red en POST /Medico/atencion (intento {intento}): {e}")
+                error = e
+            finally:
+                body.close()
+
+            espera = None
+            if response is not None:
+                if response.headers.get("Idempotent-Replayed") == "true":
+                    self._contar("respuestas_repetidas")
+                if not idempotency_key or not self._en_proceso_o_reintentable(response):
+                    return response
+                espera = self._retry_after(response)
+
+            if espera is None:
+                espera = self._backoff(intento)
+            if intento >= API_RETRY_MAX_ATTEMPTS or time.monotonic() - inicio + espera > API_RETRY_BUDGET:
+                self._contar("reintentos_agotados")
+                if response is None:
+                    raise error
+                return response
+
+            if response is not None:
+                # Con stream=True la respuesta no leída retiene su conexión del pool
+                response.close()
+            self._contar("reintentos")
+            print(f"[API] Reintentando POST /Medico/atencion con la misma clave en {espera:.2f}s")
+            time.sleep(espera)
+
+    def _leer_resultados_stream(self, response: "requests.Response", on_result=None, total: int = 0) -> Dict:
+        """
+        Lee una respuesta NDJSON de /Medico/atencion a medida que llega:
+        una línea {"indice": i, "detecciones": [...]} por imagen, en el orden en
+        que el backend las termina, y una última línea {"fin": true, ...} con el
+        resto de la respuesta. on_result(indice, detecciones) se llama por cada imagen.
+        Retorna la respuesta completa con "detections" ordenadas por imagen (`total` imágenes).
+        Si el flujo termina sin la línea "fin" o trae una línea mal formada la atención
+        no se da por registrada: retorna {"error": ..., "reintentable": True} y el
+        reintento con la misma clave de idempotencia recupera la respuesta completa.
+        """
+        resultado = None
+        detecciones = {}
+        for linea in response.iter_lines(chunk_size=None):
+            if not linea:
+                continue
+            try:
+                evento = json.loads(linea)
+                if evento.get("fin"):
+                    resultado = {k: v for k, v in evento.items() if k != "fin"}
+                    continue
+                indice = int(evento["indice"])
+            except (ValueError, TypeError, KeyError, AttributeError):
+                print(f"[API] Línea inválida en los resultados: {linea[:200]!r}")
+                response.close()
+                return {"error": "El servidor envió resultados inválidos.", "reintentable": True}
+            detecciones[indice] = evento.get("detecciones", [])
+            if on_result is not None:
+                on_result(indice, detecciones[indice])
+        if resultado is None:
+            print(f"[API] Los resultados terminaron sin la línea final ({len(detecciones)} de {total} imágenes)")
+            return {"error": "Se perdió la conexión al recibir los resultados.", "reintentable": True}
+        if detecciones or (total and "detections" not in resultado):
+            resultado["detections"] = [detecciones.get(i, []) for i in range(max(total, max(detecciones, default=-1) + 1))]
+        return resultado
+
+    def _en_proceso_o_reintentable(self, response: "requests.Response") -> bool:
+        """
+        True si vale la pena repetir un POST idempotente: 429/502/503/504 o un 409
+        que no es de deduplicación (el backend sigue procesando la misma clave)
+        """
+        return response.status_code in API_RETRY_STATUS or self._en_proceso(response)
+
+    def _subir_pendientes(self, imagenes: List, hashes: List[str], referencias: set, on_progress=None, on_file_progress=None) -> Dict:
+        """
+        Sube de forma reanudable las imágenes que no van por referencia.
+        Retorna {"uploads": {sha256: upload_id}} o {"error": ...}
+        """
+        pendientes = [(i, img, h) for i, (img, h) in enumerate(zip(imagenes, hashes)) if h not in referencias]
+        tamanos = {i: os.path.getsize(img.path) for i, img, _ in pendientes}
+        total = sum(tamanos.values())
+        confirmados = dict.fromkeys(tamanos, 0)
+        uploads = {}
+        for i, img, h in pendientes:
+            if h in uploads:
+                continue
+
+            def avance(offset, i=i):
+                confirmados[i] = offset
+                if on_file_progress is not None:
+                    on_file_progress(i, offset, tamanos[i])
+                if on_progress is not None:
+                    on_progress(sum(confirmados.values()), total)
+
+            resultado = self._subir_reanudable(img, h, avance)
+            if "error" in resultado:
+                return resultado
+            uploads[h] = resultado["upload_id"]
+        return {"uploads": uploads}
+
     def registrar_atencion(
         self,
         cita_id: int,
         sistema: str,
         diagnostico: str,
         recomendaciones: str,
-        imagenes: List = []
+        imagenes: List = [],
+        paciente_id: int = None,
+        on_progress=None,
+        on_file_progress=None,
+        on_result=None,
+        idempotency_key: str = None
         ) -> Dict:
-        data = {
-            "cita_id": cita_id,
-            "sistema": sistema,
-            "diagnostico": diagnostico,
-            "recomendaciones": recomendaciones
-        }
-        
-        files_for_request = []
-        files_to_close = [] 
+        """
+        Registra la atención enviando el formulario y las imágenes en streaming.
+        Si el backend admite deduplicación, las imágenes cuyo SHA-256 ya aceptó
+        se envían como referencia en lugar de volver a subir sus bytes; si responde
+        409 porque no reconoce alguna, se olvidan esos hashes y se sube todo.
+        Si admite subidas reanudables, las imágenes se suben antes por bloques
+        (ver _subir_reanudable) y el formulario solo lleva sus identificadores.
+        on_progress(enviados, total) informa los bytes subidos y
+        on_file_progress(indice, enviados, total) el avance de cada imagen.
+        Si el backend ofrece resultados en streaming, on_result(indice, detecciones)
+        se llama en cuanto llega el análisis de cada imagen.
+        `idempotency_key` se envía en la cabecera Idempotency-Key para que el backend
+        no duplique la atención si la misma petición llega dos veces.
+        Los errores recuperables (sin conexión, timeout, 401, 429 o 5xx) llevan
+        "reintentable": True para que la cola de envíos los reintente.
+        """
+        data = [
+            ("cita_id", cita_id),
+            ("sistema", sistema),
+            ("diagnostico", diagnostico),
+            ("recomendaciones", recomendaciones)
+        ]
         
         try:
-            for img in imagenes:
-                file_obj = open(img.path, 'rb')
-                files_to_close.append(file_obj)
-                files_for_request.append(('imagenes', (img.name, file_obj, 'image/jpeg')))
-            
-            response = self.session.post(
-                f"{API_URL}/Medico/atencion",
-                data=data,
-                files=files_for_request
-            )
-            return self._handle_response(response)
+            from image_pipeline import hash_archivo
+
+            hashes = [getattr(img, "sha256", None) or hash_archivo(img.path) for img in imagenes]
+            capacidades = self.get_capacidades() if imagenes else {c: False for c in API_CAPACIDADES}
+            dedup = capacidades["dedup_imagenes"]
+            referencias = {h for h in hashes if self.upload_index.contiene(h)} if dedup else set()
+
+            for intento in (1, 2):
+                uploads = {}
+                if capacidades["uploads_reanudables"]:
+                    subida = self._subir_pendientes(imagenes, hashes, referencias, on_progress, on_file_progress)
+                    if "error" in subida:
+                        return subida
+                    uploads = subida["uploads"]
+                response = self._post_atencion(
+                    data, imagenes, hashes, referencias, uploads, dedup,
+                    None if uploads else on_progress, idempotency_key,
+                    stream=capacidades["atencion_stream"]
+                )
+                if response.status_code != 409 or intento == 2 or not (referencias or uploads):
+                    break
+                if self._en_proceso(response):
+                    # No es de deduplicación: se reintenta más tarde con la misma clave
+                    break
+                # El backend no reconoce alguna referencia o subida: se olvidan y se sube todo
+                faltantes = set(response.json()["faltantes"] or ()) or (referencias | set(uploads))
+                print(f"[API] El backend no reconoce {len(faltantes)} imágenes; se suben completas")
+                self.upload_index.quitar(faltantes)
+                for h in faltantes:
+                    self._uploads.pop(h, None)
+                referencias = set()
+
+            if response.status_code == 200 and response.headers.get("Content-Type", "").startswith("application/x-ndjson"):
+                result = self._leer_resultados_stream(response, on_result, len(imagenes))
+            else:
+                result = self._handle_response(response)
+            if "error" not in result:
+                self.upload_index.agregar(hashes)
+                for h in uploads:
+                    self._uploads.pop(h, None)
+                if referencias:
+                    reusadas = [img for img, h in zip(imagenes, hashes) if h in referencias]
+                    self._contar("imagenes_deduplicadas", len(reusadas))
+                    self._contar("bytes_ahorrados_dedup", sum(os.path.getsize(img.path) for img in reusadas))
+                # La atención cambia las citas pendientes, el historial y los datos del paciente
+                tags = ["citas", "historial"]
+                if paciente_id is not None:
+                    tags.append(f"paciente:{paciente_id}")
+                self.invalidar_cache(*tags)
+            elif self._es_reintentable(response):
+                result["reintentable"] = True
+            return result
         
+        except requests.Timeout:
+            return {"error": "El servidor no respondió a tiempo al guardar la atención.", "reintentable": True}
+
+        except requests.ConnectionError:
+            return {"error": "No se pudo conectar con el servidor.", "reintentable": True}
+
+        except requests.exceptions.ChunkedEncodingError:
+            # Se cortó la conexión a mitad de los resultados; con la clave de idempotencia
+            # el reintento devuelve la misma atención
+            return {"error": "Se perdió la conexión al recibir los resultados.", "reintentable": True}
+
         except Exception as e:
             return {"error": f"Error al subir imágenes o realizar la solicitud: {e}"}
-        
-        finally:
-            for file_obj in files_to_close: 
-                try:
-                    file_obj.close()
-                except Exception as e:
-                    print(f"Error cerrando archivo: {e}") 
-                    pass
 
     def is_logged_in(self) -> bool:
-        return self.token is not None and self.user_id is not None and self.rol_id == 2
\ No newline at end of file
+        return self.token is not None and self.user_id is not None and self.rol_id == 2
+
+
+class AsyncAPIClient:
+    """
+    Versión asíncrona de APIClient para usar desde los handlers de Flet.
+    Cada llamada se ejecuta en un hilo de trabajo (asyncio.to_thread) para que
+    el bucle de eventos siga repintando mientras el backend responde.
+    Comparte sesión, token y datos de usuario con el cliente síncrono.
+    """
+
+    def __init__(self, client: APIClient = None):
+        self.client = client or APIClient()
+        self._prefetch = []
+
+    async def _run(self, func, *args, **kwargs):
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    async def prefetch(self, historial_limit: int = None):
+        """
+        Precarga tras el login: perfil, citas aprobadas y la primera página del
+        historial en paralelo (como máximo API_PREFETCH_CONCURRENCY a la vez).
+        Las respuestas quedan en la caché del cliente, así la primera visita a
+        cada pantalla no espera a la red. Se cancela con cancelar_prefetch().
+        """
+        limite = asyncio.Semaphore(API_PREFETCH_CONCURRENCY)
+
+        async def precargar(nombre, func, *args, **kwargs):
+            async with limite:
+                inicio = time.perf_counter()
+                await self._run(func, *args, **kwargs)
+                print(f"[API] Precarga de {nombre} lista en {time.perf_counter() - inicio:.2f}s")
+
+        self.cancelar_prefetch()
+        self._prefetch = [
+            asyncio.create_task(precargar("perfil", self.client.get_profile)),
+            asyncio.create_task(precargar("citas", self.client.get_citas_aprobadas)),
+            asyncio.create_task(precargar(
+                "historial", self.client.get_historial_medico, page=1, limit=historial_limit
+            )),
+        ]
+        tareas = self._prefetch
+        resultados = await asyncio.gather(*tareas, return_exceptions=True)
+        if any(isinstance(r, asyncio.CancelledError) for r in resultados):
+            print("[API] Precarga cancelada")
+        for r in resultados:
+            if isinstance(r, Exception):
+                print(f"[API] Error en la precarga: {r}")
+        if self._prefetch is tareas:
+            self._prefetch = []
+
+    def cancelar_prefetch(self):
+        """Cancela la precarga en curso; lo que ya se estaba pidiendo no llega a la caché"""
+        for tarea in self._prefetch:
+            tarea.cancel()
+        self._prefetch = []
+
+    async def logout(self):
+        self.cancelar_prefetch()
+        await self._run(self.client.logout)
+
+    async def login(self, username: str, password: str) -> Dict:
+        return await self._run(self.client.login, username, password)
+
+    async def get_profile(self) -> Dict:
+        return await self._run(self.client.get_profile)
+
+    async def get_citas_aprobadas(self) -> List[Dict]:
+        return await self._run(self.client.get_citas_aprobadas)
+
+    async def revalidar_citas_aprobadas(self):
+        return await self._run(self.client.revalidar_citas_aprobadas)
+
+    def peek_citas_aprobadas(self):
+        return self.client.peek_citas_aprobadas()
+
+    async def get_historial_medico(
+        self,
+        nombre: str = None,
+        identificacion: str = None,
+        page: int = None,
+        limit: int = None,
+        cursor: str = None
+        ):
+        return await self._run(
+            self.client.get_historial_medico,
+            nombre,
+            identificacion,
+            page=page,
+            limit=limit,
+            cursor=cursor
+        )
+
+    async def get_paciente_info(self, paciente_id: int) -> Dict:
+        return await self._run(self.client.get_paciente_info, paciente_id)
+
+    async def get_pacientes_info(self, ids: List) -> Dict:
+        return await self._run(self.client.get_pacientes_info, ids)
+
+    def peek_paciente_info(self, paciente_id: int):
+        return self.client.peek_paciente_info(paciente_id)
+
+    async def get_capacidades(self) -> Dict:
+        return await self._run(self.client.get_capacidades)
+
+    async def registrar_atencion(
+        self,
+        cita_id: int,
+        sistema: str,
+        diagnostico: str,
+        recomendaciones: str,
+        imagenes: List = [],
+        paciente_id: int = None,
+        on_progress=None,
+        on_file_progress=None,
+        on_result=None,
+        idempotency_key: str = None
+        ) -> Dict:
+        return await self._run(
+            self.client.registrar_atencion,
+            cita_id=cita_id,
+            sistema=sistema,
+            diagnostico=diagnostico,
+            recomendaciones=recomendaciones,
+            imagenes=imagenes,
+            paciente_id=paciente_id,
+            on_progress=on_progress,
+            on_file_progress=on_file_progress,
+            on_result=on_result,
+            idempotency_key=idempotency_key
+        )
+
+    def is_logged_in(self) -> bool:
+        return self.client.is_logged_in()
+
+    def get_metrics(self) -> Dict:
+        return self.client.get_metrics()
+
+    def invalidar_cache(self, *tags: str):
+        self.client.invalidar_cache(*tags)
+
+    def get_cache_stats(self) -> Dict:
+        return self.client.get_cache_stats()
@@ -0,0 +1,126 @@
+"""
+Compara la construcción de controles con y sin la fábrica de views/estilos.py:
+- tarjetas de resultados YOLO de AtencionView (20 detecciones por imagen)
+- filas de la tabla virtualizada de HistorialView
+
+Mide controles construidos por segundo y bytes que Flet serializa para enviarlos
+a la interfaz (los comandos "add" de page.update()).
+
+Uso: python benchmarks/bench_estilos.py
+"""
+import json
+import os
+import random
+import sys
+import time
+
+import flet as ft
+from flet.core.protocol import CommandEncoder
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from views import estilos
+from views.virtual_table import VirtualColumn, VirtualTable
+
+IMAGENES = 50
+DETECCIONES = 20
+FILAS = 500
+
+
+def generar_detecciones():
+    return [
+        [{"class": f"clase_{j}", "confidence": random.random()} for j in range(DETECCIONES)]
+        for _ in range(IMAGENES)
+    ]
+
+
+def tarjeta_anterior(nombre, detecciones):
+    """Equivalente a la versión anterior de AtencionView: estilos repetidos en cada control."""
+    widgets = []
+    for d in detecciones:
+        confidence = d.get("confidence", 0.0)
+        color = "#28A745" if confidence > 0.7 else "#007BFF" if confidence > 0.5 else "#DC3545"
+        widgets.append(
+            ft.Container(
+                content=ft.Row([
+                    ft.Icon(ft.Icons.CIRCLE, size=8, color=color),
+                    ft.Text(f"{d.get('class', 'N/A')}", color="#343A40", font_family="Roboto", weight=ft.FontWeight.W_500, size=14),
+                    ft.Container(expand=True),
+                    ft.Text(f"{confidence:.1%}", color=color, font_family="Roboto", weight=ft.FontWeight.BOLD, size=13),
+                ]),
+                padding=5,
+            )
+        )
+    return ft.Container(
+        content=ft.Column([
+            ft.Container(
+                content=ft.Row([
+                    ft.Icon(ft.Icons.IMAGE, color="#007BFF", size=20),
+                    ft.Text(nombre, weight=ft.FontWeight.BOLD, color="#007BFF", font_family="Roboto", size=15),
+                    ft.Container(expand=True),
+                    ft.Container(
+                        content=ft.Text(f"{len(detecciones)} detecciones", color=ft.Colors.WHITE, font_family="Roboto", size=12, weight=ft.FontWeight.BOLD),
+                        padding=ft.padding.symmetric(horizontal=10, vertical=5),
+                        bgcolor="#007BFF",
+                        border_radius=15
+                    )
+                ]),
+                padding=10,
+                bgcolor=ft.Colors.with_opacity(0.05, "#007BFF"),
+            ),
+            ft.Container(content=ft.Column(widgets, spacing=2), padding=10)
+        ]),
+        bgcolor=ft.Colors.WHITE,
+        border=ft.border.all(1, ft.Colors.GREY_300),
+        border_radius=10,
+        padding=5,
+        margin=5,
+    )
+
+
+def contar(control) -> int:
+    return 1 + sum(contar(c) for c in control._get_children())
+
+
+def bytes_serializados(controles) -> int:
+    comandos = []
+    for c in controles:
+        comandos.extend(c._build_add_commands())
+    return len(json.dumps(comandos, cls=CommandEncoder, separators=(",", ":")).encode("utf-8"))
+
+
+def medir(nombre, construir, repeticiones=5):
+    """Mejor tiempo de varias repeticiones, para reducir el ruido"""
+    segundos = float("inf")
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        controles = construir()
+        segundos = min(segundos, time.perf_counter() - inicio)
+    total = sum(contar(c) for c in controles)
+    print(
+        f"{nombre:<38} {total:7d} controles  {total / segundos:10.0f} controles/s  "
+        f"{bytes_serializados(controles) / 1024:8.1f} KB serializados"
+    )
+
+
+def tabla(text_kwargs):
+    columnas = [VirtualColumn(f"Columna {i}", text_kwargs=text_kwargs) for i in range(7)]
+    return VirtualTable(columnas, values_fn=lambda r: r)
+
+
+def main():
+    random.seed(1)
+    detecciones = generar_detecciones()
+    nombres = [f"radiografia_{i}.jpg" for i in range(IMAGENES)]
+
+    medir("Tarjetas YOLO (anterior)", lambda: [tarjeta_anterior(n, d) for n, d in zip(nombres, detecciones)])
+    medir("Tarjetas YOLO (estilos)", lambda: [estilos.tarjeta_imagen(n, d) for n, d in zip(nombres, detecciones)])
+
+    anterior = tabla(dict(font_family="Roboto", color="#343A40", italic=True))
+    nueva = tabla(estilos.TEXTO_ITALICA)
+    medir("Filas de tabla (anterior)", lambda: [anterior._nueva_fila()["row"] for _ in range(FILAS)])
+    medir("Filas de tabla (estilos)", lambda: [nueva._nueva_fila()["row"] for _ in range(FILAS)])
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Mide el coste de actualizar la tabla de HistorialView con 5000 registros:
+reconstrucción completa de filas ft.DataRow frente a la tabla virtualizada.
+
+Uso: python benchmarks/bench_historial_table.py
+"""
+import os
+import random
+import sys
+import time
+
+import flet as ft
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from views.historial_view import HistorialView
+
+N = 5000
+
+
+def generar_historial(n, cambios=0):
+    registros = []
+    for i in range(n):
+        registros.append({
+            "id": i,
+            "paciente": f"Paciente {i}",
+            "identificacion": str(10000000 + i),
+            "fecha": f"2025-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}",
+            "hora_cita": "08:30:00",
+            "diagnostico": f"Diagnóstico {i} " * 4,
+            "recomendaciones": f"Recomendación {i} " * 4,
+            "sistema": "Respiratorio",
+            "especialidad": "Pediatría",
+        })
+    for i in random.sample(range(n), cambios):
+        registros[i]["diagnostico"] = "Diagnóstico actualizado"
+    return registros
+
+
+def medir(nombre, fn):
+    inicio = time.perf_counter()
+    resultado = fn()
+    print(f"{nombre:<45} {1000 * (time.perf_counter() - inicio):8.1f} ms  {resultado}")
+
+
+def reconstruir_datatable(vista, registros):
+    """Equivalente a la versión anterior: un ft.DataRow con sus ft.Text por registro."""
+    rows = []
+    for h in registros:
+        rows.append(ft.DataRow(cells=[
+            ft.DataCell(ft.Text(v, font_family="Roboto", color=vista.COLOR_TEXTO))
+            for v in vista._valores(h)
+        ]))
+    return f"{len(rows)} filas creadas"
+
+
+def main():
+    vista = HistorialView(None, None, None)
+    base = generar_historial(N)
+    con_cambios = generar_historial(N, cambios=50)
+
+    medir("Carga inicial (tabla virtualizada)", lambda: vista.update_table(base))
+    medir("Misma lista otra vez (tabla virtualizada)", lambda: vista.update_table(base))
+    medir("50 registros cambiados (tabla virtualizada)", lambda: vista.update_table(con_cambios))
+    medir("Carga inicial (DataTable completo)", lambda: reconstruir_datatable(vista, base))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Tiempo de importación de main.py (python -X importtime) desglosado por los
+módulos que pesan en el arranque, hasta que se puede pintar la pantalla de login.
+Cada módulo muestra su tiempo acumulado (con lo que importa) en la mejor de
+varias ejecuciones; "-" indica que main.py ya no lo importa al arrancar.
+
+El resultado de referencia está en benchmarks/importtime_baseline.txt.
+
+Uso: python benchmarks/bench_importtime.py [repeticiones]
+"""
+import os
+import subprocess
+import sys
+
+RAIZ = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+MODULOS = (
+    "main",
+    "flet",
+    "views",
+    "views.login_view",
+    "views.main_view",
+    "views.citas_view",
+    "views.atencion_view",
+    "views.historial_view",
+    "api_client",
+    "requests",
+    "jwt",
+    "dotenv",
+    "image_pipeline",
+    "outbox",
+)
+
+
+def importtime() -> dict:
+    """Microsegundos acumulados por módulo en un intérprete nuevo"""
+    salida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import main"],
+        cwd=RAIZ,
+        capture_output=True,
+        text=True,
+        check=True,
+    ).stderr
+    tiempos = {}
+    for linea in salida.splitlines():
+        if not linea.startswith("import time:") or "|" not in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        if acumulado.strip().isdigit():
+            tiempos.setdefault(nombre.strip(), int(acumulado))
+    return tiempos
+
+
+def main():
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    mejores = {}
+    for _ in range(repeticiones):
+        for nombre, us in importtime().items():
+            mejores[nombre] = min(us, mejores.get(nombre, us))
+
+    print(f"python -X importtime -c 'import main' (mejor de {repeticiones})")
+    for nombre in MODULOS:
+        valor = f"{mejores[nombre] / 1000:8.1f} ms" if nombre in mejores else f"{'-':>8}"
+        print(f"  {nombre:<22} {valor}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+# image_pipeline.py
+import atexit
+import hashlib
+import multiprocessing
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List
+
+from dotenv import load_dotenv
+
+from multipart_stream import tipo_por_contenido
+
+load_dotenv()
+
+# Lado máximo en píxeles y calidad JPEG de las imágenes que se envían al detector
+IMG_MAX_SIDE = int(os.getenv("IMG_MAX_SIDE", "1280"))
+IMG_QUALITY = int(os.getenv("IMG_QUALITY", "85"))
+IMG_MAX_BYTES = int(os.getenv("IMG_MAX_BYTES", str(50 * 1024 * 1024)))
+IMG_WORKERS = int(os.getenv("IMG_WORKERS", str(max(1, min(4, (os.cpu_count() or 2) - 1)))))
+
+
+def hash_archivo(ruta: str, bloque: int = 1024 * 1024) -> str:
+    """SHA-256 del contenido del archivo, leído por bloques"""
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for parte in iter(lambda: f.read(bloque), b""):
+            h.update(parte)
+    return h.hexdigest()
+
+
+class ImagenNoValida(ValueError):
+    """El archivo no se puede enviar (vacío o demasiado grande)"""
+
+
+def _a_8_bits(img):
+    """
+    Lleva una imagen de 16 bits o de coma flotante (lo usual en radiografías) a
+    escala de grises de 8 bits estirando su rango real de valores; convertirla
+    directamente a RGB recorta todo lo que pase de 255 a blanco.
+    """
+    if img.mode != "F":
+        img = img.convert("I")
+    minimo, maximo = img.getextrema()
+    escala = 255.0 / (maximo - minimo) if maximo > minimo else 0.0
+    return img.point(lambda v: v * escala - minimo * escala).convert("L")
+
+
+def preparar_imagen(ruta: str, nombre: str, destino_dir: str, max_lado: int, calidad: int, max_bytes: int = IMG_MAX_BYTES) -> Dict:
+    """
+    Valida y decodifica una imagen, aplica la orientación EXIF, la reduce para que
+    su lado mayor no supere `max_lado` y la recodifica como JPEG con `calidad`.
+    Calcula el SHA-256 del archivo que se va a subir.
+    El original no se modifica; la copia se escribe en `destino_dir`.
+    Si Pillow no puede decodificar un archivo cuyos primeros bytes son de una
+    imagen (p. ej. HEIC de un teléfono), se envía el original sin optimizar.
+    Se ejecuta en un proceso del pool, por eso es una función de módulo.
+    """
+    inicio = time.perf_counter()
+    resultado = {
+        "origen": ruta,
+        "nombre_original": nombre,
+        "ruta": ruta,
+        "nombre": nombre,
+        "bytes_origen": 0,
+        "bytes_final": None,
+        "sha256": None,
+        "valida": True,
+        "segundos": 0.0,
+        "error": None,
+    }
+    destino = None
+    try:
+        resultado["bytes_origen"] = os.path.getsize(ruta)
+        if resultado["bytes_origen"] == 0:
+            raise ImagenNoValida("el archivo está vacío")
+        if resultado["bytes_origen"] > max_bytes:
+            raise ImagenNoValida(f"supera el máximo de {max_bytes // 1_048_576} MB")
+        from PIL import Image, ImageOps
+
+        with Image.open(ruta) as img:
+            img = ImageOps.exif_transpose(img)
+            if img.mode.startswith("I") or img.mode == "F":
+                img = _a_8_bits(img)
+            if img.mode not in ("RGB", "L"):
+                img = img.convert("RGB")
+            img.thumbnail((max_lado, max_lado), Image.LANCZOS)
+
+            base = os.path.splitext(os.path.basename(nombre))[0]
+            destino = os.path.join(destino_dir, f"{base}_{os.getpid()}_{time.monotonic_ns()}.jpg")
+            img.save(destino, "JPEG", quality=calidad, optimize=True)
+
+        if os.path.getsize(destino) < resultado["bytes_origen"]:
+            resultado["ruta"] = destino
+            resultado["nombre"] = f"{base}.jpg"
+        else:
+            # La imagen ya era pequeña: se envía el original
+            os.remove(destino)
+    except ImportError:
+        # Sin Pillow no se puede validar ni reducir: se envía el original
+        resultado["error"] = "Pillow no está instalado; se envía el original"
+    except ImagenNoValida as e:
+        resultado["valida"] = False
+        resultado["error"] = f"Imagen no válida: {e}"
+    except Exception as e:
+        if destino is not None and os.path.exists(destino):
+            os.remove(destino)
+        if tipo_por_contenido(ruta) is not None:
+            resultado["error"] = f"No se pudo optimizar ({e}); se envía el original"
+        else:
+            resultado["valida"] = False
+            resultado["error"] = f"Imagen no válida: {e}"
+    if resultado["valida"]:
+        resultado["bytes_final"] = os.path.getsize(resultado["ruta"])
+        resultado["sha256"] = hash_archivo(resultado["ruta"])
+    else:
+        resultado["bytes_final"] = 0
+    resultado["segundos"] = time.perf_counter() - inicio
+    return resultado
+
+
+class ImagenPreparada:
+    """Imagen lista para subir; expone `path` y `name` igual que los archivos del FilePicker."""
+
+    def __init__(self, datos: Dict):
+        self.path = datos["ruta"]
+        self.name = datos["nombre"]
+        self.sha256 = datos["sha256"]
+        self.valida = datos["valida"]
+        self.datos = datos
+
+
+def imagen_no_valida(archivo, error) -> ImagenPreparada:
+    """Imagen que no se pudo preparar (p. ej. murió el proceso que la procesaba)"""
+    return ImagenPreparada({
+        "origen": archivo.path,
+        "nombre_original": archivo.name,
+        "ruta": archivo.path,
+        "nombre": archivo.name,
+        "bytes_origen": 0,
+        "bytes_final": 0,
+        "sha256": None,
+        "valida": False,
+        "segundos": 0.0,
+        "error": f"No se pudo preparar la imagen: {error}",
+    })
+
+
+class ImagePipeline:
+    """
+    Prepara en un pool de procesos las imágenes adjuntas antes de subirlas:
+    validación, reducción, recompresión y hash de contenido.
+    Las copias reducidas se guardan en un directorio temporal propio.
+    """
+
+    def __init__(self, max_lado: int = IMG_MAX_SIDE, calidad: int = IMG_QUALITY, workers: int = IMG_WORKERS):
+        self.max_lado = max_lado
+        self.calidad = calidad
+        self.workers = workers
+        self._pool = None
+        self.destino_dir = tempfile.mkdtemp(prefix="medico_img_")
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        # "spawn" también en Linux: el pool se crea con el bucle de Flet, la cola de
+        # envíos y los hilos de asyncio ya corriendo, y hacer fork de un proceso con
+        # hilos puede dejar a los hijos bloqueados en un lock heredado
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._pool
+
+    def _descartar_pool(self, pool: ProcessPoolExecutor):
+        """Un proceso del pool murió: el próximo envío crea un pool nuevo"""
+        if self._pool is pool:
+            self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(self, archivo) -> Future:
+        """
+        Encola la preparación de un archivo (con `path` y `name`) sin esperar.
+        El futuro resuelve a un ImagenPreparada; si el proceso falla, la imagen
+        queda como no válida.
+        """
+        resultado = Future()
+        args = (preparar_imagen, archivo.path, archivo.name, self.destino_dir, self.max_lado, self.calidad)
+        pool = self.pool
+        try:
+            futuro = pool.submit(*args)
+        except BrokenProcessPool:
+            self._descartar_pool(pool)
+            pool = self.pool
+            futuro = pool.submit(*args)
+
+        def _listo(f):
+            try:
+                resultado.set_result(ImagenPreparada(f.result()))
+            except Exception as e:
+                print(f"[IMG] Falló la preparación de {archivo.name}: {e!r}")
+                if isinstance(e, BrokenProcessPool):
+                    self._descartar_pool(pool)
+                resultado.set_result(imagen_no_valida(archivo, e))
+
+        futuro.add_done_callback(_listo)
+        return resultado
+
+    def preparar(self, archivos: List) -> List[ImagenPreparada]:
+        """Procesa los archivos en paralelo y espera a que estén todos listos"""
+        futuros = [self.submit(a) for a in archivos]
+        return [f.result() for f in futuros]
+
+    def resumen(self, imagenes: List[ImagenPreparada]) -> Dict:
+        """Bytes antes/después y tiempo total de preparación"""
+        imagenes = [i for i in imagenes if i.valida]
+        origen = sum(i.datos["bytes_origen"] for i in imagenes)
+        final = sum(i.datos["bytes_final"] for i in imagenes)
+        return {
+            "imagenes": len(imagenes),
+            "bytes_origen": origen,
+            "bytes_final": final,
+            "ahorro": origen - final,
+            "segundos": sum(i.datos["segundos"] for i in imagenes),
+        }
+
+    def limpiar(self, imagenes: List[ImagenPreparada]):
+        """Borra las copias temporales (nunca los originales)"""
+        for i in imagenes:
+            if i.path != i.datos["origen"] and os.path.dirname(i.path) == self.destino_dir:
+                try:
+                    os.remove(i.path)
+                except OSError:
+                    pass
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        shutil.rmtree(self.destino_dir, ignore_errors=True)
+
+
+_pipeline = None
+
+
+def get_pipeline() -> ImagePipeline:
+    """Pipeline compartido por todas las vistas de la aplicación"""
+    global _pipeline
+    if _pipeline is None:
+        _pipeline = ImagePipeline()
+        atexit.register(_pipeline.close)
+    return _pipeline
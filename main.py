@@ -1,6 +1,128 @@
+import multiprocessing
+import threading
+import time
+from collections import OrderedDict
+
+INICIO = time.perf_counter()  # para medir el tiempo hasta el primer frame
+
 import flet as ft
-from api_client import APIClient
-from views import LoginView, MainView, CitasView, AtencionView, HistorialView
+import views
+from api_client import APIClient, AsyncAPIClient
+from outbox import AtencionOutbox, ENVIADA
+from views import estilos
+from views import LoginView
+
+
+class Router:
+    """
+    Navegación entre vistas con caché de instancias.
+    Cada vista se construye una sola vez por ruta (y argumentos) y su árbol de
+    controles se guarda tras show(); al volver a ella se coloca otra vez ese
+    mismo árbol en la página, sin reconstruirlo ni volver a pedir sus datos, y
+    se llama a su método reanudar() si lo tiene. A la vista que se deja se le
+    llama pausar() (si lo tiene) para que detenga sus tareas en segundo plano:
+    page.clean() no desconecta los controles (su .page sigue asignado), así que
+    las vistas no pueden saber por sí solas que ya no están en pantalla.
+    invalidate() descarta las vistas cuyos datos cambiaron para que se
+    construyan de nuevo en la próxima visita (y llama a su cerrar() si lo tiene).
+    Flet ejecuta los manejadores síncronos en hilos y la cola de envíos avisa
+    desde el suyo, así que el estado del router se protege con un lock.
+    Cada atención abierta guarda su selector de archivos, sus imágenes preparadas
+    y sus resultados: solo se conservan las MAX_ATENCIONES usadas más recientemente.
+    """
+
+    SIN_CACHE = {"login"}
+    MAX_ATENCIONES = 3
+
+    def __init__(self, page: ft.Page, api: AsyncAPIClient, outbox: AtencionOutbox = None):
+        self.page = page
+        self.api = api
+        self.outbox = outbox
+        self._vistas = OrderedDict()  # (ruta, argumentos) -> (vista, controles de la página), de la menos a la más usada
+        self._por_cerrar = []
+        self.actual = None
+        self._vista_actual = None
+        self._lock = threading.RLock()
+
+    def _crear(self, to, kwargs):
+        if to == "login":
+            return LoginView(self.page, self.api, self._sesion_iniciada)
+        # Las demás vistas se importan aquí, en la primera navegación a cada una
+        elif to == "main":
+            return views.MainView(self.page, self.api, self)
+        elif to == "citas":
+            return views.CitasView(self.page, self.api, self)
+        elif to == "atencion":
+            return views.AtencionView(self.page, self.api, self, kwargs["cita_id"], kwargs["paciente_id"], self.outbox)
+        elif to == "historial":
+            return views.HistorialView(self.page, self.api, self)
+        raise ValueError(f"Ruta desconocida: {to}")
+
+    def _sesion_iniciada(self):
+        # Perfil, citas e historial se piden en segundo plano mientras se pinta el menú
+        self.page.run_task(self.api.prefetch, views.HistorialView.PAGE_SIZE)
+        self("main")
+
+    def __call__(self, to, **kwargs):
+        with self._lock:
+            if to == "login":
+                # Otra sesión: nada de lo guardado sirve
+                self.invalidate()
+            elif to == "main":
+                self.outbox.despertar()
+
+            clave = (to, tuple(sorted(kwargs.items())))
+            guardada = self._vistas.get(clave)
+            if guardada is not None:
+                self._vistas.move_to_end(clave)
+            vista = guardada[0] if guardada is not None else self._crear(to, kwargs)
+            anterior = self._vista_actual
+            if anterior is not None and anterior is not vista and hasattr(anterior, "pausar"):
+                anterior.pausar()
+
+            if guardada is not None:
+                controles = guardada[1]
+                self.page.controls = list(controles)
+                self.page.update()
+                if hasattr(vista, "reanudar"):
+                    vista.reanudar()
+            else:
+                vista.show()
+                if to not in self.SIN_CACHE:
+                    self._vistas[clave] = (vista, list(self.page.controls))
+            self.actual = clave
+            self._vista_actual = vista
+
+            atenciones = [c for c in self._vistas if c[0] == "atencion"]
+            for vieja in atenciones[:-self.MAX_ATENCIONES]:
+                self._descartar(vieja)
+
+            # Las vistas descartadas mientras estaban en pantalla se cierran al salir de ellas
+            for v in [v for v in self._por_cerrar if v is not vista]:
+                self._por_cerrar.remove(v)
+                v.cerrar()
+
+    def invalidate(self, *rutas: str, **argumentos):
+        """
+        Descarta las vistas de las rutas indicadas; sin rutas, todas.
+        Con `argumentos` solo las abiertas con esos valores, p. ej. invalidate("atencion", cita_id=5)
+        """
+        with self._lock:
+            for clave in list(self._vistas):
+                if rutas and clave[0] not in rutas:
+                    continue
+                if argumentos and not argumentos.items() <= dict(clave[1]).items():
+                    continue
+                self._descartar(clave)
+
+    def _descartar(self, clave):
+        vista, _ = self._vistas.pop(clave)
+        if hasattr(vista, "cerrar"):
+            if clave == self.actual:
+                self._por_cerrar.append(vista)
+            else:
+                vista.cerrar()
+
 
 def main(page: ft.Page):
     page.title = "Médico - Fundación Amigos de los Niños"
@@ -9,22 +131,37 @@ def main(page: ft.Page):
     page.theme_mode = ft.ThemeMode.LIGHT
     page.bgcolor = "#F8FAFC"  # Fondo suave
     page.fonts = {"Roboto": "https://fonts.googleapis.com/css2?family=Roboto:wght@400;500;700&display=swap"}
+    page.theme = estilos.tema()
 
-    api = APIClient()
+    api = AsyncAPIClient(APIClient())
+    navigate = Router(page, api)
 
-    def navigate(to, **kwargs):
-        if to == "login":
-            LoginView(page, api, lambda: navigate("main")).show()
-        elif to == "main":
-            MainView(page, api, navigate).show()
-        elif to == "citas":
-            CitasView(page, api, navigate).show()
-        elif to == "atencion":
-            AtencionView(page, api, navigate, kwargs["cita_id"], kwargs["paciente_id"]).show()
-        elif to == "historial":
-            HistorialView(page, api, navigate).show()
-
-    # Iniciar en login
+    # Iniciar en login: se pinta antes de cargar todo lo demás
     navigate("login")
+    print(f"[APP] Primer frame en {time.perf_counter() - INICIO:.3f}s")
+
+    # requests/jwt y la sesión HTTP se cargan en segundo plano mientras se escribe el usuario
+    page.run_thread(api.client.precalentar)
+
+    # Cola local de atenciones: se envían en segundo plano cuando hay conexión
+    outbox = AtencionOutbox(api.client)
+    outbox.iniciar()
+    navigate.outbox = outbox
+    # Una atención enviada cambia las citas pendientes y el historial, y su formulario
+    # ya no se vuelve a usar. El aviso llega desde el hilo de la cola; las vistas se
+    # descartan en el bucle de eventos
+    async def invalidar_tras_envio(cita_id):
+        navigate.invalidate("citas", "historial")
+        if cita_id is not None:
+            navigate.invalidate("atencion", cita_id=cita_id)
+
+    outbox.suscribir(
+        lambda clave, estado: page.run_task(invalidar_tras_envio, outbox.cita(clave)) if estado == ENVIADA else None
+    )
 
-ft.app(target=main)
\ No newline at end of file
+# El guard es necesario porque el pool de procesos de imágenes vuelve a importar este módulo
+if __name__ == "__main__":
+    # En un ejecutable empaquetado (flet pack/PyInstaller) los procesos del pool arrancan
+    # este mismo ejecutable; freeze_support() los desvía antes de abrir otra ventana
+    multiprocessing.freeze_support()
+    ft.app(target=main)
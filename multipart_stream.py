@@ -0,0 +1,149 @@
+# multipart_stream.py
+import mimetypes
+import os
+import uuid
+from typing import Callable, List, Tuple
+
+# Firmas de los primeros bytes de los formatos de imagen más comunes
+_FIRMAS = [
+    (b"\xff\xd8\xff", "image/jpeg"),
+    (b"\x89PNG\r\n\x1a\n", "image/png"),
+    (b"GIF87a", "image/gif"),
+    (b"GIF89a", "image/gif"),
+    (b"BM", "image/bmp"),
+    (b"II*\x00", "image/tiff"),
+    (b"MM\x00*", "image/tiff"),
+]
+
+
+def tipo_por_contenido(path: str):
+    """Tipo MIME de imagen según los primeros bytes del archivo, o None si no se reconoce"""
+    try:
+        with open(path, "rb") as f:
+            cabecera = f.read(16)
+    except OSError:
+        return None
+    for firma, tipo in _FIRMAS:
+        if cabecera.startswith(firma):
+            return tipo
+    if cabecera[:4] == b"RIFF" and cabecera[8:12] == b"WEBP":
+        return "image/webp"
+    if cabecera[4:8] == b"ftyp" and cabecera[8:12] in (b"heic", b"heix", b"mif1"):
+        return "image/heic"
+    return None
+
+
+def detectar_content_type(path: str, nombre: str = None) -> str:
+    """
+    Tipo MIME real del archivo según sus primeros bytes; si no se reconoce,
+    se usa la extensión y por último application/octet-stream.
+    """
+    tipo = tipo_por_contenido(path)
+    if tipo is None:
+        tipo, _ = mimetypes.guess_type(nombre or path)
+    return tipo or "application/octet-stream"
+
+
+# Como urllib3 (estilo HTML5): comillas y saltos de línea se codifican para que
+# un nombre no pueda cerrar el parámetro ni inyectar cabeceras en la parte
+_ESCAPE_PARAM = {ord('"'): "%22", ord("\r"): "%0D", ord("\n"): "%0A"}
+
+
+def _param(valor) -> str:
+    """Valor listo para ir entre comillas en Content-Disposition"""
+    return str(valor).translate(_ESCAPE_PARAM)
+
+
+class MultipartStreamEncoder:
+    """
+    Cuerpo multipart/form-data que se genera mientras se envía.
+    Los archivos se leen por bloques de `chunk_size` directamente desde disco,
+    así nunca hay más de un bloque en memoria por petición.
+    Se pasa como `data=` a requests: expone `read()` y `__len__` para que se
+    envíe con Content-Length y en streaming.
+    `on_progress(enviados, total)` se llama cada vez que se entrega un bloque.
+    """
+
+    def __init__(
+        self,
+        fields: List[Tuple[str, str]],
+        files: List[Tuple[str, str, str, str]],
+        chunk_size: int = 64 * 1024,
+        on_progress: Callable[[int, int], None] = None
+        ):
+        """
+        fields: [(nombre, valor)]
+        files: [(nombre_campo, nombre_archivo, ruta, content_type)]
+        """
+        self.boundary = uuid.uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self.chunk_size = chunk_size
+        self.on_progress = on_progress
+
+        # Partes en orden: bytes fijos o ("archivo", ruta)
+        self._partes = []
+        for nombre, valor in fields:
+            self._partes.append(
+                f"--{self.boundary}\r\n"
+                f'Content-Disposition: form-data; name="{_param(nombre)}"\r\n\r\n'
+                f"{valor}\r\n".encode("utf-8")
+            )
+        for campo, nombre_archivo, ruta, content_type in files:
+            self._partes.append(
+                f"--{self.boundary}\r\n"
+                f'Content-Disposition: form-data; name="{_param(campo)}"; filename="{_param(nombre_archivo)}"\r\n'
+                f"Content-Type: {content_type}\r\n\r\n".encode("utf-8")
+            )
+            self._partes.append(("archivo", ruta))
+            self._partes.append(b"\r\n")
+        self._partes.append(f"--{self.boundary}--\r\n".encode("utf-8"))
+
+        self.total = sum(
+            os.path.getsize(p[1]) if isinstance(p, tuple) else len(p)
+            for p in self._partes
+        )
+        self.enviados = 0
+        self._indice = 0
+        self._offset = 0
+        self._archivo = None
+
+    def __len__(self) -> int:
+        return self.total
+
+    def read(self, size: int = -1) -> bytes:
+        if size is None or size < 0:
+            size = self.chunk_size
+        while self._indice < len(self._partes):
+            parte = self._partes[self._indice]
+            if isinstance(parte, tuple):
+                if self._archivo is None:
+                    self._archivo = open(parte[1], "rb")
+                bloque = self._archivo.read(min(size, self.chunk_size))
+                if not bloque:
+                    self._archivo.close()
+                    self._archivo = None
+                    self._indice += 1
+                    continue
+            else:
+                bloque = parte[self._offset:self._offset + size]
+                self._offset += len(bloque)
+                if self._offset >= len(parte):
+                    self._offset = 0
+                    self._indice += 1
+            self.enviados += len(bloque)
+            if self.on_progress is not None:
+                self.on_progress(self.enviados, self.total)
+            return bloque
+        return b""
+
+    def __iter__(self):
+        while True:
+            bloque = self.read(self.chunk_size)
+            if not bloque:
+                return
+            yield bloque
+
+    def close(self):
+        if self._archivo is not None:
+            self._archivo.close()
+            self._archivo = None
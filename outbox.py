@@ -0,0 +1,326 @@
+# outbox.py
+import json
+import os
+import random
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Callable, Dict, List
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Carpeta con la base SQLite y las copias de las imágenes en cola
+OUTBOX_DIR = os.getenv(
+    "OUTBOX_DIR",
+    os.path.join(os.path.expanduser("~"), ".medico_interfaz", "outbox")
+)
+# Backoff entre intentos de envío (segundos) y días que se conservan las ya enviadas
+OUTBOX_BACKOFF_BASE = float(os.getenv("OUTBOX_BACKOFF_BASE", "5"))
+OUTBOX_BACKOFF_MAX = float(os.getenv("OUTBOX_BACKOFF_MAX", "300"))
+OUTBOX_RETENCION_DIAS = float(os.getenv("OUTBOX_RETENCION_DIAS", "7"))
+
+# Estados de una atención en la cola
+PENDIENTE = "pendiente"
+ENVIANDO = "enviando"
+ENVIADA = "enviada"
+ERROR = "error"
+
+
+class ImagenEnCola:
+    """Imagen guardada en la carpeta de la cola; expone lo mismo que ImagenPreparada."""
+
+    def __init__(self, datos: Dict):
+        self.path = datos["ruta"]
+        self.name = datos["nombre"]
+        self.sha256 = datos["sha256"]
+        self.datos = datos
+
+
+class AtencionOutbox:
+    """
+    Cola local y durable de atenciones por enviar.
+    Cada atención se guarda en SQLite con los campos del formulario, la cita, el
+    médico y una copia de sus imágenes antes de intentar enviarla, así no se
+    pierde si el backend no responde o la aplicación se cierra.
+    Un hilo en segundo plano reintenta las pendientes con backoff exponencial;
+    todas se envían con su clave de idempotencia para que un reintento de algo
+    que sí llegó no cree una atención duplicada.
+    Las atenciones rechazadas por el backend (error no recuperable) quedan en
+    estado "error" hasta que se reintentan o se descartan.
+    """
+
+    def __init__(self, client, directorio: str = OUTBOX_DIR):
+        self.client = client
+        self.directorio = directorio
+        os.makedirs(directorio, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            os.path.join(directorio, "outbox.sqlite3"),
+            check_same_thread=False,
+            isolation_level=None
+        )
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            """
+            CREATE TABLE IF NOT EXISTS atenciones (
+                clave TEXT PRIMARY KEY,
+                user_id TEXT,
+                cita_id INTEGER,
+                paciente_id INTEGER,
+                sistema TEXT,
+                diagnostico TEXT,
+                recomendaciones TEXT,
+                imagenes TEXT,
+                estado TEXT,
+                intentos INTEGER DEFAULT 0,
+                proximo_intento REAL DEFAULT 0,
+                ultimo_error TEXT,
+                respuesta TEXT,
+                creado REAL,
+                actualizado REAL
+            )
+            """
+        )
+        # Lo que quedó enviándose al cerrar la app vuelve a la cola (la clave evita duplicados)
+        self._db.execute("UPDATE atenciones SET estado = ? WHERE estado = ?", (PENDIENTE, ENVIANDO))
+        self._purgar()
+
+        self._listeners = []
+        self._despertar = threading.Event()
+        self._hilo = None
+        self._detenido = False
+
+    def _purgar(self):
+        limite = time.time() - OUTBOX_RETENCION_DIAS * 86400
+        with self._lock:
+            self._db.execute("DELETE FROM atenciones WHERE estado = ? AND actualizado < ?", (ENVIADA, limite))
+
+    def _actualizar(self, clave: str, **campos):
+        campos["actualizado"] = time.time()
+        asignaciones = ", ".join(f"{c} = ?" for c in campos)
+        with self._lock:
+            self._db.execute(f"UPDATE atenciones SET {asignaciones} WHERE clave = ?", (*campos.values(), clave))
+
+    def _fila(self, clave: str):
+        with self._lock:
+            return self._db.execute("SELECT * FROM atenciones WHERE clave = ?", (clave,)).fetchone()
+
+    # --- Suscripción a cambios de estado ---
+
+    def suscribir(self, fn: Callable[[str, str], None]):
+        """fn(clave, estado) se llama (desde cualquier hilo) cada vez que cambia una atención"""
+        if fn not in self._listeners:
+            self._listeners.append(fn)
+
+    def desuscribir(self, fn: Callable[[str, str], None]):
+        if fn in self._listeners:
+            self._listeners.remove(fn)
+
+    def _notificar(self, clave: str, estado: str):
+        for fn in list(self._listeners):
+            try:
+                fn(clave, estado)
+            except Exception as e:
+                print(f"[OUTBOX] Error notificando cambio de {clave}: {e}")
+
+    # --- Operaciones de la cola ---
+
+    def encolar(
+        self,
+        cita_id: int,
+        sistema: str,
+        diagnostico: str,
+        recomendaciones: str,
+        imagenes: List = [],
+        paciente_id: int = None,
+        reservar: bool = False,
+        clave: str = None
+        ) -> str:
+        """
+        Guarda la atención y copia sus imágenes a la carpeta de la cola.
+        Con `reservar` queda en estado "enviando" para que quien la encoló haga
+        el primer envío con enviar(); si no, la toma el hilo en segundo plano.
+        `clave` es la clave de idempotencia del envío del formulario; si ya está
+        en la cola no se vuelve a guardar. Si no se indica se genera una.
+        Retorna la clave de idempotencia de la atención.
+        """
+        if clave is None:
+            clave = uuid.uuid4().hex
+        elif self._fila(clave) is not None:
+            return clave
+        carpeta = os.path.join(self.directorio, clave)
+        guardadas = []
+        for i, img in enumerate(imagenes):
+            os.makedirs(carpeta, exist_ok=True)
+            ruta = os.path.join(carpeta, f"{i}_{os.path.basename(img.name)}")
+            shutil.copy2(img.path, ruta)
+            datos = getattr(img, "datos", {})
+            guardadas.append({
+                "ruta": ruta,
+                "nombre": img.name,
+                "sha256": getattr(img, "sha256", None),
+                "nombre_original": datos.get("nombre_original", img.name),
+            })
+        ahora = time.time()
+        with self._lock:
+            self._db.execute(
+                """
+                INSERT INTO atenciones (clave, user_id, cita_id, paciente_id, sistema, diagnostico,
+                    recomendaciones, imagenes, estado, proximo_intento, creado, actualizado)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (
+                    clave, str(self.client.user_id), cita_id, paciente_id, sistema, diagnostico,
+                    recomendaciones, json.dumps(guardadas), ENVIANDO if reservar else PENDIENTE,
+                    ahora, ahora, ahora
+                )
+            )
+        print(f"[OUTBOX] Atención de la cita {cita_id} en cola ({clave})")
+        if not reservar:
+            self._notificar(clave, PENDIENTE)
+            self._despertar.set()
+        return clave
+
+    def enviar(self, clave: str, on_progress=None, on_file_progress=None, on_result=None) -> Dict:
+        """
+        Envía una atención ya reservada (estado "enviando") y guarda el resultado:
+        "enviada" si el backend la aceptó, "pendiente" con backoff si el error es
+        recuperable (sin conexión, timeout, 5xx, sesión expirada) o "error" si no.
+        Retorna la respuesta de registrar_atencion.
+        """
+        fila = self._fila(clave)
+        if fila is None:
+            return {"error": "La atención ya no está en la cola."}
+        self._notificar(clave, ENVIANDO)
+        imagenes = [ImagenEnCola(d) for d in json.loads(fila["imagenes"])]
+        response = self.client.registrar_atencion(
+            cita_id=fila["cita_id"],
+            sistema=fila["sistema"],
+            diagnostico=fila["diagnostico"],
+            recomendaciones=fila["recomendaciones"],
+            imagenes=imagenes,
+            paciente_id=fila["paciente_id"],
+            on_progress=on_progress,
+            on_file_progress=on_file_progress,
+            on_result=on_result,
+            idempotency_key=clave
+        )
+        intentos = fila["intentos"] + 1
+        if "error" not in response:
+            self._actualizar(clave, estado=ENVIADA, intentos=intentos, ultimo_error=None, respuesta=json.dumps(response))
+            shutil.rmtree(os.path.join(self.directorio, clave), ignore_errors=True)
+            estado = ENVIADA
+        elif response.get("reintentable"):
+            tope = min(OUTBOX_BACKOFF_MAX, OUTBOX_BACKOFF_BASE * (2 ** (intentos - 1)))
+            espera = random.uniform(tope / 2, tope)
+            self._actualizar(
+                clave, estado=PENDIENTE, intentos=intentos,
+                proximo_intento=time.time() + espera, ultimo_error=response["error"]
+            )
+            print(f"[OUTBOX] Envío de {clave} falló (intento {intentos}); se reintenta en {espera:.0f}s")
+            estado = PENDIENTE
+        else:
+            self._actualizar(clave, estado=ERROR, intentos=intentos, ultimo_error=response["error"])
+            estado = ERROR
+        self._notificar(clave, estado)
+        return response
+
+    def estado(self, clave: str):
+        fila = self._fila(clave)
+        return fila["estado"] if fila is not None else None
+
+    def cita(self, clave: str):
+        """Cita de la atención en cola, o None si ya no está"""
+        fila = self._fila(clave)
+        return fila["cita_id"] if fila is not None else None
+
+    def listar(self, limite: int = 10) -> List[Dict]:
+        """Últimas atenciones en cola del médico con sesión iniciada, de la más reciente a la más antigua"""
+        with self._lock:
+            filas = self._db.execute(
+                """
+                SELECT clave, cita_id, estado, intentos, proximo_intento, ultimo_error, creado
+                FROM atenciones WHERE user_id = ? ORDER BY creado DESC LIMIT ?
+                """,
+                (str(self.client.user_id), limite)
+            ).fetchall()
+        return [dict(f) for f in filas]
+
+    def reintentar(self, clave: str):
+        """Vuelve a poner en cola una atención (por ejemplo una en estado "error")"""
+        self._actualizar(clave, estado=PENDIENTE, proximo_intento=0)
+        self._notificar(clave, PENDIENTE)
+        self._despertar.set()
+
+    def descartar(self, clave: str):
+        """Quita una atención de la cola y borra sus imágenes"""
+        with self._lock:
+            self._db.execute("DELETE FROM atenciones WHERE clave = ?", (clave,))
+        shutil.rmtree(os.path.join(self.directorio, clave), ignore_errors=True)
+        self._notificar(clave, None)
+
+    # --- Hilo en segundo plano ---
+
+    def _reclamar(self):
+        """Marca como "enviando" la próxima atención vencida del médico actual y retorna su clave"""
+        if not self.client.is_logged_in():
+            return None
+        with self._lock:
+            fila = self._db.execute(
+                """
+                SELECT clave FROM atenciones
+                WHERE estado = ? AND user_id = ? AND proximo_intento <= ?
+                ORDER BY creado LIMIT 1
+                """,
+                (PENDIENTE, str(self.client.user_id), time.time())
+            ).fetchone()
+            if fila is None:
+                return None
+            self._db.execute("UPDATE atenciones SET estado = ? WHERE clave = ?", (ENVIANDO, fila["clave"]))
+        return fila["clave"]
+
+    def _proxima_espera(self) -> float:
+        with self._lock:
+            fila = self._db.execute(
+                "SELECT MIN(proximo_intento) AS proximo FROM atenciones WHERE estado = ?",
+                (PENDIENTE,)
+            ).fetchone()
+        if fila["proximo"] is None:
+            return 30.0
+        return min(30.0, max(1.0, fila["proximo"] - time.time()))
+
+    def _bucle(self):
+        while not self._detenido:
+            clave = None
+            try:
+                clave = self._reclamar()
+                if clave is not None:
+                    self.enviar(clave)
+                    continue
+                espera = self._proxima_espera()
+            except Exception as e:
+                print(f"[OUTBOX] Error en el envío en segundo plano: {e}")
+                if clave is not None:
+                    self._actualizar(clave, estado=PENDIENTE, proximo_intento=time.time() + OUTBOX_BACKOFF_MAX)
+                espera = 30.0
+            self._despertar.wait(espera)
+            self._despertar.clear()
+
+    def iniciar(self):
+        """Arranca el hilo que vacía la cola"""
+        if self._hilo is None:
+            self._hilo = threading.Thread(target=self._bucle, name="outbox", daemon=True)
+            self._hilo.start()
+
+    def despertar(self):
+        """Revisa la cola ya (por ejemplo tras iniciar sesión)"""
+        self._despertar.set()
+
+    def detener(self):
+        self._detenido = True
+        self._despertar.set()
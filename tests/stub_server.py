@@ -0,0 +1,81 @@
+"""
+Backend falso con http.server para las pruebas de APIClient.
+Cada prueba asigna `responder(peticion) -> (status, cuerpo, cabeceras)`; el
+servidor guarda todas las peticiones recibidas en `peticiones`.
+"""
+import email
+import email.policy
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+class Peticion:
+    def __init__(self, metodo, ruta, cabeceras, cuerpo):
+        self.metodo = metodo
+        self.ruta = ruta
+        self.cabeceras = cabeceras
+        self.cuerpo = cuerpo
+
+    def partes(self):
+        """Partes del cuerpo multipart/form-data: [(nombre, nombre_archivo, bytes)]"""
+        return leer_multipart(self.cabeceras["Content-Type"], self.cuerpo)
+
+
+def leer_multipart(content_type: str, cuerpo: bytes):
+    mensaje = email.message_from_bytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode("ascii") + cuerpo,
+        policy=email.policy.HTTP
+    )
+    return [
+        (p.get_param("name", header="content-disposition"), p.get_filename(), p.get_payload(decode=True))
+        for p in mensaje.iter_parts()
+    ]
+
+
+class StubServer:
+    def __init__(self):
+        self.peticiones = []
+        self.responder = lambda peticion: (404, {"detail": "Not Found"}, {})
+        servidor = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _atender(self):
+                largo = int(self.headers.get("Content-Length", 0))
+                peticion = Peticion(self.command, self.path, dict(self.headers), self.rfile.read(largo))
+                servidor.peticiones.append(peticion)
+                status, cuerpo, cabeceras = servidor.responder(peticion)
+                # None: sin cuerpo (p. ej. un 304); bytes: se envían tal cual (p. ej. NDJSON)
+                if cuerpo is None or isinstance(cuerpo, bytes):
+                    datos = cuerpo or b""
+                else:
+                    datos = json.dumps(cuerpo).encode("utf-8")
+                cabeceras = {"Content-Type": "application/json", **cabeceras}
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(datos)))
+                for nombre, valor in cabeceras.items():
+                    self.send_header(nombre, valor)
+                self.end_headers()
+                self.wfile.write(datos)
+
+            do_GET = do_POST = do_PATCH = _atender
+
+        self._http = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self._http.server_port}"
+        threading.Thread(target=self._http.serve_forever, args=(0.05,), daemon=True).start()
+
+    def rutas(self, metodo: str = None):
+        return [p.ruta for p in self.peticiones if metodo is None or p.metodo == metodo]
+
+    def cerrar(self):
+        self._http.shutdown()
+        self._http.server_close()
@@ -0,0 +1,66 @@
+import unittest
+from unittest import mock
+
+import stub_server  # noqa: F401  (agrega la raíz del repositorio a sys.path)
+
+import api_cache
+from api_cache import ResponseCache
+
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def test_guarda_y_expira_por_ttl(self):
+        cache = ResponseCache()
+        with mock.patch.object(api_cache.time, "monotonic", return_value=100.0):
+            cache.set("perfil", {"nombre": "Ana"}, 10, ttl=30, etag='"v1"')
+            self.assertEqual(cache.get("perfil"), {"nombre": "Ana"})
+        with mock.patch.object(api_cache.time, "monotonic", return_value=130.0):
+            self.assertIsNone(cache.get("perfil"))
+            # La entrada expirada se conserva para revalidarla
+            vieja = cache.get_stale("perfil")
+            self.assertEqual(vieja["data"], {"nombre": "Ana"})
+            self.assertEqual(vieja["etag"], '"v1"')
+            cache.refresh("perfil", 30)
+            self.assertEqual(cache.get("perfil"), {"nombre": "Ana"})
+        self.assertEqual(cache.stats()["hits"], 2)
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_expulsa_la_menos_usada_por_numero_de_entradas(self):
+        cache = ResponseCache(max_entries=2)
+        cache.set("a", 1, 1, ttl=60)
+        cache.set("b", 2, 1, ttl=60)
+        cache.get("a")
+        cache.set("c", 3, 1, ttl=60)
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get_stale("b"))
+        self.assertEqual(cache.get("c"), 3)
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_expulsa_por_bytes_y_no_guarda_lo_que_no_cabe(self):
+        cache = ResponseCache(max_bytes=100)
+        cache.set("a", "x", 60, ttl=60)
+        cache.set("b", "y", 60, ttl=60)
+        self.assertIsNone(cache.get_stale("a"))
+        self.assertEqual(cache.stats()["bytes"], 60)
+        cache.set("grande", "z", 101, ttl=60)
+        self.assertIsNone(cache.get_stale("grande"))
+        # Reemplazar una clave no cuenta sus bytes dos veces
+        cache.set("b", "y2", 40, ttl=60)
+        self.assertEqual(cache.stats()["bytes"], 40)
+
+    def test_invalida_por_etiquetas(self):
+        cache = ResponseCache()
+        cache.set("citas", [], 1, ttl=60, tags=("citas",))
+        cache.set("paciente/1", {}, 1, ttl=60, tags=("paciente", "paciente:1"))
+        cache.set("paciente/2", {}, 1, ttl=60, tags=("paciente", "paciente:2"))
+        cache.invalidate_tags("citas", "paciente:1")
+        self.assertIsNone(cache.get_stale("citas"))
+        self.assertIsNone(cache.get_stale("paciente/1"))
+        self.assertIsNotNone(cache.get("paciente/2"))
+        cache.clear()
+        self.assertEqual(cache.stats()["entradas"], 0)
+        self.assertEqual(cache.stats()["bytes"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
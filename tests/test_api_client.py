@@ -0,0 +1,634 @@
+import base64
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from urllib.parse import parse_qs
+
+from stub_server import StubServer
+
+import api_client
+from upload_index import UploadIndex
+
+
+class Archivo:
+    """Imagen adjunta con `path` y `name`, como las del FilePicker"""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+
+
+class StubTestCase(unittest.TestCase):
+    """APIClient apuntando a un backend falso, con esperas de reintento cortas"""
+
+    def setUp(self):
+        self.stub = StubServer()
+        self.addCleanup(self.stub.cerrar)
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        for nombre, valor in (("API_URL", self.stub.url), ("API_RETRY_BACKOFF_BASE", 0.01)):
+            parche = mock.patch.object(api_client, nombre, valor)
+            parche.start()
+            self.addCleanup(parche.stop)
+        self.client = api_client.APIClient()
+        self.client.upload_index = UploadIndex(os.path.join(self.dir.name, "indice.json"), self.stub.url)
+
+        self.imagen = Archivo(os.path.join(self.dir.name, "rx.jpg"))
+        with open(self.imagen.path, "wb") as f:
+            f.write(b"\xff\xd8\xff\xe0" + os.urandom(4096))
+
+    def capacidades(self, **activas):
+        return (200, {c: activas.get(c, False) for c in api_client.API_CAPACIDADES}, {})
+
+
+class APIClientStubTest(StubTestCase):
+    """Envío de atenciones contra un backend falso"""
+
+    def test_reintentos_con_la_misma_clave_crean_una_atencion(self):
+        atenciones = {}
+
+        def responder(p):
+            if p.ruta == "/Medico/capacidades":
+                return self.capacidades()
+            clave = p.cabeceras["Idempotency-Key"]
+            repetida = clave in atenciones
+            atenciones.setdefault(clave, {"id_atencion": len(atenciones) + 1, "detections": [[]]})
+            if len(self.stub.rutas("POST")) < 3:
+                # La atención se creó pero la respuesta "se perdió"
+                return (503, {"detail": "ocupado"}, {})
+            return (200, atenciones[clave], {"Idempotent-Replayed": "true"} if repetida else {})
+
+        self.stub.responder = responder
+        resultado = self.client.registrar_atencion(
+            1, "respiratorio", "dx", "rec", [self.imagen], idempotency_key="clave-1"
+        )
+
+        self.assertEqual(resultado["id_atencion"], 1)
+        posts = [p for p in self.stub.peticiones if p.metodo == "POST"]
+        self.assertEqual(len(posts), 3)
+        self.assertEqual({p.cabeceras["Idempotency-Key"] for p in posts}, {"clave-1"})
+        self.assertEqual(len(atenciones), 1)
+        metricas = self.client.get_metrics()
+        self.assertEqual(metricas["reintentos"], 2)
+        self.assertEqual(metricas["respuestas_repetidas"], 1)
+
+    def test_las_respuestas_que_se_reintentan_se_cierran(self):
+        fin = json.dumps({"fin": True, "id_atencion": 1}).encode() + b"\n"
+
+        def responder(p):
+            if p.ruta == "/Medico/capacidades":
+                return self.capacidades(atencion_stream=True)
+            if len(self.stub.rutas("POST")) < 3:
+                return (503, {"detail": "ocupado"}, {})
+            return (200, fin, {"Content-Type": "application/x-ndjson"})
+
+        self.stub.responder = responder
+        respuestas = []
+        post = self.client.session.post
+
+        def post_registrado(*args, **kwargs):
+            respuestas.append(post(*args, **kwargs))
+            return respuestas[-1]
+
+        with mock.patch.object(self.client.session, "post", post_registrado):
+            resultado = self.client.registrar_atencion(
+                1, "s", "dx", "rec", [self.imagen], idempotency_key="clave-1"
+            )
+        self.assertEqual(resultado["id_atencion"], 1)
+        self.assertEqual(len(respuestas), 3)
+        self.assertTrue(all(r.raw.closed for r in respuestas[:2]))
+
+    def test_409_en_proceso_no_es_fallo_de_deduplicacion(self):
+        from image_pipeline import hash_archivo
+
+        sha = hash_archivo(self.imagen.path)
+        self.client.upload_index.agregar([sha])
+
+        def responder(p):
+            if p.ruta == "/Medico/capacidades":
+                return self.capacidades(dedup_imagenes=True)
+            return (409, {"detail": "La atención con esta clave aún se está procesando"}, {})
+
+        self.stub.responder = responder
+        resultado = self.client.registrar_atencion(
+            1, "s", "dx", "rec", [self.imagen], idempotency_key="clave-1"
+        )
+
+        self.assertTrue(resultado["reintentable"])
+        posts = [p for p in self.stub.peticiones if p.metodo == "POST"]
+        self.assertEqual(len(posts), api_client.API_RETRY_MAX_ATTEMPTS)
+        # Todos los intentos por referencia: no se olvidó el hash ni se subió la imagen completa
+        self.assertTrue(all(("imagenes_ref", None, sha.encode()) in p.partes() for p in posts))
+        self.assertTrue(self.client.upload_index.contiene(sha))
+
+    def test_409_con_faltantes_sube_las_imagenes_completas(self):
+        from image_pipeline import hash_archivo
+
+        sha = hash_archivo(self.imagen.path)
+        self.client.upload_index.agregar([sha])
+
+        def responder(p):
+            if p.ruta == "/Medico/capacidades":
+                return self.capacidades(dedup_imagenes=True)
+            if any(nombre == "imagenes_ref" for nombre, _, _ in p.partes()):
+                return (409, {"faltantes": [sha]}, {})
+            return (200, {"id_atencion": 7, "detections": [[]]}, {})
+
+        self.stub.responder = responder
+        resultado = self.client.registrar_atencion(1, "s", "dx", "rec", [self.imagen])
+
+        self.assertEqual(resultado["id_atencion"], 7)
+        primera, segunda = [p.partes() for p in self.stub.peticiones if p.metodo == "POST"]
+        self.assertIn(("imagenes_ref", None, sha.encode()), primera)
+        self.assertFalse([n for n, archivo, _ in primera if archivo])
+        with open(self.imagen.path, "rb") as f:
+            self.assertIn(("imagenes", "rx.jpg", f.read()), segunda)
+        self.assertFalse([n for n, _, _ in segunda if n == "imagenes_ref"])
+        # El backend la aceptó completa: vuelve al índice
+        self.assertTrue(self.client.upload_index.contiene(sha))
+
+
+class ReintentosGetTest(StubTestCase):
+    """GET idempotentes: backoff, Retry-After y presupuesto de tiempo"""
+
+    def setUp(self):
+        super().setUp()
+        parche = mock.patch.object(api_client.time, "sleep")
+        self.sleep = parche.start()
+        self.addCleanup(parche.stop)
+
+    def respuestas(self, *respuestas):
+        pendientes = list(respuestas)
+        self.stub.responder = lambda p: pendientes.pop(0) if len(pendientes) > 1 else pendientes[0]
+
+    def test_reintenta_503_hasta_obtener_respuesta(self):
+        self.respuestas((503, {}, {}), (502, {}, {}), (200, {"nombre": "Ana"}, {}))
+        self.assertEqual(self.client.get_profile(), {"nombre": "Ana"})
+        self.assertEqual(len(self.stub.peticiones), 3)
+        self.assertEqual(self.client.get_metrics()["reintentos"], 2)
+        # Backoff con jitter: nunca más que base * 2^(intento-1)
+        for (espera,), intento in zip((c.args for c in self.sleep.call_args_list), (1, 2)):
+            self.assertLessEqual(espera, 0.01 * 2 ** (intento - 1))
+
+    def test_agota_los_intentos(self):
+        self.respuestas((503, {"detail": "caído"}, {}))
+        resultado = self.client.get_profile()
+        self.assertIn("Error 503", resultado["error"])
+        self.assertEqual(len(self.stub.peticiones), api_client.API_RETRY_MAX_ATTEMPTS)
+        self.assertEqual(self.client.get_metrics()["reintentos_agotados"], 1)
+
+    def test_no_reintenta_errores_del_cliente(self):
+        self.respuestas((404, {"detail": "no existe"}, {}))
+        self.assertIn("Error 404", self.client.get_profile()["error"])
+        self.assertEqual(len(self.stub.peticiones), 1)
+
+    def test_respeta_retry_after_en_segundos_y_fecha(self):
+        from email.utils import format_datetime
+        from datetime import datetime, timedelta, timezone
+
+        fecha = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=3), usegmt=True)
+        self.respuestas(
+            (429, {}, {"Retry-After": "2"}),
+            (503, {}, {"Retry-After": fecha}),
+            (200, {"nombre": "Ana"}, {})
+        )
+        self.assertEqual(self.client.get_profile(), {"nombre": "Ana"})
+        primera, segunda = [c.args[0] for c in self.sleep.call_args_list]
+        self.assertEqual(primera, 2.0)
+        self.assertTrue(1.0 < segunda <= 3.0)
+
+    def test_no_espera_mas_alla_del_presupuesto(self):
+        self.respuestas((503, {}, {"Retry-After": "60"}), (200, {"nombre": "Ana"}, {}))
+        with mock.patch.object(api_client, "API_RETRY_BUDGET", 30):
+            resultado = self.client.get_profile()
+        self.assertIn("Error 503", resultado["error"])
+        self.assertEqual(len(self.stub.peticiones), 1)
+        self.sleep.assert_not_called()
+
+    def test_reintenta_conexiones_caidas(self):
+        self.stub.cerrar()
+        self.assertEqual(self.client.get_profile(), {"error": "No se pudo conectar con el servidor."})
+        self.assertEqual(self.sleep.call_count, api_client.API_RETRY_MAX_ATTEMPTS - 1)
+
+
+class RevalidacionTest(StubTestCase):
+    """Un listado expirado se revalida con ETag/Last-Modified y un 304 reutiliza el cuerpo"""
+
+    def setUp(self):
+        super().setUp()
+        # TTL cero: cada llamada revalida
+        parche = mock.patch.dict(api_client.API_CACHE_TTL, {"perfil": 0, "citas": 0})
+        parche.start()
+        self.addCleanup(parche.stop)
+
+    def test_304_reutiliza_el_cuerpo_guardado(self):
+        perfil = {"nombre": "Ana", "especialidad": "Pediatría"}
+
+        def responder(p):
+            if p.cabeceras.get("If-None-Match") == '"v1"':
+                return (304, None, {"ETag": '"v1"'})
+            return (200, perfil, {"ETag": '"v1"'})
+
+        self.stub.responder = responder
+        self.assertEqual(self.client.get_profile(), perfil)
+        self.assertEqual(self.client.get_profile(), perfil)
+        primera, segunda = self.stub.peticiones
+        self.assertNotIn("If-None-Match", primera.cabeceras)
+        self.assertEqual(segunda.cabeceras["If-None-Match"], '"v1"')
+        metricas = self.client.get_metrics()
+        self.assertEqual(metricas["respuestas_304"], 1)
+        self.assertGreater(metricas["bytes_ahorrados_304"], 0)
+
+    def test_last_modified_y_cambio_de_contenido(self):
+        fecha = "Sun, 18 Oct 2026 10:00:00 GMT"
+        respuestas = [
+            (200, {"citas_aprobadas": [{"id": 1}]}, {"Last-Modified": fecha}),
+            (200, {"citas_aprobadas": [{"id": 1}, {"id": 2}]}, {"Last-Modified": fecha}),
+        ]
+        self.stub.responder = lambda p: respuestas.pop(0)
+        self.assertEqual(self.client.get_citas_aprobadas(), [{"id": 1}])
+        # Cambió en el servidor: un 200 reemplaza lo guardado
+        self.assertEqual(self.client.get_citas_aprobadas(), [{"id": 1}, {"id": 2}])
+        self.assertEqual(self.stub.peticiones[1].cabeceras["If-Modified-Since"], fecha)
+        self.assertEqual(self.client.get_metrics()["respuestas_304"], 0)
+
+    def test_sin_validadores_no_hay_peticion_condicional(self):
+        self.stub.responder = lambda p: (200, {"nombre": "Ana"}, {})
+        self.client.get_profile()
+        self.client.get_profile()
+        self.assertFalse(any("If-None-Match" in p.cabeceras or "If-Modified-Since" in p.cabeceras
+                             for p in self.stub.peticiones))
+
+
+class SubidaReanudableTest(StubTestCase):
+    """Subidas por bloques a /Medico/uploads: reanudación y errores"""
+
+    def setUp(self):
+        super().setUp()
+        parche = mock.patch.object(api_client, "API_UPLOAD_CHUNK", 1024)
+        parche.start()
+        self.addCleanup(parche.stop)
+        with open(self.imagen.path, "rb") as f:
+            self.contenido = f.read()
+        self.sha = hashlib.sha256(self.contenido).hexdigest()
+        self.subidas = {}  # upload_id -> bytes recibidos
+        self.fallos = {}   # número de PATCH -> status con el que se responde
+        self.stub.responder = self.responder
+
+    def responder(self, p):
+        if p.metodo == "POST":
+            upload_id = f"u{len(self.subidas) + 1}"
+            self.subidas[upload_id] = b""
+            return (201, {"upload_id": upload_id, "offset": 0}, {})
+        upload_id = p.ruta.rsplit("/", 1)[1]
+        if upload_id not in self.subidas:
+            return (404, {"detail": "no existe"}, {})
+        if p.metodo == "GET":
+            return (200, {"offset": len(self.subidas[upload_id])}, {})
+        status = self.fallos.pop(len(self.stub.rutas("PATCH")), None)
+        if status is not None:
+            return (status, {"detail": "falla"}, {})
+        offset = int(p.cabeceras["Upload-Offset"])
+        if offset != len(self.subidas[upload_id]):
+            return (409, {"detail": "offset"}, {})
+        digest = base64.b64encode(hashlib.sha256(p.cuerpo).digest()).decode("ascii")
+        self.assertEqual(p.cabeceras["Upload-Checksum"], f"sha256 {digest}")
+        self.subidas[upload_id] += p.cuerpo
+        return (204, None, {"Upload-Offset": str(len(self.subidas[upload_id]))})
+
+    def subir(self):
+        avances = []
+        resultado = self.client._subir_reanudable(self.imagen, self.sha, avances.append)
+        return resultado, avances
+
+    def test_sube_por_bloques(self):
+        resultado, avances = self.subir()
+        self.assertEqual(resultado, {"upload_id": "u1"})
+        self.assertEqual(self.subidas["u1"], self.contenido)
+        self.assertEqual(avances, [0, 1024, 2048, 3072, 4096, len(self.contenido)])
+
+    def test_reanuda_desde_el_offset_del_backend(self):
+        self.subidas["u1"] = self.contenido[:2048]
+        self.client._uploads[self.sha] = "u1"
+        resultado, avances = self.subir()
+        self.assertEqual(resultado, {"upload_id": "u1"})
+        self.assertEqual(self.subidas["u1"], self.contenido)
+        self.assertEqual(avances[0], 2048)
+        self.assertEqual(self.stub.rutas("POST"), [])
+        self.assertEqual(self.client.get_metrics()["subidas_reanudadas"], 1)
+
+    def test_sesion_desconocida_crea_otra(self):
+        self.client._uploads[self.sha] = "vieja"
+        resultado, _ = self.subir()
+        self.assertEqual(resultado, {"upload_id": "u1"})
+        self.assertEqual(self.client._uploads[self.sha], "u1")
+
+    def test_bloque_danado_se_reenvia(self):
+        self.fallos[2] = 460
+        resultado, _ = self.subir()
+        self.assertEqual(self.subidas[resultado["upload_id"]], self.contenido)
+        self.assertEqual(self.client.get_metrics()["bloques_reenviados"], 1)
+
+    def test_offset_desfasado_se_vuelve_a_consultar(self):
+        self.fallos[3] = 409
+        resultado, _ = self.subir()
+        self.assertEqual(self.subidas[resultado["upload_id"]], self.contenido)
+        self.assertEqual(len(self.stub.rutas("GET")), 1)
+
+    def test_errores_al_crear_la_subida(self):
+        for status, reintentable in ((422, False), (401, True), (500, True)):
+            self.stub.responder = lambda p, status=status: (status, {"detail": "no"}, {})
+            resultado, _ = self.subir()
+            self.assertIn(f"Error {status}" if status != 401 else "Sesión expirada", resultado["error"])
+            self.assertEqual(resultado.get("reintentable", False), reintentable)
+
+    def test_agota_los_intentos_con_error_reintentable(self):
+        self.fallos.update({n: 503 for n in range(1, 20)})
+        with mock.patch.object(api_client, "API_UPLOAD_MAX_ATTEMPTS", 3):
+            resultado, _ = self.subir()
+        self.assertTrue(resultado["reintentable"])
+        self.assertEqual(len(self.stub.rutas("PATCH")), 3)
+
+
+class RespuestaNDJSON:
+    """Respuesta de requests mínima para _leer_resultados_stream"""
+
+    def __init__(self, *lineas):
+        self.lineas = [l if isinstance(l, bytes) else json.dumps(l).encode() for l in lineas]
+        self.leidas = 0
+        self.cerrada = False
+
+    def iter_lines(self, chunk_size=None):
+        for linea in self.lineas:
+            self.leidas += 1
+            yield linea
+
+    def close(self):
+        self.cerrada = True
+
+
+class ResultadosStreamTest(unittest.TestCase):
+    """Lectura de los resultados YOLO en NDJSON"""
+
+    def setUp(self):
+        self.client = api_client.APIClient()
+        self.recibidos = []
+
+    def leer(self, respuesta, total=0):
+        return self.client._leer_resultados_stream(
+            respuesta, lambda i, d: self.recibidos.append((i, d)), total
+        )
+
+    def test_ordena_por_imagen_y_avisa_cada_una(self):
+        resultado = self.leer(RespuestaNDJSON(
+            {"indice": 1, "detecciones": ["b"]},
+            b"",
+            {"indice": 0, "detecciones": ["a"]},
+            {"fin": True, "id_atencion": 9},
+        ), total=2)
+        self.assertEqual(resultado, {"id_atencion": 9, "detections": [["a"], ["b"]]})
+        self.assertEqual(self.recibidos, [(1, ["b"]), (0, ["a"])])
+
+    def test_completa_las_imagenes_sin_resultado(self):
+        resultado = self.leer(RespuestaNDJSON({"indice": 2, "detecciones": ["c"]}, {"fin": True}), total=4)
+        self.assertEqual(resultado["detections"], [[], [], ["c"], []])
+        resultado = self.leer(RespuestaNDJSON({"fin": True, "id_atencion": 1}), total=2)
+        self.assertEqual(resultado["detections"], [[], []])
+
+    def test_sin_linea_final_es_reintentable(self):
+        resultado = self.leer(RespuestaNDJSON({"indice": 0, "detecciones": []}), total=2)
+        self.assertTrue(resultado["reintentable"])
+        self.assertIn("error", resultado)
+
+    def test_linea_mal_formada_cierra_y_es_reintentable(self):
+        respuesta = RespuestaNDJSON({"indice": 0, "detecciones": []}, b"{no es json", {"fin": True})
+        resultado = self.leer(respuesta)
+        self.assertTrue(resultado["reintentable"])
+        self.assertTrue(respuesta.cerrada)
+        for linea in (b"[1, 2]", json.dumps({"detecciones": []}).encode()):
+            self.assertTrue(self.leer(RespuestaNDJSON(linea, {"fin": True}))["reintentable"])
+
+    def test_lee_hasta_el_final_aunque_haya_llegado_fin(self):
+        respuesta = RespuestaNDJSON({"fin": True, "id_atencion": 1}, b"")
+        self.leer(respuesta)
+        self.assertEqual(respuesta.leidas, 2)
+
+
+class AtencionStreamStubTest(StubTestCase):
+    """registrar_atencion con un backend que responde en streaming"""
+
+    def test_resultados_en_vivo(self):
+        cuerpo = b"\n".join(json.dumps(e).encode() for e in (
+            {"indice": 0, "detecciones": [{"clase": "neumonia"}]},
+            {"fin": True, "id_atencion": 4},
+        )) + b"\n"
+
+        def responder(p):
+            if p.ruta == "/Medico/capacidades":
+                return self.capacidades(atencion_stream=True)
+            self.assertIn("application/x-ndjson", p.cabeceras["Accept"])
+            return (200, cuerpo, {"Content-Type": "application/x-ndjson"})
+
+        self.stub.responder = responder
+        recibidos = []
+        resultado = self.client.registrar_atencion(
+            1, "s", "dx", "rec", [self.imagen], on_result=lambda i, d: recibidos.append((i, d))
+        )
+        self.assertEqual(resultado, {"id_atencion": 4, "detections": [[{"clase": "neumonia"}]]})
+        self.assertEqual(recibidos, [(0, [{"clase": "neumonia"}])])
+
+
+class PacientesLoteTest(StubTestCase):
+    """get_pacientes_info: una petición por lotes o, si no, una por paciente"""
+
+    def responder(self, lote=True, lote_status=200):
+        def responder(p):
+            ruta, _, consulta = p.ruta.partition("?")
+            if ruta == "/Medico/capacidades":
+                return self.capacidades(pacientes_batch=lote)
+            if ruta == "/Medico/pacientes":
+                if lote_status != 200:
+                    return (lote_status, {"detail": "falla"}, {})
+                ids = parse_qs(consulta)["ids"][0].split(",")
+                return (200, {"pacientes": {i: {"id": int(i)} for i in ids if i != "404"}}, {})
+            paciente_id = ruta.rsplit("/", 1)[1]
+            if paciente_id == "404":
+                return (404, {"detail": "no existe"}, {})
+            return (200, {"id": int(paciente_id)}, {})
+        return responder
+
+    def rutas(self):
+        return [r for r in self.stub.rutas("GET") if r != "/Medico/capacidades"]
+
+    def test_lote_y_cache(self):
+        self.stub.responder = self.responder()
+        resultado = self.client.get_pacientes_info([1, 2, 404, 1, None])
+        self.assertEqual(resultado, {1: {"id": 1}, 2: {"id": 2}, 404: {}})
+        self.assertEqual(len(self.rutas()), 1)
+        # Los encontrados quedan en caché como si se hubieran pedido uno a uno
+        self.assertEqual(self.client.get_paciente_info(2), {"id": 2})
+        self.assertEqual(self.client.get_pacientes_info([1, 2]), {1: {"id": 1}, 2: {"id": 2}})
+        self.assertEqual(len(self.rutas()), 1)
+
+    def test_lotes_de_tamano_maximo(self):
+        self.stub.responder = self.responder()
+        with mock.patch.object(api_client, "API_PACIENTES_BATCH_MAX", 2):
+            self.client.get_pacientes_info([1, 2, 3])
+        self.assertEqual(self.rutas(), ["/Medico/pacientes?ids=1%2C2", "/Medico/pacientes?ids=3"])
+
+    def test_sin_lotes_pide_uno_a_uno(self):
+        self.stub.responder = self.responder(lote=False)
+        resultado = self.client.get_pacientes_info([1, 2, 404])
+        self.assertEqual(resultado, {1: {"id": 1}, 2: {"id": 2}, 404: {}})
+        self.assertEqual(sorted(self.rutas()), ["/Medico/paciente/1", "/Medico/paciente/2", "/Medico/paciente/404"])
+
+    def test_si_falla_el_lote_pide_uno_a_uno(self):
+        self.stub.responder = self.responder(lote_status=500)
+        resultado = self.client.get_pacientes_info([1, 2])
+        self.assertEqual(resultado, {1: {"id": 1}, 2: {"id": 2}})
+        self.assertEqual(self.rutas()[0], "/Medico/pacientes?ids=1%2C2")
+        self.assertEqual(sorted(self.rutas()[1:]), ["/Medico/paciente/1", "/Medico/paciente/2"])
+
+
+class PaginaHistorialTest(unittest.TestCase):
+    """Normalización de las respuestas de /Medico/historial a páginas"""
+
+    def setUp(self):
+        self.client = api_client.APIClient()
+        self.client._capacidades = {c: False for c in api_client.API_CAPACIDADES}
+
+    def filas(self, n, desde=0):
+        return [{"identificacion": str(i)} for i in range(desde, desde + n)]
+
+    def test_has_more_explicito(self):
+        pagina = self.client._pagina_historial({"has_more": False, "page": 3}, self.filas(20), 3, 20)
+        self.assertFalse(pagina["has_more"])
+        self.assertEqual(pagina["page"], 3)
+
+    def test_next_cursor(self):
+        pagina = self.client._pagina_historial({"next_cursor": "abc"}, self.filas(5), 1, 20)
+        self.assertTrue(pagina["has_more"])
+        self.assertEqual(pagina["next_cursor"], "abc")
+
+    def test_total(self):
+        datos = {"page": 2, "limit": 20, "total": 45}
+        self.assertTrue(self.client._pagina_historial(datos, self.filas(20), 2, 20)["has_more"])
+        datos["page"] = 3
+        self.assertFalse(self.client._pagina_historial(datos, self.filas(5), 3, 20)["has_more"])
+
+    def test_pagina_sin_total_ni_cursor(self):
+        # Repite page/limit: pagina, y una página llena puede tener otra detrás
+        datos = {"page": 1, "limit": 20}
+        self.assertTrue(self.client._pagina_historial(datos, self.filas(20), 1, 20)["has_more"])
+        self.assertFalse(self.client._pagina_historial(datos, self.filas(7), 1, 20)["has_more"])
+        self.client._capacidades["historial_paginado"] = True
+        self.assertTrue(self.client._pagina_historial({}, self.filas(20), 1, 20)["has_more"])
+
+    def test_sin_indicios_de_paginacion_no_hay_mas(self):
+        self.assertFalse(self.client._pagina_historial({}, self.filas(20), 1, 20)["has_more"])
+
+    def test_error(self):
+        pagina = self.client._pagina_historial({"error": "caído"}, [], 1, 20)
+        self.assertEqual(pagina["error"], "caído")
+        self.assertFalse(pagina["has_more"])
+
+
+class HistorialSinPaginacionStubTest(StubTestCase):
+    """Backend que ignora page/limit y devuelve siempre lo mismo"""
+
+    def test_una_sola_pagina(self):
+        filas = [{"identificacion": str(i)} for i in range(100)]
+
+        def responder(p):
+            if p.ruta == "/Medico/capacidades":
+                return self.capacidades()
+            return (200, {"historial": filas}, {})
+
+        self.stub.responder = responder
+        pagina = self.client.get_historial_medico(page=1, limit=100)
+        self.assertEqual(len(pagina["items"]), 100)
+        self.assertFalse(pagina["has_more"])
+
+
+class SingleFlightTest(unittest.TestCase):
+    """GET simultáneos iguales comparten una sola petición"""
+
+    def setUp(self):
+        self.client = api_client.APIClient()
+        self.llamadas = []
+
+    def _hacer_get_lento(self, resultado=None, error=None):
+        def hacer_get(path, params=None, tipo="listado", cache=None, tags=()):
+            self.llamadas.append((path, params))
+            time.sleep(0.2)
+            if error is not None:
+                raise error
+            return resultado if resultado is not None else {"path": path, "params": params}
+        return hacer_get
+
+    def _en_paralelo(self, *llamadas):
+        resultados = [None] * len(llamadas)
+
+        def correr(i, fn):
+            try:
+                resultados[i] = fn()
+            except Exception as e:
+                resultados[i] = e
+
+        hilos = [threading.Thread(target=correr, args=(i, fn)) for i, fn in enumerate(llamadas)]
+        for h in hilos:
+            h.start()
+        for h in hilos:
+            h.join()
+        return resultados
+
+    def test_llamadas_iguales_comparten_resultado(self):
+        self.client._hacer_get = self._hacer_get_lento()
+        resultados = self._en_paralelo(*[lambda: self.client._get("/Usuario/perfil")] * 5)
+
+        self.assertEqual(len(self.llamadas), 1)
+        self.assertTrue(all(r is resultados[0] for r in resultados))
+        self.assertEqual(self.client.get_metrics()["llamadas_compartidas"], 4)
+
+    def test_el_error_se_comparte(self):
+        self.client._hacer_get = self._hacer_get_lento(error=RuntimeError("caído"))
+        resultados = self._en_paralelo(*[lambda: self.client._get("/Medico/citas/aprobadas")] * 3)
+
+        self.assertEqual(len(self.llamadas), 1)
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in resultados))
+
+    def test_distintos_parametros_no_se_comparten(self):
+        self.client._hacer_get = self._hacer_get_lento()
+        self._en_paralelo(
+            lambda: self.client._get("/Medico/historial", params={"page": 1}),
+            lambda: self.client._get("/Medico/historial", params={"page": 2}),
+        )
+        self.assertEqual(len(self.llamadas), 2)
+
+    def test_otro_token_no_comparte_la_peticion_en_curso(self):
+        self.client._hacer_get = self._hacer_get_lento()
+        self.client.session.headers["Authorization"] = "Bearer a"
+        primera = threading.Thread(target=self.client._get, args=("/Usuario/perfil",))
+        primera.start()
+        time.sleep(0.05)
+        # Otro médico inició sesión mientras la primera petición seguía en curso
+        self.client.session.headers["Authorization"] = "Bearer b"
+        self.client._get("/Usuario/perfil")
+        primera.join()
+        self.assertEqual(len(self.llamadas), 2)
+
+    def test_una_llamada_posterior_vuelve_a_pedir(self):
+        self.client._hacer_get = self._hacer_get_lento()
+        self.client._get("/Usuario/perfil")
+        self.client._get("/Usuario/perfil")
+        self.assertEqual(len(self.llamadas), 2)
+        self.assertEqual(self.client.get_metrics()["llamadas_compartidas"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
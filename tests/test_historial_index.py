@@ -0,0 +1,65 @@
+import unittest
+
+import stub_server  # noqa: F401  (agrega la raíz del repositorio a sys.path)
+
+from views.historial_index import HistorialIndex, normalizar
+
+REGISTROS = [
+    {"paciente": "José Pérez Gómez", "identificacion": "1012345"},
+    {"paciente": "María Fernanda Ruiz", "identificacion": "1098765"},
+    {"paciente": "Josefina Pereira", "identificacion": "2012345"},
+    {"paciente": "Andrés Gómez", "identificacion": None},
+]
+
+
+class HistorialIndexTest(unittest.TestCase):
+
+    def setUp(self):
+        self.indice = HistorialIndex(REGISTROS)
+
+    def nombres(self, resultado):
+        return [r["paciente"] for r in resultado]
+
+    def test_normalizar_quita_tildes_y_mayusculas(self):
+        self.assertEqual(normalizar("Pérez GÓMEZ"), "perez gomez")
+        self.assertEqual(normalizar(None), "")
+
+    def test_busca_por_prefijo_sin_tildes(self):
+        self.assertEqual(
+            self.nombres(self.indice.buscar("jos")),
+            ["José Pérez Gómez", "Josefina Pereira"]
+        )
+        self.assertEqual(self.nombres(self.indice.buscar("PEREZ")), ["José Pérez Gómez"])
+
+    def test_todas_las_palabras_deben_coincidir(self):
+        self.assertEqual(
+            self.nombres(self.indice.buscar("gom jo")),
+            ["José Pérez Gómez"]
+        )
+        self.assertEqual(self.indice.buscar("maria perez"), [])
+
+    def test_identificacion_exacta_o_por_prefijo(self):
+        self.assertEqual(self.nombres(self.indice.buscar(identificacion="1012345")), ["José Pérez Gómez"])
+        self.assertEqual(
+            self.nombres(self.indice.buscar(identificacion="10")),
+            ["José Pérez Gómez", "María Fernanda Ruiz"]
+        )
+        self.assertEqual(
+            self.nombres(self.indice.buscar("jos", identificacion="20")),
+            ["Josefina Pereira"]
+        )
+
+    def test_identificacion_exacta_no_oculta_las_que_la_extienden(self):
+        indice = HistorialIndex([
+            {"paciente": "Ana", "identificacion": "12345"},
+            {"paciente": "Luis", "identificacion": "123"},
+        ])
+        self.assertEqual(self.nombres(indice.buscar(identificacion="123")), ["Ana", "Luis"])
+
+    def test_sin_filtros_retorna_todo_en_orden(self):
+        self.assertEqual(self.indice.buscar(), REGISTROS)
+        self.assertEqual(self.indice.buscar("  ", ""), REGISTROS)
+
+
+if __name__ == "__main__":
+    unittest.main()
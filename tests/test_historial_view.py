@@ -0,0 +1,44 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import stub_server  # noqa: F401  (agrega la raíz del repositorio a sys.path)
+
+from views.historial_view import HistorialView
+
+
+class APIFalsa:
+    """Historial que siempre anuncia otra página y repite las mismas filas"""
+
+    def __init__(self, filas):
+        self.filas = filas
+        self.pedidas = []
+
+    async def get_historial_medico(self, nombre=None, identificacion=None, page=None, limit=None, cursor=None):
+        self.pedidas.append(page)
+        return {"items": self.filas, "page": page, "limit": limit, "total": None,
+                "next_cursor": None, "has_more": True}
+
+
+class HistorialPaginasTest(unittest.TestCase):
+
+    def test_pagina_repetida_termina_el_historial(self):
+        filas = [{"paciente": f"P{i}", "identificacion": str(i), "fecha": "2026-10-01", "hora_cita": "08:00"}
+                 for i in range(HistorialView.PAGE_SIZE)]
+        api = APIFalsa(filas)
+        vista = HistorialView(mock.MagicMock(), api, lambda *a, **k: None)
+        vista.update_table = mock.MagicMock()
+
+        async def desplazarse():
+            await vista.buscar(None)
+            for _ in range(3):
+                await vista.cargar_siguiente()
+
+        asyncio.run(desplazarse())
+        self.assertEqual(api.pedidas, [1, 2])
+        self.assertEqual(vista._residentes(), len(filas))
+        self.assertIsNone(vista._siguiente)
+
+
+if __name__ == "__main__":
+    unittest.main()
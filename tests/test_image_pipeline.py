@@ -0,0 +1,104 @@
+import os
+import tempfile
+import unittest
+
+import stub_server  # noqa: F401  (agrega la raíz del repositorio a sys.path)
+
+from image_pipeline import preparar_imagen
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+
+@unittest.skipIf(Image is None, "Pillow no está instalado")
+class PrepararImagenTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def niveles_de_gris(self, ruta):
+        with Image.open(ruta) as img:
+            histograma = img.convert("L").histogram()
+        return histograma, len([n for n in histograma if n])
+
+    def test_radiografia_de_16_bits_conserva_los_grises(self):
+        # Degradado con ruido, 12 bits útiles (0..4080), guardado como PNG de 16 bits
+        ruta = os.path.join(self.dir.name, "rx.png")
+        degradado = Image.blend(
+            Image.linear_gradient("L").resize((2000, 1500)),
+            Image.effect_noise((2000, 1500), 40),
+            0.2
+        )
+        degradado.convert("I").point(lambda v: v * 16).convert("I;16").save(ruta)
+        with Image.open(ruta) as img:
+            self.assertEqual(img.mode, "I;16")
+
+        resultado = preparar_imagen(ruta, "rx.png", self.dir.name, 1280, 85)
+
+        self.assertTrue(resultado["valida"])
+        self.assertNotEqual(resultado["ruta"], ruta)
+        histograma, niveles = self.niveles_de_gris(resultado["ruta"])
+        self.assertGreater(niveles, 200)
+        # Ni recortada a blanco ni a negro
+        total = sum(histograma)
+        self.assertLess(histograma[255] / total, 0.05)
+        self.assertLess(histograma[0] / total, 0.05)
+
+    def test_imagen_plana_de_16_bits(self):
+        ruta = os.path.join(self.dir.name, "plana.png")
+        Image.new("I;16", (64, 64), 1000).save(ruta)
+        resultado = preparar_imagen(ruta, "plana.png", self.dir.name, 1280, 85)
+        self.assertTrue(resultado["valida"])
+
+    def test_reduce_el_lado_mayor(self):
+        ruta = os.path.join(self.dir.name, "foto.png")
+        Image.effect_noise((3000, 1000), 64).convert("RGB").save(ruta)
+        resultado = preparar_imagen(ruta, "foto.png", self.dir.name, 1280, 85)
+        with Image.open(resultado["ruta"]) as img:
+            self.assertEqual(img.size, (1280, 427))
+        self.assertEqual(resultado["nombre"], "foto.jpg")
+
+
+@unittest.skipIf(Image is None, "Pillow no está instalado")
+class ArchivosNoDecodificablesTest(unittest.TestCase):
+    """Lo que Pillow no decodifica se envía igual si es una imagen; si no, es inválido"""
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+
+    def preparar(self, nombre, contenido):
+        ruta = os.path.join(self.dir.name, nombre)
+        with open(ruta, "wb") as f:
+            f.write(contenido)
+        return ruta, preparar_imagen(ruta, nombre, self.dir.name, 1280, 85)
+
+    def test_heic_se_envia_original(self):
+        ruta, resultado = self.preparar("IMG_0001.HEIC", b"\x00\x00\x00\x18ftypheic" + os.urandom(2048))
+        self.assertTrue(resultado["valida"])
+        self.assertEqual(resultado["ruta"], ruta)
+        self.assertIsNotNone(resultado["sha256"])
+        # No quedan copias a medio escribir
+        self.assertEqual(os.listdir(self.dir.name), ["IMG_0001.HEIC"])
+
+    def test_texto_con_extension_de_imagen_no_es_valido(self):
+        _, resultado = self.preparar("rx.jpg", b"esto no es una imagen")
+        self.assertFalse(resultado["valida"])
+        self.assertIn("Imagen no válida", resultado["error"])
+
+    def test_vacio_o_demasiado_grande_no_es_valido(self):
+        _, resultado = self.preparar("vacia.jpg", b"")
+        self.assertFalse(resultado["valida"])
+        ruta = os.path.join(self.dir.name, "grande.jpg")
+        with open(ruta, "wb") as f:
+            f.write(b"\xff\xd8\xff\xe0" + b"0" * 2048)
+        resultado = preparar_imagen(ruta, "grande.jpg", self.dir.name, 1280, 85, max_bytes=1024)
+        self.assertFalse(resultado["valida"])
+        self.assertIn("supera el máximo", resultado["error"])
+
+
+if __name__ == "__main__":
+    unittest.main()
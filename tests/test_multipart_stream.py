@@ -0,0 +1,95 @@
+import os
+import tempfile
+import unittest
+
+from stub_server import leer_multipart
+
+from multipart_stream import MultipartStreamEncoder, detectar_content_type
+
+
+class MultipartStreamEncoderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.jpg = self._archivo("rx.jpg", b"\xff\xd8\xff\xe0" + os.urandom(200_000))
+        self.png = self._archivo("eco.bin", b"\x89PNG\r\n\x1a\n" + os.urandom(1000))
+
+    def _archivo(self, nombre, contenido):
+        ruta = os.path.join(self.dir.name, nombre)
+        with open(ruta, "wb") as f:
+            f.write(contenido)
+        return ruta
+
+    def test_el_cuerpo_se_lee_de_vuelta_igual(self):
+        progreso = []
+        body = MultipartStreamEncoder(
+            [("cita_id", 5), ("diagnostico", "Neumonía leve")],
+            [
+                ("imagenes", "rx.jpg", self.jpg, "image/jpeg"),
+                ("imagenes", "eco.png", self.png, "image/png"),
+            ],
+            chunk_size=4096,
+            on_progress=lambda enviados, total: progreso.append((enviados, total)),
+        )
+        bloques = list(body)
+        body.close()
+        cuerpo = b"".join(bloques)
+
+        self.assertEqual(len(cuerpo), len(body))
+        self.assertEqual(progreso[-1], (len(body), len(body)))
+        self.assertTrue(all(len(b) <= 4096 for b in bloques))
+        with open(self.jpg, "rb") as f:
+            jpg = f.read()
+        with open(self.png, "rb") as f:
+            png = f.read()
+        self.assertEqual(
+            leer_multipart(body.content_type, cuerpo),
+            [
+                ("cita_id", None, b"5"),
+                ("diagnostico", None, "Neumonía leve".encode("utf-8")),
+                ("imagenes", "rx.jpg", jpg),
+                ("imagenes", "eco.png", png),
+            ]
+        )
+
+    def test_read_entrega_bloques_del_tamano_pedido(self):
+        body = MultipartStreamEncoder([], [("imagenes", "rx.jpg", self.jpg, "image/jpeg")], chunk_size=1024)
+        bloques = []
+        while True:
+            bloque = body.read(100)
+            if not bloque:
+                break
+            bloques.append(bloque)
+        body.close()
+        self.assertTrue(all(len(b) <= 100 for b in bloques))
+        self.assertEqual(sum(len(b) for b in bloques), len(body))
+
+    def test_nombres_con_comillas_y_saltos_de_linea_no_rompen_la_cabecera(self):
+        body = MultipartStreamEncoder(
+            [('no"ta', "x")],
+            [("imagenes", 'rx "frontal"\r\nX-Inyectada: 1.jpg', self.jpg, "image/jpeg")],
+        )
+        cuerpo = b"".join(body)
+        body.close()
+        cabecera = cuerpo.split(b"\r\n\r\n")[1].split(b"\r\n")
+        self.assertEqual(
+            cabecera[-2],
+            b'Content-Disposition: form-data; name="imagenes"; filename="rx %22frontal%22%0D%0AX-Inyectada: 1.jpg"'
+        )
+        self.assertEqual(
+            [(n, f) for n, f, _ in leer_multipart(body.content_type, cuerpo)],
+            [("no%22ta", None), ("imagenes", "rx %22frontal%22%0D%0AX-Inyectada: 1.jpg")]
+        )
+
+    def test_detecta_el_tipo_por_contenido(self):
+        self.assertEqual(detectar_content_type(self.jpg), "image/jpeg")
+        # La extensión no coincide: manda la firma del archivo
+        self.assertEqual(detectar_content_type(self.png, "eco.jpg"), "image/png")
+        texto = self._archivo("notas.txt", b"hola")
+        self.assertEqual(detectar_content_type(texto), "text/plain")
+        self.assertEqual(detectar_content_type(os.path.join(self.dir.name, "x.sin"), "x.sin"), "application/octet-stream")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+import os
+import tempfile
+import time
+import unittest
+
+import stub_server  # noqa: F401  (agrega la raíz del repositorio a sys.path)
+
+from outbox import AtencionOutbox, PENDIENTE, ENVIANDO, ENVIADA, ERROR
+
+
+class ClienteFalso:
+    """registrar_atencion responde con lo que la prueba deja en `respuestas`"""
+
+    def __init__(self):
+        self.user_id = 7
+        self.sesion = True
+        self.respuestas = []
+        self.envios = []
+
+    def is_logged_in(self):
+        return self.sesion
+
+    def registrar_atencion(self, **kwargs):
+        self.envios.append(kwargs)
+        return self.respuestas.pop(0)
+
+
+class Archivo:
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+
+
+class AtencionOutboxTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.client = ClienteFalso()
+        self.outbox = AtencionOutbox(self.client, self.dir.name)
+        self.cambios = []
+        self.outbox.suscribir(lambda clave, estado: self.cambios.append(estado))
+
+        self.imagen = Archivo(os.path.join(self.dir.name, "rx.jpg"))
+        with open(self.imagen.path, "wb") as f:
+            f.write(b"\xff\xd8\xff\xe0rx")
+
+    def encolar(self, **kwargs):
+        return self.outbox.encolar(1, "respiratorio", "dx", "rec", imagenes=[self.imagen], paciente_id=3, **kwargs)
+
+    def test_enviada_borra_las_copias_de_las_imagenes(self):
+        clave = self.encolar(reservar=True)
+        self.assertEqual(self.outbox.estado(clave), ENVIANDO)
+        self.assertTrue(os.path.isdir(os.path.join(self.dir.name, clave)))
+
+        self.client.respuestas.append({"id_atencion": 1})
+        self.outbox.enviar(clave)
+
+        self.assertEqual(self.outbox.estado(clave), ENVIADA)
+        self.assertEqual(self.outbox.cita(clave), 1)
+        self.assertFalse(os.path.exists(os.path.join(self.dir.name, clave)))
+        self.assertEqual(self.client.envios[0]["idempotency_key"], clave)
+        self.assertEqual(self.cambios, [ENVIANDO, ENVIADA])
+
+    def test_error_reintentable_vuelve_a_la_cola_con_backoff(self):
+        clave = self.encolar(reservar=True)
+        self.client.respuestas.append({"error": "sin conexión", "reintentable": True})
+        self.outbox.enviar(clave)
+
+        fila = self.outbox._fila(clave)
+        self.assertEqual(fila["estado"], PENDIENTE)
+        self.assertEqual(fila["intentos"], 1)
+        self.assertEqual(fila["ultimo_error"], "sin conexión")
+        self.assertGreater(fila["proximo_intento"], time.time())
+        # Las imágenes siguen guardadas para el próximo intento
+        self.assertTrue(os.path.isdir(os.path.join(self.dir.name, clave)))
+
+    def test_error_definitivo_queda_en_error_hasta_reintentar(self):
+        clave = self.encolar(reservar=True)
+        self.client.respuestas.append({"error": "Error 422: cita inválida"})
+        self.outbox.enviar(clave)
+        self.assertEqual(self.outbox.estado(clave), ERROR)
+
+        self.outbox.reintentar(clave)
+        self.assertEqual(self.outbox.estado(clave), PENDIENTE)
+        self.assertEqual(self.outbox._reclamar(), clave)
+
+    def test_la_misma_clave_no_se_encola_dos_veces(self):
+        clave = self.encolar(clave="clave-1")
+        self.assertEqual(self.encolar(clave="clave-1"), clave)
+        self.assertEqual(len(self.outbox.listar()), 1)
+
+    def test_al_arrancar_lo_que_se_estaba_enviando_vuelve_a_la_cola(self):
+        clave = self.encolar(reservar=True)
+        otra = AtencionOutbox(self.client, self.dir.name)
+        self.assertEqual(otra.estado(clave), PENDIENTE)
+
+    def test_reclamar_solo_lo_vencido_del_medico_actual(self):
+        primera = self.encolar()
+        segunda = self.encolar()
+        self.outbox._actualizar(segunda, proximo_intento=time.time() + 60)
+
+        self.client.sesion = False
+        self.assertIsNone(self.outbox._reclamar())
+        self.client.sesion = True
+        self.client.user_id = 8
+        self.assertIsNone(self.outbox._reclamar())
+        self.client.user_id = 7
+
+        self.assertEqual(self.outbox._reclamar(), primera)
+        self.assertEqual(self.outbox.estado(primera), ENVIANDO)
+        # La otra aún no vence y la primera ya está reclamada
+        self.assertIsNone(self.outbox._reclamar())
+
+    def test_descartar(self):
+        clave = self.encolar()
+        self.outbox.descartar(clave)
+        self.assertIsNone(self.outbox.estado(clave))
+        self.assertFalse(os.path.exists(os.path.join(self.dir.name, clave)))
+        self.assertEqual(self.cambios[-1], None)
+
+
+if __name__ == "__main__":
+    unittest.main()
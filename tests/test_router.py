@@ -0,0 +1,81 @@
+import unittest
+from unittest import mock
+
+import stub_server  # noqa: F401  (agrega la raíz del repositorio a sys.path)
+
+import main
+
+
+class VistaFalsa:
+    def __init__(self, nombre, registro):
+        self.nombre = nombre
+        self.registro = registro
+
+    def show(self):
+        self.registro.append(("show", self.nombre))
+
+    def reanudar(self):
+        self.registro.append(("reanudar", self.nombre))
+
+    def pausar(self):
+        self.registro.append(("pausar", self.nombre))
+
+    def cerrar(self):
+        self.registro.append(("cerrar", self.nombre))
+
+
+class RouterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.registro = []
+        self.router = main.Router(mock.MagicMock(), mock.MagicMock(), mock.MagicMock())
+        self.router._crear = lambda to, kwargs: VistaFalsa(
+            f"{to}:{kwargs['cita_id']}" if "cita_id" in kwargs else to, self.registro
+        )
+
+    def atender(self, cita_id):
+        self.router("atencion", cita_id=cita_id, paciente_id=100 + cita_id)
+
+    def cerradas(self):
+        return [n for accion, n in self.registro if accion == "cerrar"]
+
+    def test_reusa_la_vista_y_pausa_la_anterior(self):
+        self.router("main")
+        self.router("citas")
+        self.router("main")
+        self.assertEqual(
+            self.registro,
+            [("show", "main"), ("pausar", "main"), ("show", "citas"), ("pausar", "citas"), ("reanudar", "main")]
+        )
+
+    def test_solo_conserva_las_atenciones_mas_recientes(self):
+        for cita_id in range(1, main.Router.MAX_ATENCIONES + 1):
+            self.atender(cita_id)
+            self.router("citas")
+        # Volver a la primera la hace la más reciente
+        self.atender(1)
+        self.router("citas")
+        self.atender(99)
+
+        self.assertEqual(self.cerradas(), ["atencion:2"])
+        atenciones = [c for c in self.router._vistas if c[0] == "atencion"]
+        self.assertEqual(len(atenciones), main.Router.MAX_ATENCIONES)
+
+    def test_invalidar_la_atencion_de_una_cita(self):
+        self.atender(1)
+        self.router("citas")
+        self.atender(2)
+        self.router.invalidate("atencion", cita_id=1)
+        self.assertEqual(self.cerradas(), ["atencion:1"])
+
+        # La que está en pantalla se cierra al salir de ella
+        self.router.invalidate("atencion", cita_id=2)
+        self.assertEqual(self.cerradas(), ["atencion:1"])
+        self.router("citas")
+        self.assertEqual(self.cerradas(), ["atencion:1", "atencion:2"])
+        self.atender(2)
+        self.assertEqual(self.registro[-1], ("show", "atencion:2"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+import stub_server  # noqa: F401  (agrega la raíz del repositorio a sys.path)
+
+from views.virtual_table import VirtualColumn, VirtualTable
+
+
+class Evento:
+    """OnScrollEvent mínimo"""
+
+    def __init__(self, pixels):
+        self.pixels = pixels
+        self.viewport_dimension = None
+        self.min_scroll_extent = 0
+
+
+class VirtualTableTest(unittest.TestCase):
+
+    def tabla(self, **kwargs):
+        tabla = VirtualTable(
+            [VirtualColumn("ID"), VirtualColumn("Nombre")],
+            values_fn=lambda r: (str(r["id"]), r["nombre"]),
+            row_height=10, overscan=0, viewport_rows=3, **kwargs
+        )
+        tabla.body.update = lambda: None
+        return tabla
+
+    def filas(self, tabla):
+        return [c for c in tabla.body.controls[1:-1] if c.visible]
+
+    def test_por_clave_la_fila_sigue_a_su_registro(self):
+        registros = [{"id": i, "nombre": f"P{i}"} for i in range(10)]
+        tabla = self.tabla(key_fn=lambda r: r["id"])
+        tabla.set_data(registros)
+        antes = self.filas(tabla)
+
+        tabla._on_scroll(Evento(10))
+        despues = self.filas(tabla)
+        # Los registros 1 y 2 conservan su fila; solo la del 0 pasa al 3
+        self.assertEqual(despues[:2], antes[1:])
+        self.assertIs(despues[2], antes[0])
+        self.assertEqual([c.content.controls[0].content.value for c in despues], ["1", "2", "3"])
+
+        # Un registro nuevo en medio de la ventana toma la fila libre; los demás no se tocan
+        stats = tabla.set_data(registros[:2] + [{"id": 99, "nombre": "Nuevo"}] + registros[2:])
+        self.assertEqual(self.filas(tabla), [despues[0], despues[2], despues[1]])
+        self.assertEqual(stats["celdas_actualizadas"], 2)
+
+        # Con el desplazamiento la vista sigue en los mismos registros: nada cambia
+        stats = tabla.set_data([{"id": 100, "nombre": "Otro"}] + tabla._data, desplazamiento=-1)
+        self.assertEqual(self.filas(tabla), [despues[0], despues[2], despues[1]])
+        self.assertEqual(stats["celdas_actualizadas"], 0)
+
+    def test_por_posicion_reasigna_todas_las_filas(self):
+        tabla = self.tabla()
+        tabla.set_data([{"id": i, "nombre": f"P{i}"} for i in range(10)])
+        antes = self.filas(tabla)
+        stats = tabla._render()
+        self.assertEqual(stats["celdas_actualizadas"], 0)
+        tabla._on_scroll(Evento(10))
+        self.assertEqual(self.filas(tabla), antes)
+        self.assertEqual([c.content.controls[0].content.value for c in antes], ["1", "2", "3"])
+
+
+if __name__ == "__main__":
+    unittest.main()
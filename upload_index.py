@@ -0,0 +1,66 @@
+# upload_index.py
+import json
+import os
+import threading
+import time
+from typing import Dict, Iterable
+
+
+class UploadIndex:
+    """
+    Índice local de los hashes SHA-256 de imágenes que el backend ya aceptó,
+    separado por servidor (API_URL).
+    Se guarda en un archivo JSON para que sobreviva entre sesiones; si el
+    archivo falta o está dañado se empieza con el índice vacío.
+    Al superar `max_entradas` se olvidan los hashes usados hace más tiempo.
+    """
+
+    def __init__(self, ruta: str, servidor: str, max_entradas: int = 5000):
+        self.ruta = ruta
+        self.servidor = servidor
+        self.max_entradas = max_entradas
+        self._lock = threading.Lock()
+        self._datos = None
+
+    def _cargar(self) -> Dict:
+        if self._datos is None:
+            try:
+                with open(self.ruta, "r", encoding="utf-8") as f:
+                    self._datos = json.load(f)
+            except (OSError, ValueError):
+                self._datos = {}
+        return self._datos.setdefault(self.servidor, {})
+
+    def _guardar(self):
+        try:
+            os.makedirs(os.path.dirname(self.ruta) or ".", exist_ok=True)
+            temporal = f"{self.ruta}.tmp"
+            with open(temporal, "w", encoding="utf-8") as f:
+                json.dump(self._datos, f)
+            os.replace(temporal, self.ruta)
+        except OSError as e:
+            print(f"[API] No se pudo guardar el índice de imágenes: {e}")
+
+    def contiene(self, sha256: str) -> bool:
+        with self._lock:
+            return sha256 in self._cargar()
+
+    def agregar(self, hashes: Iterable[str]):
+        """Registra hashes aceptados por el backend"""
+        with self._lock:
+            entradas = self._cargar()
+            ahora = time.time()
+            for h in hashes:
+                entradas[h] = ahora
+            if len(entradas) > self.max_entradas:
+                for h in sorted(entradas, key=entradas.get)[:len(entradas) - self.max_entradas]:
+                    del entradas[h]
+            self._guardar()
+
+    def quitar(self, hashes: Iterable[str]):
+        """Olvida hashes que el backend ya no reconoce"""
+        with self._lock:
+            entradas = self._cargar()
+            for h in hashes:
+                entradas.pop(h, None)
+            self._guardar()
@@ -1,7 +1,22 @@
+import importlib
+
 from .login_view import LoginView
-from .main_view import MainView
-from .citas_view import CitasView
-from .atencion_view import AtencionView
-from .historial_view import HistorialView
 
-__all__ = ["LoginView", "MainView", "CitasView", "AtencionView", "HistorialView"]
\ No newline at end of file
+# Las demás vistas se importan la primera vez que se usan (PEP 562), después de pintar el login
+_VISTAS = {
+    "MainView": ".main_view",
+    "CitasView": ".citas_view",
+    "AtencionView": ".atencion_view",
+    "HistorialView": ".historial_view",
+}
+
+
+def __getattr__(nombre):
+    if nombre in _VISTAS:
+        vista = getattr(importlib.import_module(_VISTAS[nombre], __name__), nombre)
+        globals()[nombre] = vista
+        return vista
+    raise AttributeError(f"module {__name__!r} has no attribute {nombre!r}")
+
+
+__all__ = ["LoginView", "MainView", "CitasView", "AtencionView", "HistorialView"]
@@ -1,13 +1,21 @@
+import asyncio
 import flet as ft
 import os
+import uuid
+from image_pipeline import get_pipeline, imagen_no_valida
+from . import estilos
+from outbox import PENDIENTE, ENVIANDO, ENVIADA, ERROR
 
 class AtencionView:
-    def __init__(self, page: ft.Page, api_client, on_navigate, cita_id: int, paciente_id: int):
+    def __init__(self, page: ft.Page, api_client, on_navigate, cita_id: int, paciente_id: int, outbox):
         self.page = page
         self.api = api_client
         self.on_navigate = on_navigate
         self.cita_id = cita_id
         self.paciente_id = paciente_id
+        self.outbox = outbox
+        # Clave de idempotencia del envío actual del formulario; vive hasta que el backend lo confirma
+        self._clave_envio = None
         
         # Colores consistentes con otras vistas
         self.COLOR_PRIMARIO = "#007BFF"
@@ -15,6 +23,8 @@ class AtencionView:
         self.COLOR_EXITO = "#28A745"
         self.COLOR_ERROR = "#DC3545"
         self.COLOR_FONDO_CLARO = "#F8F9FA"
+        # Tarjetas de resultados YOLO que se agregan antes de ceder el bucle de eventos
+        self.RESULTADOS_POR_LOTE = 4
 
         # Estilos de texto
         text_style = ft.TextStyle(font_family="Roboto", color=self.COLOR_TEXTO)
@@ -59,11 +69,12 @@ class AtencionView:
         )
         
         self.uploaded_images = []
+        self._preparacion = []  # futuros de las imágenes que se preparan en segundo plano
         self.yolo_results = ft.Column(spacing=10, scroll=ft.ScrollMode.AUTO)
         self.file_picker = ft.FilePicker(on_result=self.on_files_selected)
         page.overlay.append(self.file_picker)
 
-        self.paciente_info = self.api.get_paciente_info(self.paciente_id)
+        self.paciente_info = {}
         self.image_count_text = ft.Text(
             "0 imágenes adjuntas", 
             color=self.COLOR_TEXTO,
@@ -71,12 +82,57 @@ class AtencionView:
             weight=ft.FontWeight.W_500
         )
 
+        # Progreso de subida de imágenes
+        self.upload_progress = ft.ProgressBar(value=0, color=self.COLOR_PRIMARIO, visible=False)
+        self.upload_text = ft.Text(
+            "",
+            size=12,
+            color=ft.Colors.GREY_600,
+            font_family="Roboto",
+            visible=False
+        )
+        self._ultimo_progreso = 0.0
+        # Avance por imagen en las subidas por bloques
+        self.upload_archivos = ft.Column(spacing=4, visible=False)
+        self._progreso_archivos = []
+
+        # Resultados YOLO: imágenes del envío en curso e índices ya pintados en vivo
+        self._imagenes_envio = []
+        self._resultados_en_vivo = set()
+
+        # Estado de las atenciones en la cola local de envíos
+        self.outbox_panel = ft.Column(spacing=4, visible=False)
+
+        # En pantalla; lo apaga pausar() al salir de la vista
+        self.activa = False
+
         # Inicializar SnackBar
         self.page.snack_bar = ft.SnackBar(
             content=ft.Text("Mensaje temporal"),
             duration=3000
         )
 
+    async def cargar_paciente(self):
+        """Obtiene (o revalida) la información del paciente en segundo plano."""
+        info = await self.api.get_paciente_info(self.paciente_id)
+        if not info and self.paciente_info:
+            # Sin respuesta: se mantiene la información precargada
+            return
+        self.paciente_info = info
+        self._pintar_paciente()
+        self.page.update()
+
+    def _pintar_paciente(self):
+        """Vuelca self.paciente_info en los textos de la tarjeta del paciente."""
+        info = self.paciente_info
+        self.paciente_nombre.value = info.get('paciente', 'N/A')
+        self.paciente_edad.value = f"{info.get('edad', 'N/A')} años"
+        self.paciente_tipo.value = info.get('tipo_paciente', 'N/A')
+        self.paciente_correo.value = info.get('correo', 'N/A')
+        self.paciente_peso.value = f"Peso: {info.get('peso', 'N/A')} kg"
+        self.paciente_talla.value = f"Talla: {info.get('talla', 'N/A')} m"
+        self.paciente_enfermedades.value = f"Enfermedades: {info.get('enfermedades', 'Ninguna')}"
+
     def _show_snack_bar(self, message: str, color: str):
         """Muestra notificaciones al usuario."""
         self.page.snack_bar.content = ft.Text(message, font_family="Roboto")
@@ -87,29 +143,217 @@ class AtencionView:
     def on_files_selected(self, e: ft.FilePickerResultEvent):
         """Maneja la selección de archivos."""
         if e.files:
+            self._descartar_preparacion()
             self.uploaded_images = e.files
-            self.image_count_text.value = f"✅ {len(e.files)} imágenes adjuntas"
-            self.image_count_text.color = self.COLOR_EXITO
+            # Empezar a validar, reducir y calcular el hash de inmediato, sin esperar a Guardar
+            pipeline = get_pipeline()
+            self._preparacion = [pipeline.submit(f) for f in e.files]
+            self.image_count_text.value = f"⏳ Preparando {len(e.files)} imágenes..."
+            self.image_count_text.color = self.COLOR_PRIMARIO
             self._show_snack_bar(
                 f"✅ {len(e.files)} imágenes cargadas exitosamente", 
                 self.COLOR_EXITO
             )
+            self.page.run_task(self._esperar_preparacion, self._preparacion, e.files)
         else:
             self.image_count_text.value = "❌ 0 imágenes adjuntas"
             self.image_count_text.color = self.COLOR_ERROR
         self.page.update()
 
+    async def _imagenes_preparadas(self, futuros, archivos) -> list:
+        """Espera la preparación; la imagen cuyo futuro falló queda como no válida."""
+        resultados = await asyncio.gather(*[asyncio.wrap_future(f) for f in futuros], return_exceptions=True)
+        return [
+            imagen_no_valida(archivo, r) if isinstance(r, BaseException) else r
+            for r, archivo in zip(resultados, archivos)
+        ]
+
+    async def _esperar_preparacion(self, futuros, archivos):
+        """Cuando terminan de prepararse las imágenes, marca las que no son válidas."""
+        imagenes = await self._imagenes_preparadas(futuros, archivos)
+        if futuros is not self._preparacion:
+            # El usuario eligió otras imágenes mientras tanto
+            return
+        invalidas = [i for i in imagenes if not i.valida]
+        listas = len(imagenes) - len(invalidas)
+        if invalidas:
+            nombres = ", ".join(os.path.basename(i.datos["nombre_original"]) for i in invalidas)
+            self.image_count_text.value = (
+                f"⚠️ {listas} imágenes listas · {len(invalidas)} no válidas: {nombres}. "
+                "Vuelva a adjuntar sin ellas para guardar"
+            )
+            self.image_count_text.color = self.COLOR_ERROR
+        else:
+            self.image_count_text.value = f"✅ {listas} imágenes listas"
+            self.image_count_text.color = self.COLOR_EXITO
+        self.page.update()
+
+    def _descartar_preparacion(self):
+        """Borra las copias temporales de una selección de imágenes que ya no se usará."""
+        pipeline = get_pipeline()
+        for f in self._preparacion:
+            f.add_done_callback(lambda f: pipeline.limpiar([f.result()]) if not f.exception() else None)
+        self._preparacion = []
+
+    def _on_upload_progress(self, enviados: int, total: int):
+        """Actualiza la barra de subida (se llama desde el hilo que envía la petición)."""
+        fraccion = enviados / total if total else 1.0
+        # Limitar los repintados a saltos de al menos 2 %
+        if fraccion < 1.0 and fraccion - self._ultimo_progreso < 0.02:
+            return
+        self._ultimo_progreso = fraccion
+        self.upload_progress.value = fraccion
+        self.upload_text.value = f"Subiendo imágenes... {fraccion:.0%} ({enviados / 1_048_576:.1f} de {total / 1_048_576:.1f} MB)"
+        self.page.update()
+
+    def _on_file_progress(self, indice: int, enviados: int, total: int):
+        """Actualiza la barra de una imagen (se llama desde el hilo que sube los bloques)."""
+        if indice >= len(self._progreso_archivos):
+            return
+        self.upload_archivos.visible = True
+        self._progreso_archivos[indice].value = enviados / total if total else 1.0
+        self.page.update()
+
+    def _mostrar_progreso(self, visible: bool, imagenes=()):
+        self._ultimo_progreso = 0.0
+        self.upload_progress.value = 0
+        self.upload_progress.visible = visible
+        self.upload_text.value = ""
+        self.upload_text.visible = visible
+        self._progreso_archivos = [ft.ProgressBar(value=0, width=200, color=self.COLOR_PRIMARIO) for _ in imagenes]
+        self.upload_archivos.controls = [
+            ft.Row([
+                ft.Text(os.path.basename(img.datos["nombre_original"]), size=12, color=ft.Colors.GREY_600, font_family="Roboto", expand=True),
+                barra
+            ], spacing=10)
+            for img, barra in zip(imagenes, self._progreso_archivos)
+        ]
+        # Solo se muestra si el backend sube por bloques (ver _on_file_progress)
+        self.upload_archivos.visible = False
+
+    def _pintar_outbox(self):
+        """Lista las últimas atenciones de la cola local con su estado."""
+        etiquetas = {
+            PENDIENTE: ("⏳", "En cola", self.COLOR_PRIMARIO),
+            ENVIANDO: ("📤", "Enviando", self.COLOR_PRIMARIO),
+            ENVIADA: ("✅", "Enviada", self.COLOR_EXITO),
+            ERROR: ("❌", "Rechazada", self.COLOR_ERROR),
+        }
+        filas = []
+        for a in self.outbox.listar(limite=5):
+            icono, etiqueta, color = etiquetas[a["estado"]]
+            texto = f"{icono} Cita #{a['cita_id']} · {etiqueta}"
+            if a["estado"] == PENDIENTE and a["intentos"]:
+                texto += f" (sin conexión, intento {a['intentos']})"
+            elif a["estado"] == ERROR:
+                texto += f": {a['ultimo_error']}"
+            controles = [ft.Text(texto, size=12, color=color, font_family="Roboto", expand=True)]
+            if a["estado"] == ERROR:
+                controles += [
+                    ft.TextButton("Reintentar", on_click=lambda e, c=a["clave"]: self.outbox.reintentar(c)),
+                    ft.TextButton("Descartar", on_click=lambda e, c=a["clave"]: self.outbox.descartar(c)),
+                ]
+            filas.append(ft.Row(controles, spacing=5))
+        if filas:
+            filas.insert(0, ft.Text("Envíos recientes", size=13, weight=ft.FontWeight.BOLD, color=self.COLOR_TEXTO, font_family="Roboto"))
+        self.outbox_panel.controls = filas
+        self.outbox_panel.visible = bool(filas)
+
+    def _on_outbox_cambio(self, clave: str, estado: str):
+        """Repinta el panel de envíos (se llama desde el hilo de la cola)."""
+        if not self.activa:
+            # Aviso que llegó mientras la vista se pausaba
+            return
+        self._pintar_outbox()
+        self.outbox_panel.update()
+
+    def _encabezado_resultados(self):
+        return ft.Container(
+            content=ft.Row([
+                ft.Icon(ft.Icons.CHECK_CIRCLE, color=self.COLOR_EXITO, size=24),
+                ft.Text(
+                    "Detecciones realizadas con éxito", 
+                    size=16, 
+                    weight=ft.FontWeight.BOLD,
+                    color=self.COLOR_EXITO,
+                    font_family="Roboto"
+                ),
+            ]),
+            padding=10,
+            bgcolor=ft.Colors.with_opacity(0.1, self.COLOR_EXITO),
+            border_radius=10,
+        )
+
+    def _sin_resultados(self):
+        return ft.Container(
+            content=ft.Column([
+                ft.Icon(ft.Icons.INFO_OUTLINE, size=40, color=ft.Colors.GREY_400),
+                ft.Text(
+                    "No se procesaron imágenes",
+                    size=14,
+                    color=ft.Colors.GREY_600,
+                    font_family="Roboto",
+                    text_align=ft.TextAlign.CENTER
+                )
+            ], 
+            horizontal_alignment=ft.CrossAxisAlignment.CENTER,
+            spacing=10),
+            padding=30,
+            alignment=ft.alignment.center
+        )
+
+    def _nombre_imagen(self, idx: int) -> str:
+        imagenes = self._imagenes_envio
+        return imagenes[idx].datos["nombre_original"] if idx < len(imagenes) else f"Imagen {idx + 1}"
+
+    async def _pintar_resultados(self, resultados: list, limpiar: bool = True):
+        """
+        Agrega las tarjetas de resultados por lotes de RESULTADOS_POR_LOTE,
+        enviando cada lote a la interfaz y cediendo el bucle de eventos entre uno y otro
+        para que las primeras tarjetas se vean sin esperar a las demás.
+        `resultados` es una lista de (índice de imagen, detecciones).
+        Si la vista no está en pantalla solo se agregan los controles; se ven al volver a ella.
+        """
+        if limpiar:
+            # Limpiar resultados anteriores
+            self.yolo_results.controls.clear()
+            if resultados:
+                self.yolo_results.controls.append(self._encabezado_resultados())
+            else:
+                # No hay detecciones
+                self.yolo_results.controls.append(self._sin_resultados())
+            if self.activa:
+                self.yolo_results.update()
+        for inicio in range(0, len(resultados), self.RESULTADOS_POR_LOTE):
+            for idx, detecciones in resultados[inicio:inicio + self.RESULTADOS_POR_LOTE]:
+                self.yolo_results.controls.append(estilos.tarjeta_imagen(os.path.basename(self._nombre_imagen(idx)), detecciones))
+            if self.activa:
+                self.yolo_results.update()
+                await asyncio.sleep(0)
+
+    def _on_resultado_imagen(self, idx: int, detecciones: list):
+        """Agrega la tarjeta de una imagen en cuanto llega su resultado (se llama desde el hilo del envío)."""
+        if not self._resultados_en_vivo:
+            self.yolo_results.controls.clear()
+            self.yolo_results.controls.append(self._encabezado_resultados())
+        self._resultados_en_vivo.add(idx)
+        self.yolo_results.controls.append(estilos.tarjeta_imagen(os.path.basename(self._nombre_imagen(idx)), detecciones))
+        if self.activa:
+            self.yolo_results.update()
+
     def resetear_formulario(self):
         """Resetea todos los campos del formulario."""
         self.sistema.value = ""
         self.diagnostico.value = ""
         self.recomendaciones.value = ""
+        self._descartar_preparacion()
+        self._clave_envio = None
         self.uploaded_images = []
         self.image_count_text.value = "0 imágenes adjuntas"
         self.image_count_text.color = self.COLOR_TEXTO
         self.page.update()
 
-    def guardar_atencion(self, e):
+    async def guardar_atencion(self, e):
         """Guarda la atención médica y procesa las imágenes con YOLO."""
         if not all([self.sistema.value, self.diagnostico.value, self.recomendaciones.value]):
             self._show_snack_bar("⚠️ Complete todos los campos obligatorios", self.COLOR_ERROR)
@@ -118,161 +362,96 @@ class AtencionView:
         # Deshabilitar botón mientras procesa
         e.control.disabled = True
         e.control.text = "Procesando..."
+        self._mostrar_progreso(bool(self.uploaded_images))
         self.page.update()
 
-        response = self.api.registrar_atencion(
-            cita_id=self.cita_id,
-            sistema=self.sistema.value,
-            diagnostico=self.diagnostico.value,
-            recomendaciones=self.recomendaciones.value,
-            imagenes=self.uploaded_images
-        )
-        
-        # Rehabilitar botón
-        e.control.disabled = False
-        e.control.text = "Guardar Atención"
-        self.page.update()
+        try:
+            # Las imágenes se prepararon al elegirlas; aquí solo se espera a las que falten
+            imagenes = []
+            if self._preparacion:
+                if not all(f.done() for f in self._preparacion):
+                    e.control.text = "Preparando imágenes..."
+                    self.page.update()
+                preparadas = await self._imagenes_preparadas(self._preparacion, self.uploaded_images)
+                invalidas = [i for i in preparadas if not i.valida]
+                if invalidas:
+                    # No se guarda una atención sin parte de las imágenes que el médico adjuntó
+                    for i in invalidas:
+                        print(f"[IMG] {i.datos['nombre_original']}: {i.datos['error']}")
+                    nombres = ", ".join(os.path.basename(i.datos["nombre_original"]) for i in invalidas)
+                    self.image_count_text.value = f"⚠️ {len(invalidas)} imágenes no válidas: {nombres}"
+                    self.image_count_text.color = self.COLOR_ERROR
+                    self._show_snack_bar(
+                        f"❌ No se guardó la atención: {nombres} no se pueden enviar. "
+                        "Vuelva a adjuntar las imágenes sin ellas",
+                        self.COLOR_ERROR
+                    )
+                    return
+                imagenes = preparadas
+                resumen = get_pipeline().resumen(imagenes)
+                print(f"[IMG] {resumen}")
+                e.control.text = "Procesando..."
+                self._mostrar_progreso(True, imagenes)
+                self.upload_text.value = (
+                    f"{resumen['imagenes']} imágenes optimizadas: "
+                    f"{resumen['bytes_origen'] / 1_048_576:.1f} MB → {resumen['bytes_final'] / 1_048_576:.1f} MB "
+                    f"en {resumen['segundos']:.1f} s"
+                )
+                self.page.update()
+
+            # Se guarda primero en la cola local para no perder la atención si el envío falla.
+            # La misma clave acompaña todos los reintentos de este envío
+            if self._clave_envio is None:
+                self._clave_envio = uuid.uuid4().hex
+            clave = await asyncio.to_thread(
+                self.outbox.encolar,
+                cita_id=self.cita_id,
+                sistema=self.sistema.value,
+                diagnostico=self.diagnostico.value,
+                recomendaciones=self.recomendaciones.value,
+                imagenes=imagenes,
+                paciente_id=self.paciente_id,
+                reservar=True,
+                clave=self._clave_envio
+            )
+            self._imagenes_envio = imagenes
+            self._resultados_en_vivo = set()
+            response = await asyncio.to_thread(
+                self.outbox.enviar, clave, self._on_upload_progress, self._on_file_progress, self._on_resultado_imagen
+            )
+        except Exception as ex:
+            print(f"[ATENCION] Error al preparar o enviar la atención: {ex!r}")
+            self._show_snack_bar("❌ No se pudo guardar la atención, intente de nuevo", self.COLOR_ERROR)
+            return
+        finally:
+            # Rehabilitar botón aunque la preparación o el envío fallen
+            e.control.disabled = False
+            e.control.text = "Guardar Atención"
+            self._mostrar_progreso(False)
+            self.page.update()
 
         if "error" not in response:
-            # Limpiar resultados anteriores
-            self.yolo_results.controls.clear()
-            
             resultados_yolo = response.get("detections", [])
-            
-            if resultados_yolo and len(resultados_yolo) > 0:
-                # Header de resultados
-                self.yolo_results.controls.append(
-                    ft.Container(
-                        content=ft.Row([
-                            ft.Icon(ft.Icons.CHECK_CIRCLE, color=self.COLOR_EXITO, size=24),
-                            ft.Text(
-                                "Detecciones realizadas con éxito", 
-                                size=16, 
-                                weight=ft.FontWeight.BOLD,
-                                color=self.COLOR_EXITO,
-                                font_family="Roboto"
-                            ),
-                        ]),
-                        padding=10,
-                        bgcolor=ft.Colors.with_opacity(0.1, self.COLOR_EXITO),
-                        border_radius=10,
-                    )
-                )
-                
-                # Procesar cada imagen
-                for idx, detecciones_por_imagen in enumerate(resultados_yolo):
-                    imagen_name = self.uploaded_images[idx].name if idx < len(self.uploaded_images) else f"Imagen {idx + 1}"
-                    
-                    # Crear lista de detecciones
-                    if detecciones_por_imagen:
-                        detections_widgets = []
-                        for d in detecciones_por_imagen:
-                            confidence = d.get('confidence', 0.0)
-                            confidence_color = self.COLOR_EXITO if confidence > 0.7 else self.COLOR_PRIMARIO if confidence > 0.5 else self.COLOR_ERROR
-                            
-                            detections_widgets.append(
-                                ft.Container(
-                                    content=ft.Row([
-                                        ft.Icon(ft.Icons.CIRCLE, size=8, color=confidence_color),
-                                        ft.Text(
-                                            f"{d.get('class', 'N/A')}", 
-                                            color=self.COLOR_TEXTO,
-                                            font_family="Roboto",
-                                            weight=ft.FontWeight.W_500,
-                                            size=14
-                                        ),
-                                        ft.Container(expand=True),
-                                        ft.Text(
-                                            f"{confidence:.1%}", 
-                                            color=confidence_color,
-                                            font_family="Roboto",
-                                            weight=ft.FontWeight.BOLD,
-                                            size=13
-                                        ),
-                                    ]),
-                                    padding=5,
-                                )
-                            )
-                    else:
-                        detections_widgets = [
-                            ft.Text(
-                                "No se detectaron objetos en esta imagen",
-                                color=ft.Colors.GREY_600,
-                                font_family="Roboto",
-                                italic=True,
-                                size=13
-                            )
-                        ]
-                    
-                    # Card para cada imagen
-                    card = ft.Container(
-                        content=ft.Column([
-                            # Header de la imagen
-                            ft.Container(
-                                content=ft.Row([
-                                    ft.Icon(ft.Icons.IMAGE, color=self.COLOR_PRIMARIO, size=20),
-                                    ft.Text(
-                                        os.path.basename(imagen_name),
-                                        weight=ft.FontWeight.BOLD,
-                                        color=self.COLOR_PRIMARIO,
-                                        font_family="Roboto",
-                                        size=15
-                                    ),
-                                    ft.Container(expand=True),
-                                    ft.Container(
-                                        content=ft.Text(
-                                            f"{len(detecciones_por_imagen)} detecciones",
-                                            color=ft.Colors.WHITE,
-                                            font_family="Roboto",
-                                            size=12,
-                                            weight=ft.FontWeight.BOLD
-                                        ),
-                                        padding=ft.padding.symmetric(horizontal=10, vertical=5),
-                                        bgcolor=self.COLOR_PRIMARIO,
-                                        border_radius=15
-                                    )
-                                ]),
-                                padding=10,
-                                bgcolor=ft.Colors.with_opacity(0.05, self.COLOR_PRIMARIO),
-                            ),
-                            # Lista de detecciones
-                            ft.Container(
-                                content=ft.Column(detections_widgets, spacing=2),
-                                padding=10,
-                            )
-                        ]),
-                        bgcolor=ft.Colors.WHITE,
-                        border=ft.border.all(1, ft.Colors.GREY_300),
-                        border_radius=10,
-                        padding=5,
-                        margin=5,
-                    )
-                    self.yolo_results.controls.append(card)
+            if self._resultados_en_vivo:
+                # Las tarjetas ya se fueron agregando mientras llegaba la respuesta
+                faltantes = [(i, d) for i, d in enumerate(resultados_yolo) if i not in self._resultados_en_vivo]
+                await self._pintar_resultados(faltantes, limpiar=False)
             else:
-                # No hay detecciones
-                self.yolo_results.controls.append(
-                    ft.Container(
-                        content=ft.Column([
-                            ft.Icon(ft.Icons.INFO_OUTLINE, size=40, color=ft.Colors.GREY_400),
-                            ft.Text(
-                                "No se procesaron imágenes",
-                                size=14,
-                                color=ft.Colors.GREY_600,
-                                font_family="Roboto",
-                                text_align=ft.TextAlign.CENTER
-                            )
-                        ], 
-                        horizontal_alignment=ft.CrossAxisAlignment.CENTER,
-                        spacing=10),
-                        padding=30,
-                        alignment=ft.alignment.center
-                    )
-                )
-
+                await self._pintar_resultados(list(enumerate(resultados_yolo)))
             self._show_snack_bar("✅ Atención guardada exitosamente", self.COLOR_EXITO)
             # 🛑 CORRECCIÓN: Resetear el formulario después de guardar
             self.resetear_formulario()
+        elif self.outbox.estado(clave) == PENDIENTE:
+            # Sin conexión: la atención queda a salvo en la cola y el médico puede seguir trabajando
+            self._show_snack_bar(
+                "📥 Sin conexión con el servidor: la atención quedó en cola y se enviará automáticamente",
+                self.COLOR_PRIMARIO
+            )
+            self.resetear_formulario()
         else:
+            # Rechazada por el backend: se corrige en el formulario, no se deja en la cola
+            self.outbox.descartar(clave)
+            self._clave_envio = None
             self._show_snack_bar(
                 f"❌ Error: {response.get('error', 'Error desconocido')}", 
                 self.COLOR_ERROR
@@ -281,6 +460,7 @@ class AtencionView:
         self.page.update()
 
     def show(self):
+        self.activa = True
         self.page.clean()
 
         # 🎯 Header con título centrado
@@ -318,6 +498,28 @@ class AtencionView:
         )
 
         # 1. TARJETA DE INFORMACIÓN DEL PACIENTE
+        # Los textos se crean vacíos y se completan cuando llega la información
+        dato_kwargs = dict(size=15, weight=ft.FontWeight.W_600, color=self.COLOR_TEXTO, font_family="Roboto")
+        detalle_kwargs = dict(size=13, color=self.COLOR_TEXTO, font_family="Roboto")
+        self.paciente_nombre = ft.Text("...", **dato_kwargs)
+        self.paciente_edad = ft.Text("...", **dato_kwargs)
+        self.paciente_tipo = ft.Text("...", **dato_kwargs)
+        self.paciente_correo = ft.Text("...", **detalle_kwargs)
+        self.paciente_peso = ft.Text("Peso: ...", **detalle_kwargs)
+        self.paciente_talla = ft.Text("Talla: ...", **detalle_kwargs)
+        self.paciente_enfermedades = ft.Text(
+            "Enfermedades: ...",
+            size=13,
+            weight=ft.FontWeight.W_500,
+            color=self.COLOR_ERROR,
+            font_family="Roboto"
+        )
+        # Si CitasView ya precargó al paciente la tarjeta se pinta completa desde el inicio
+        info, _ = self.api.peek_paciente_info(self.paciente_id)
+        if info:
+            self.paciente_info = info
+            self._pintar_paciente()
+
         paciente_card = ft.Card(
             content=ft.Container(
                 content=ft.Column([
@@ -335,72 +537,33 @@ class AtencionView:
                     ft.Row([
                         ft.Column([
                             ft.Text("Nombre:", size=12, color=ft.Colors.GREY_600, font_family="Roboto"),
-                            ft.Text(
-                                self.paciente_info.get('paciente', 'N/A'),
-                                size=15,
-                                weight=ft.FontWeight.W_600,
-                                color=self.COLOR_TEXTO,
-                                font_family="Roboto"
-                            ),
+                            self.paciente_nombre,
                         ], spacing=2),
                         ft.VerticalDivider(),
                         ft.Column([
                             ft.Text("Edad:", size=12, color=ft.Colors.GREY_600, font_family="Roboto"),
-                            ft.Text(
-                                f"{self.paciente_info.get('edad', 'N/A')} años",
-                                size=15,
-                                weight=ft.FontWeight.W_600,
-                                color=self.COLOR_TEXTO,
-                                font_family="Roboto"
-                            ),
+                            self.paciente_edad,
                         ], spacing=2),
                         ft.VerticalDivider(),
                         ft.Column([
                             ft.Text("Tipo:", size=12, color=ft.Colors.GREY_600, font_family="Roboto"),
-                            ft.Text(
-                                self.paciente_info.get('tipo_paciente', 'N/A'),
-                                size=15,
-                                weight=ft.FontWeight.W_600,
-                                color=self.COLOR_TEXTO,
-                                font_family="Roboto"
-                            ),
+                            self.paciente_tipo,
                         ], spacing=2),
                     ], alignment=ft.MainAxisAlignment.SPACE_EVENLY),
                     ft.Row([
                         ft.Icon(ft.Icons.EMAIL_OUTLINED, size=18, color=ft.Colors.GREY_600),
-                        ft.Text(
-                            self.paciente_info.get('correo', 'N/A'),
-                            size=13,
-                            color=self.COLOR_TEXTO,
-                            font_family="Roboto"
-                        ),
+                        self.paciente_correo,
                     ], spacing=10),
                     ft.Row([
                         ft.Icon(ft.Icons.MONITOR_WEIGHT_OUTLINED, size=18, color=ft.Colors.GREY_600),
-                        ft.Text(
-                            f"Peso: {self.paciente_info.get('peso', 'N/A')} kg",
-                            size=13,
-                            color=self.COLOR_TEXTO,
-                            font_family="Roboto"
-                        ),
+                        self.paciente_peso,
                         ft.Text("|", color=ft.Colors.GREY_400),
-                        ft.Text(
-                            f"Talla: {self.paciente_info.get('talla', 'N/A')} m",
-                            size=13,
-                            color=self.COLOR_TEXTO,
-                            font_family="Roboto"
-                        ),
+                        self.paciente_talla,
                     ], spacing=10),
                     ft.Container(
                         content=ft.Row([
                             ft.Icon(ft.Icons.WARNING_AMBER, size=18, color=self.COLOR_ERROR),
-                            ft.Text(
-                                f"Enfermedades: {self.paciente_info.get('enfermedades', 'Ninguna')}",
-                                size=13,
-                                weight=ft.FontWeight.W_500,
-                                color=self.COLOR_ERROR,
-                                font_family="Roboto"
-                            ),
+                            self.paciente_enfermedades,
                         ], spacing=10),
                         padding=10,
                         bgcolor=ft.Colors.with_opacity(0.1, self.COLOR_ERROR),
@@ -442,6 +605,9 @@ class AtencionView:
                         ),
                         self.image_count_text
                     ], spacing=15, alignment=ft.MainAxisAlignment.START),
+                    self.upload_progress,
+                    self.upload_text,
+                    self.upload_archivos,
                     ft.Divider(height=10),
                     ft.ElevatedButton(
                         "Guardar Atención",
@@ -453,6 +619,7 @@ class AtencionView:
                         style=ft.ButtonStyle(shape=ft.RoundedRectangleBorder(radius=10)),
                         on_click=self.guardar_atencion
                     ),
+                    self.outbox_panel,
                 ], spacing=15, scroll=ft.ScrollMode.AUTO),  # Habilitar scroll
                 padding=20,
             ),
@@ -504,4 +671,27 @@ class AtencionView:
                 expand=True,
             )
         )
-        self.page.update()
\ No newline at end of file
+        self.page.update()
+
+        self._pintar_outbox()
+        self.outbox.suscribir(self._on_outbox_cambio)
+        self.page.run_task(self.cargar_paciente)
+
+    def reanudar(self):
+        """Al volver a la vista desde la caché del router: el formulario conserva lo escrito."""
+        self.activa = True
+        self._pintar_outbox()
+        self.outbox_panel.update()
+        self.outbox.suscribir(self._on_outbox_cambio)
+
+    def pausar(self):
+        """El router sale de la vista: deja de repintar el panel de envíos."""
+        self.activa = False
+        self.outbox.desuscribir(self._on_outbox_cambio)
+
+    def cerrar(self):
+        """Libera lo que la vista dejó en la página al descartarla el router."""
+        self.pausar()
+        self._descartar_preparacion()
+        if self.file_picker in self.page.overlay:
+            self.page.overlay.remove(self.file_picker)
\ No newline at end of file
@@ -1,4 +1,8 @@
+import asyncio
+import time
 import flet as ft
+from . import estilos
+from .virtual_table import VirtualColumn, VirtualTable
 
 class CitasView:
     def __init__(self, page: ft.Page, api_client, on_navigate):
@@ -12,11 +16,144 @@ class CitasView:
         self.COLOR_EXITO = "#28A745"
         self.COLOR_FONDO_CLARO = "#F8F9FA"
         
-        self.citas = self.api.get_citas_aprobadas()
+        # Último listado conocido: se pinta al instante y se revalida en segundo plano
+        self.citas, edad = self.api.peek_citas_aprobadas()
+        self.actualizado_en = time.monotonic() - edad if self.citas is not None else None
+        self.tabla = None
+        self.activa = False  # en pantalla; lo apaga pausar() al salir de la vista
+        self._refrescando_edad = False
+        self.sin_conexion = False  # la última revalidación falló
+
+        # Precarga de la información de los pacientes de las próximas citas
+        self.PACIENTES_A_PRECARGAR = 10
+        self._precargando = False
+
+    def _clave(self, c):
+        return c.get("cita_id") if c.get("cita_id") is not None else c.get("id")
+
+    def _valores(self, c):
+        """Valores de cada celda; la última es el dato del botón Atender."""
+        cita_id_key = self._clave(c)
+        paciente_id = c.get("usuario_paciente_id") or c.get("paciente_id")
+        return (
+            str(cita_id_key),
+            c.get("paciente", "N/A"),
+            f"{c.get('fecha_cita', 'N/A')} {c.get('hora_cita', '')}".strip(),
+            c.get("especialidad", "N/A"),
+            (cita_id_key, paciente_id),
+        )
+
+    def _atender(self, e):
+        cita_id, paciente_id = e.control.data
+        self.on_navigate("atencion", cita_id=cita_id, paciente_id=paciente_id)
+
+    def _boton_atender(self):
+        return ft.ElevatedButton(
+            "Atender", 
+            icon=ft.Icons.MEDICAL_SERVICES, 
+            bgcolor=self.COLOR_EXITO, 
+            color=ft.Colors.WHITE,
+            style=estilos.FORMA_BOTON,
+            on_click=self._atender
+        )
+
+    def _proximos_pacientes(self):
+        """Pacientes de las primeras citas por fecha y hora, sin repetir."""
+        ordenadas = sorted(
+            self.citas or [],
+            key=lambda c: (str(c.get("fecha_cita", "")), str(c.get("hora_cita", "")))
+        )
+        ids = []
+        for c in ordenadas:
+            paciente_id = c.get("usuario_paciente_id") or c.get("paciente_id")
+            if paciente_id is not None and paciente_id not in ids:
+                ids.append(paciente_id)
+            if len(ids) >= self.PACIENTES_A_PRECARGAR:
+                break
+        return ids
+
+    async def precargar_pacientes(self):
+        """
+        Pide en segundo plano la información de los pacientes de las próximas citas
+        (en lote si el backend lo permite). Queda en la caché del cliente, así
+        AtencionView pinta la tarjeta del paciente sin esperar a la red.
+        """
+        if self._precargando:
+            return
+        self._precargando = True
+        try:
+            await self.api.get_pacientes_info(self._proximos_pacientes())
+        finally:
+            self._precargando = False
+
+    def _texto_edad(self) -> str:
+        prefijo = "Sin conexión · " if self.sin_conexion else "Actualizado "
+        if self.actualizado_en is None:
+            return "Sin conexión" if self.sin_conexion else ""
+        segundos = int(time.monotonic() - self.actualizado_en)
+        if segundos < 60:
+            return f"{prefijo}hace {segundos} s"
+        return f"{prefijo}hace {segundos // 60} min"
+
+    async def refrescar_edad(self):
+        """Actualiza el indicador de antigüedad mientras la vista esté en pantalla."""
+        if self._refrescando_edad:
+            return
+        self._refrescando_edad = True
+        try:
+            while self.activa:
+                self.edad_text.value = self._texto_edad()
+                self.edad_text.update()
+                await asyncio.sleep(5)
+        finally:
+            self._refrescando_edad = False
+
+    async def cargar_citas(self):
+        """Revalida las citas en segundo plano y parchea la tabla al recibirlas."""
+        citas = await self.api.revalidar_citas_aprobadas()
+        if citas is None:
+            # Falló la revalidación: se conservan el último listado, la tabla y su antigüedad
+            self.sin_conexion = True
+            if not self.activa:
+                return
+            self.edad_text.value = self._texto_edad()
+            if self.citas is None:
+                self.render()
+            else:
+                self.edad_text.update()
+            return
+
+        self.sin_conexion = False
+        _, edad = self.api.peek_citas_aprobadas()
+        self.actualizado_en = time.monotonic() - (edad or 0)
+        self.page.run_task(self.precargar_pacientes)
+        if not self.activa:
+            # La vista ya no está en pantalla
+            self.citas = citas
+            return
+
+        self.edad_text.value = self._texto_edad()
+        if self.tabla is not None and self.citas and citas:
+            # Solo se envían a la interfaz las celdas que cambiaron
+            self.citas = citas
+            self.tabla.set_data([c for c in self.citas if self._clave(c) is not None])
+            self.edad_text.update()
+        else:
+            self.citas = citas
+            self.render()
 
     def show(self):
+        self.activa = True
         self.page.clean()
 
+        self.edad_text = ft.Text(
+            self._texto_edad(),
+            size=11,
+            color=ft.Colors.GREY_600,
+            font_family="Roboto",
+            text_align=ft.TextAlign.RIGHT
+        )
+
         # 🎯 Header con título centrado (igual que HistorialView)
         header = ft.Container(
             content=ft.Row([
@@ -46,8 +183,8 @@ class CitasView:
                     expand=True,
                     alignment=ft.alignment.center
                 ),
-                # Espaciador derecho para balance
-                ft.Container(width=100),
+                # Indicador de antigüedad de los datos (mismo ancho que el botón para balance)
+                ft.Container(content=self.edad_text, width=100, alignment=ft.alignment.center_right),
             ]),
             padding=20,
             bgcolor=ft.Colors.WHITE,
@@ -55,13 +192,63 @@ class CitasView:
             margin=10,
         )
 
-        # Si no hay citas, mostrar mensaje
+        # Contenedor cuyo contenido se reemplaza al llegar los datos
+        self.body = ft.Container(
+            content=ft.Card(
+                content=ft.Container(
+                    content=ft.ProgressRing(color=self.COLOR_PRIMARIO),
+                    padding=60,
+                    alignment=ft.alignment.center
+                ),
+                margin=20,
+                elevation=5,
+                expand=True,
+            ),
+            expand=True,
+        )
+
+        self.page.add(
+            ft.Container(
+                content=ft.Column([header, self.body], expand=True, spacing=0),
+                bgcolor=self.COLOR_FONDO_CLARO,
+                expand=True,
+                padding=10,
+            )
+        )
+        self.page.update()
+
+        # Pintar al instante con el último listado conocido y revalidar después
+        if self.citas is not None:
+            self.render()
+        self.page.run_task(self.cargar_citas)
+        self.page.run_task(self.refrescar_edad)
+
+    def reanudar(self):
+        """Al volver a la vista desde la caché del router: revalida y reanuda el indicador."""
+        self.activa = True
+        if self.tabla is not None:
+            self.tabla.restaurar_scroll()
+        self.page.run_task(self.cargar_citas)
+        self.page.run_task(self.refrescar_edad)
+
+    def pausar(self):
+        """El router sale de la vista: detiene el indicador de antigüedad."""
+        self.activa = False
+
+    def render(self):
+        """Pinta la tabla de citas (o el mensaje vacío) dentro del cuerpo de la vista."""
+        # Si no hay citas (o nunca se pudieron cargar), mostrar mensaje
         if not self.citas:
+            self.tabla = None
+            if self.citas is None:
+                icono, mensaje = ft.Icons.CLOUD_OFF, "No se pudieron cargar las citas. Sin conexión con el servidor"
+            else:
+                icono, mensaje = ft.Icons.EVENT_BUSY, "No hay citas aprobadas"
             mensaje_vacio = ft.Container(
                 content=ft.Column([
-                    ft.Icon(ft.Icons.EVENT_BUSY, size=80, color=ft.Colors.GREY_400),
+                    ft.Icon(icono, size=80, color=ft.Colors.GREY_400),
                     ft.Text(
-                        "No hay citas aprobadas", 
+                        mensaje, 
                         size=18, 
                         weight=ft.FontWeight.W_500,
                         color=self.COLOR_TEXTO, 
@@ -75,131 +262,51 @@ class CitasView:
                 alignment=ft.alignment.center
             )
 
-            main_content = ft.Column([
-                header,
-                ft.Card(
-                    content=mensaje_vacio,
-                    margin=20,
-                    elevation=5,
-                    expand=True,
-                ),
-            ], expand=True)
-
-            self.page.add(
-                ft.Container(
-                    content=main_content,
-                    bgcolor=self.COLOR_FONDO_CLARO,
-                    expand=True,
-                    padding=10,
-                )
+            self.body.content = ft.Card(
+                content=mensaje_vacio,
+                margin=20,
+                elevation=5,
+                expand=True,
             )
             self.page.update()
             return
 
-        # Construir filas de la tabla
-        rows = []
-        for c in self.citas:
-            cita_id_key = c.get("cita_id") if c.get("cita_id") is not None else c.get("id")
-            paciente_id = c.get("usuario_paciente_id") or c.get("paciente_id")
-            
-            if cita_id_key is not None:
-                rows.append(ft.DataRow(
-                    cells=[
-                        ft.DataCell(ft.Text(
-                            str(cita_id_key), 
-                            font_family="Roboto", 
-                            color=self.COLOR_TEXTO,
-                            weight=ft.FontWeight.W_500
-                        )),
-                        ft.DataCell(ft.Text(
-                            c.get("paciente", "N/A"), 
-                            font_family="Roboto", 
-                            color=self.COLOR_TEXTO,
-                            weight=ft.FontWeight.W_500
-                        )),
-                        ft.DataCell(ft.Text(
-                            f"{c.get('fecha_cita', 'N/A')} {c.get('hora_cita', '')}".strip(), 
-                            font_family="Roboto", 
-                            color=self.COLOR_TEXTO
-                        )),
-                        ft.DataCell(ft.Text(
-                            c.get("especialidad", "N/A"), 
-                            font_family="Roboto", 
-                            color=self.COLOR_TEXTO,
-                            italic=True
-                        )),
-                        ft.DataCell(ft.ElevatedButton(
-                            "Atender", 
-                            icon=ft.Icons.MEDICAL_SERVICES, 
-                            bgcolor=self.COLOR_EXITO, 
-                            color=ft.Colors.WHITE,
-                            style=ft.ButtonStyle(
-                                shape=ft.RoundedRectangleBorder(radius=8)
-                            ),
-                            on_click=lambda e, cid=cita_id_key, pid=paciente_id: self.on_navigate("atencion", cita_id=cid, paciente_id=pid)
-                        ))
-                    ]
-                ))
-
-        # Tabla de citas
-        table = ft.DataTable(
+        # Tabla de citas virtualizada: al revalidar solo cambian las celdas visibles distintas
+        self.tabla = VirtualTable(
             columns=[
-                ft.DataColumn(ft.Text("ID", weight=ft.FontWeight.BOLD, font_family="Roboto", color=self.COLOR_TEXTO)),
-                ft.DataColumn(ft.Text("Paciente", weight=ft.FontWeight.BOLD, font_family="Roboto", color=self.COLOR_TEXTO)),
-                ft.DataColumn(ft.Text("Fecha/Hora", weight=ft.FontWeight.BOLD, font_family="Roboto", color=self.COLOR_TEXTO)),
-                ft.DataColumn(ft.Text("Especialidad", weight=ft.FontWeight.BOLD, font_family="Roboto", color=self.COLOR_TEXTO)),
-                ft.DataColumn(ft.Text("Acción", weight=ft.FontWeight.BOLD, font_family="Roboto", color=self.COLOR_TEXTO)),
+                VirtualColumn("ID", width=70, text_kwargs=estilos.TEXTO_DESTACADO),
+                VirtualColumn("Paciente", expand=3, text_kwargs=estilos.TEXTO_DESTACADO),
+                VirtualColumn("Fecha/Hora", expand=2, text_kwargs=estilos.TEXTO),
+                VirtualColumn("Especialidad", expand=2, text_kwargs=estilos.TEXTO_ITALICA),
+                VirtualColumn("Acción", width=140, build=self._boton_atender),
             ],
-            rows=rows,
-            border=ft.border.all(1, ft.Colors.GREY_300),
-            border_radius=10,
-            heading_row_color=ft.Colors.with_opacity(0.1, self.COLOR_PRIMARIO),
-            column_spacing=20,
-            data_row_max_height=80,
-            width=None,
+            values_fn=self._valores,
+            key_fn=self._clave,
+            row_height=64,
+            header_color=self.COLOR_PRIMARIO,
+            text_color=self.COLOR_TEXTO,
         )
+        self.tabla.set_data([c for c in self.citas if self._clave(c) is not None])
 
         # 🎯 Contenedor de tabla expandible
         tabla_container = ft.Container(
-            content=ft.Column(
-                [table],
-                scroll=ft.ScrollMode.AUTO,
-                expand=True,
-                horizontal_alignment=ft.CrossAxisAlignment.STRETCH
-            ),
+            content=self.tabla.control,
             expand=True,
             padding=10,
             alignment=ft.alignment.top_center,
         )
 
-        # Contenido principal
-        main_content = ft.Column(
-            [
-                header,
-                ft.Card(
-                    content=ft.Container(
-                        content=ft.Column(
-                            [tabla_container],
-                            expand=True,
-                        ), 
-                        padding=25,
-                        expand=True,
-                    ), 
-                    margin=20,
-                    elevation=5,
+        self.body.content = ft.Card(
+            content=ft.Container(
+                content=ft.Column(
+                    [tabla_container],
                     expand=True,
-                ),
-            ],
-            expand=True,
-            spacing=0,
-        )
-
-        self.page.add(
-            ft.Container(
-                content=main_content,
-                bgcolor=self.COLOR_FONDO_CLARO,
+                ), 
+                padding=25,
                 expand=True,
-                padding=10,
-            )
+            ), 
+            margin=20,
+            elevation=5,
+            expand=True,
         )
         self.page.update()
\ No newline at end of file
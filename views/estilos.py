@@ -0,0 +1,97 @@
+"""
+Estilos y constructores de controles compartidos por las vistas.
+
+Los objetos de estilo (bordes, rellenos, formas de botón) se crean una sola vez
+y se comparten entre todos los controles que los usan: Flet los serializa como
+atributos, así que una misma instancia sirve para muchos controles. Los
+controles en sí no se pueden compartir (cada uno tiene un único padre), por eso
+aquí hay funciones que los construyen con el mínimo de propiedades y de
+controles intermedios. La fuente llega por el tema de la página (tema()) y no
+se repite en cada ft.Text.
+"""
+import flet as ft
+
+FUENTE = "Roboto"
+
+COLOR_PRIMARIO = "#007BFF"
+COLOR_TEXTO = "#343A40"
+COLOR_EXITO = "#28A745"
+COLOR_ERROR = "#DC3545"
+
+# Propiedades de texto por uso (para ft.Text(**TEXTO) o VirtualColumn(text_kwargs=...))
+TEXTO = {"color": COLOR_TEXTO}
+TEXTO_DESTACADO = {"color": COLOR_TEXTO, "weight": ft.FontWeight.W_500}
+TEXTO_ITALICA = {"color": COLOR_TEXTO, "italic": True}
+
+# Objetos de estilo compartidos
+BORDE_GRIS = ft.border.all(1, ft.Colors.GREY_300)
+BORDE_FILA = ft.border.only(bottom=ft.BorderSide(1, ft.Colors.GREY_300))
+PADDING_FILA = ft.padding.symmetric(horizontal=10)
+PADDING_ETIQUETA = ft.padding.symmetric(horizontal=10, vertical=5)
+FORMA_BOTON = ft.ButtonStyle(shape=ft.RoundedRectangleBorder(radius=8))
+FONDO_ENCABEZADO_IMAGEN = ft.Colors.with_opacity(0.05, COLOR_PRIMARIO)
+
+
+def tema() -> ft.Theme:
+    """Tema de la aplicación: fuente por defecto de todos los textos."""
+    return ft.Theme(font_family=FUENTE)
+
+
+def color_confianza(confianza: float) -> str:
+    if confianza > 0.7:
+        return COLOR_EXITO
+    if confianza > 0.5:
+        return COLOR_PRIMARIO
+    return COLOR_ERROR
+
+
+def fila_deteccion(clase: str, confianza: float) -> ft.Row:
+    """Fila de una detección: punto de color, clase y confianza alineada a la derecha."""
+    color = color_confianza(confianza)
+    return ft.Row([
+        ft.Icon(ft.Icons.CIRCLE, size=8, color=color),
+        ft.Text(clase, color=COLOR_TEXTO, weight=ft.FontWeight.W_500, size=14, expand=True),
+        ft.Text(f"{confianza:.1%}", color=color, weight=ft.FontWeight.BOLD, size=13),
+    ])
+
+
+def tarjeta_imagen(nombre: str, detecciones: list) -> ft.Container:
+    """Tarjeta con el nombre de una imagen, su número de detecciones y la lista de detecciones."""
+    if detecciones:
+        filas = [fila_deteccion(f"{d.get('class', 'N/A')}", d.get("confidence", 0.0)) for d in detecciones]
+    else:
+        filas = [
+            ft.Text("No se detectaron objetos en esta imagen", color=ft.Colors.GREY_600, italic=True, size=13)
+        ]
+    return ft.Container(
+        content=ft.Column([
+            ft.Container(
+                content=ft.Row([
+                    ft.Icon(ft.Icons.IMAGE, color=COLOR_PRIMARIO, size=20),
+                    ft.Text(nombre, weight=ft.FontWeight.BOLD, color=COLOR_PRIMARIO, size=15, expand=True),
+                    ft.Container(
+                        content=ft.Text(
+                            f"{len(detecciones)} detecciones",
+                            color=ft.Colors.WHITE,
+                            size=12,
+                            weight=ft.FontWeight.BOLD
+                        ),
+                        padding=PADDING_ETIQUETA,
+                        bgcolor=COLOR_PRIMARIO,
+                        border_radius=15
+                    )
+                ]),
+                padding=10,
+                bgcolor=FONDO_ENCABEZADO_IMAGEN,
+            ),
+            ft.Container(
+                content=ft.Column(filas, spacing=12),
+                padding=15,
+            )
+        ]),
+        bgcolor=ft.Colors.WHITE,
+        border=BORDE_GRIS,
+        border_radius=10,
+        padding=5,
+        margin=5,
+    )
@@ -0,0 +1,72 @@
+import re
+import unicodedata
+from bisect import bisect_left
+
+
+def normalizar(texto) -> str:
+    """Minúsculas y sin tildes, para comparar 'Pérez' con 'perez'."""
+    texto = unicodedata.normalize("NFKD", str(texto or ""))
+    return "".join(c for c in texto if not unicodedata.combining(c)).casefold()
+
+
+def tokens(texto) -> list:
+    return [t for t in re.split(r"[^0-9a-z]+", normalizar(texto)) if t]
+
+
+class _IndicePrefijos:
+    """Claves ordenadas con sus posiciones, para buscar por prefijo con bisect."""
+
+    def __init__(self):
+        self._postings = {}
+        self._claves = []
+
+    def agregar(self, clave: str, posicion: int):
+        self._postings.setdefault(clave, []).append(posicion)
+
+    def cerrar(self):
+        self._claves = sorted(self._postings)
+
+    def prefijo(self, prefijo: str) -> set:
+        resultado = set()
+        i = bisect_left(self._claves, prefijo)
+        while i < len(self._claves) and self._claves[i].startswith(prefijo):
+            resultado.update(self._postings[self._claves[i]])
+            i += 1
+        return resultado
+
+
+class HistorialIndex:
+    """
+    Índice en memoria sobre los registros del historial ya cargados.
+    - Nombre del paciente: por palabras y prefijos, sin distinguir tildes ni mayúsculas;
+      cada palabra buscada debe ser prefijo de alguna palabra del nombre.
+    - Identificación: por prefijo; la coincidencia exacta también lo es, así
+      que '123' trae tanto '123' como '12345'.
+    Los resultados conservan el orden original de los registros.
+    """
+
+    def __init__(self, registros=()):
+        self.registros = list(registros)
+        self._nombres = _IndicePrefijos()
+        self._ids = _IndicePrefijos()
+        for posicion, r in enumerate(self.registros):
+            for t in set(tokens(r.get("paciente"))):
+                self._nombres.agregar(t, posicion)
+            identificacion = normalizar(r.get("identificacion")).strip()
+            if identificacion:
+                self._ids.agregar(identificacion, posicion)
+        self._nombres.cerrar()
+        self._ids.cerrar()
+
+    def buscar(self, nombre: str = None, identificacion: str = None) -> list:
+        posiciones = None
+        for t in tokens(nombre):
+            encontrados = self._nombres.prefijo(t)
+            posiciones = encontrados if posiciones is None else posiciones & encontrados
+        identificacion = normalizar(identificacion).strip()
+        if identificacion:
+            encontrados = self._ids.prefijo(identificacion)
+            posiciones = encontrados if posiciones is None else posiciones & encontrados
+        if posiciones is None:
+            return self.registros
+        return [self.registros[p] for p in sorted(posiciones)]
@@ -1,7 +1,15 @@
+import asyncio
+from collections import deque
 from datetime import datetime
 import flet as ft
+from .historial_index import HistorialIndex, normalizar
+from . import estilos
+from .virtual_table import VirtualColumn, VirtualTable
 
 class HistorialView:
+    # Registros por página (la precarga tras el login pide la primera con el mismo tamaño)
+    PAGE_SIZE = 100
+
     def __init__(self, page: ft.Page, api_client, on_navigate):
         self.page = page
         self.api = api_client
@@ -26,7 +34,8 @@ class HistorialView:
             border_radius=10,
             text_style=self.TEXT_INPUT_STYLE,
             label_style=self.LABEL_INPUT_STYLE,
-            prefix_icon=ft.Icons.PERSON_OUTLINE
+            prefix_icon=ft.Icons.PERSON_OUTLINE,
+            on_change=self.on_busqueda_change
         )
         
         self.search_id = ft.TextField(
@@ -37,74 +46,211 @@ class HistorialView:
             border_radius=10,
             text_style=self.TEXT_INPUT_STYLE,
             label_style=self.LABEL_INPUT_STYLE,
-            prefix_icon=ft.Icons.BADGE
+            prefix_icon=ft.Icons.BADGE,
+            on_change=self.on_busqueda_change
         )
         
-        # 🎯 MEJORA: Tabla con expand=True y mejor espaciado
-        self.table = ft.DataTable(
+        # 🎯 Tabla virtualizada: solo se crean las filas visibles
+        self.tabla = VirtualTable(
             columns=[
-                ft.DataColumn(ft.Text("Paciente", weight=ft.FontWeight.BOLD, font_family="Roboto", color=self.COLOR_TEXTO)),
-                ft.DataColumn(ft.Text("Cédula", weight=ft.FontWeight.BOLD, font_family="Roboto", color=self.COLOR_TEXTO)),
-                ft.DataColumn(ft.Text("Fecha", weight=ft.FontWeight.BOLD, font_family="Roboto", color=self.COLOR_TEXTO)),
-                ft.DataColumn(ft.Text("Diagnóstico", weight=ft.FontWeight.BOLD, font_family="Roboto", color=self.COLOR_TEXTO)),
-                ft.DataColumn(ft.Text("Recomendaciones", weight=ft.FontWeight.BOLD, font_family="Roboto", color=self.COLOR_TEXTO)),
-                ft.DataColumn(ft.Text("Sistema", weight=ft.FontWeight.BOLD, font_family="Roboto", color=self.COLOR_TEXTO)),
-                ft.DataColumn(ft.Text("Especialidad", weight=ft.FontWeight.BOLD, font_family="Roboto", color=self.COLOR_TEXTO)),
+                VirtualColumn("Paciente", expand=2, text_kwargs=estilos.TEXTO_DESTACADO),
+                VirtualColumn("Cédula", width=110, text_kwargs=estilos.TEXTO),
+                VirtualColumn("Fecha", width=130, text_kwargs=estilos.TEXTO),
+                VirtualColumn("Diagnóstico", expand=3, text_kwargs=estilos.TEXTO_ITALICA),
+                VirtualColumn("Recomendaciones", expand=3, text_kwargs=estilos.TEXTO_ITALICA),
+                VirtualColumn("Sistema", expand=2, text_kwargs=estilos.TEXTO_ITALICA),
+                VirtualColumn("Especialidad", expand=2, text_kwargs=estilos.TEXTO_ITALICA),
             ],
-            rows=[],
-            border=ft.border.all(1, ft.Colors.GREY_300),
-            border_radius=10,
-            heading_row_color=ft.Colors.with_opacity(0.1, self.COLOR_PRIMARIO),
-            column_spacing=20,  # Reducido para mejor distribución
-            sort_column_index=2,
-            sort_ascending=False,
-            data_row_max_height=100,
-            width=None,  # Permite que la tabla use todo el ancho disponible
+            values_fn=self._valores,
+            key_fn=self._clave,
+            row_height=64,
+            header_color=self.COLOR_PRIMARIO,
+            text_color=self.COLOR_TEXTO,
+            on_near_end=lambda: self.page.run_task(self.cargar_siguiente),
+            on_near_start=lambda: self.page.run_task(self.cargar_anterior),
         )
-        
-        # Inicializa la tabla con todos los registros al cargar
-        self.buscar(None) 
 
-    def buscar(self, e):
-        """Busca el historial médico basado en los campos de búsqueda."""
-        historial = self.api.get_historial_medico(self.search_name.value, self.search_id.value)
-        self.update_table(historial)
+        # Paginación: máximo de registros que se mantienen cargados
+        self.MAX_FILAS_RESIDENTES = 1000
+        self._paginas = deque()   # páginas cargadas: {"page", "items"}
+        self._cursores = {}       # número de página -> cursor, para volver a pedir páginas descartadas
+        self._siguiente = None    # (page, cursor) de la próxima página, o None si no hay más
+        self._cargando = False
+        self._busqueda = 0        # se incrementa en cada búsqueda para descartar respuestas viejas
+        self._consulta = ("", "") # (nombre, identificación) con los que se pidieron las páginas cargadas
 
-    def update_table(self, data):
-        """Actualiza las filas de la tabla con los datos proporcionados."""
-        rows = []
-        
+        # Búsqueda local mientras se escribe
+        self.DEBOUNCE_SEGUNDOS = 0.15
+        self._indice = HistorialIndex()
+        self._filtro_gen = 0
+
+
+    async def buscar(self, e):
+        """Busca el historial médico basado en los campos de búsqueda (primera página)."""
+        self._busqueda += 1
+        self._consulta = self._campos()
+        self._paginas.clear()
+        self._cursores = {1: None}
+        self._siguiente = (1, None)
+        self._cargando = False
+        self.tabla.scroll_to_top()
+        await self.cargar_siguiente()
+
+    async def _pedir_pagina(self, numero: int):
+        nombre, identificacion = self._consulta
+        return await self.api.get_historial_medico(
+            nombre,
+            identificacion,
+            page=numero,
+            limit=self.PAGE_SIZE,
+            cursor=self._cursores.get(numero)
+        )
+
+    def _residentes(self) -> int:
+        return sum(len(p["items"]) for p in self._paginas)
+
+    async def cargar_siguiente(self):
+        """Carga la página siguiente al final de la tabla, descartando las primeras si se supera el límite."""
+        if self._cargando or self._siguiente is None:
+            return
+        busqueda = self._busqueda
+        numero, _ = self._siguiente
+        self._cargando = True
+        try:
+            pagina = await self._pedir_pagina(numero)
+        finally:
+            if busqueda == self._busqueda:
+                self._cargando = False
+        if busqueda != self._busqueda or "error" in pagina:
+            return
+        if self._paginas and [self._clave(h) for h in pagina["items"]] == [self._clave(h) for h in self._paginas[-1]["items"]]:
+            # El backend repitió la página anterior: ignora la paginación, no hay más
+            print(f"[HISTORIAL] La página {numero} repite la anterior; fin del historial")
+            self._siguiente = None
+            return
+
+        self._paginas.append({"page": numero, "items": pagina["items"]})
+        if pagina["has_more"]:
+            self._cursores[numero + 1] = pagina["next_cursor"]
+            self._siguiente = (numero + 1, pagina["next_cursor"])
+        else:
+            self._siguiente = None
+        descartados = 0
+        while len(self._paginas) > 1 and self._residentes() > self.MAX_FILAS_RESIDENTES:
+            descartados += len(self._paginas.popleft()["items"])
+        self._refrescar_tabla(descartados)
+
+    async def cargar_anterior(self):
+        """Vuelve a cargar la página previa a la primera residente al desplazarse hacia arriba."""
+        if self._cargando or not self._paginas or self._paginas[0]["page"] <= 1:
+            return
+        busqueda = self._busqueda
+        numero = self._paginas[0]["page"] - 1
+        self._cargando = True
+        try:
+            pagina = await self._pedir_pagina(numero)
+        finally:
+            if busqueda == self._busqueda:
+                self._cargando = False
+        if busqueda != self._busqueda or "error" in pagina:
+            return
+
+        self._paginas.appendleft({"page": numero, "items": pagina["items"]})
+        while len(self._paginas) > 1 and self._residentes() > self.MAX_FILAS_RESIDENTES:
+            descartada = self._paginas.pop()
+            self._siguiente = (descartada["page"], self._cursores.get(descartada["page"]))
+        self._refrescar_tabla(-len(pagina["items"]))
+
+    def _refrescar_tabla(self, desplazamiento: int = 0):
+        residentes = [h for p in self._paginas for h in p["items"]]
+        self._indice = HistorialIndex(residentes)
+        nombre, identificacion = self._campos()
+        if (nombre, identificacion) != self._consulta:
+            # Hay un filtro local activo sobre los registros cargados
+            self.update_table(self._indice.buscar(nombre, identificacion))
+        else:
+            self.update_table(residentes, desplazamiento)
+
+    def _campos(self):
+        return (self.search_name.value or "").strip(), (self.search_id.value or "").strip()
+
+    def _conjunto_completo(self) -> bool:
+        """True si están cargadas todas las páginas de la consulta actual."""
+        return self._siguiente is None and (not self._paginas or self._paginas[0]["page"] == 1)
+
+    def _es_refinamiento(self, nombre: str, identificacion: str) -> bool:
+        """True si la búsqueda solo restringe la consulta con la que se cargaron los registros."""
+        base_nombre, base_id = self._consulta
+        return (
+            normalizar(nombre).startswith(normalizar(base_nombre))
+            and normalizar(identificacion).startswith(normalizar(base_id))
+        )
+
+    def on_busqueda_change(self, e):
+        """Filtra mientras se escribe, esperando a que el usuario haga una pausa."""
+        self._filtro_gen += 1
+        self.page.run_task(self._filtrar_con_espera, self._filtro_gen)
+
+    async def _filtrar_con_espera(self, gen: int):
+        await asyncio.sleep(self.DEBOUNCE_SEGUNDOS)
+        if gen != self._filtro_gen:
+            return
+        nombre, identificacion = self._campos()
+
+        # Resultado inmediato con lo que ya está cargado
+        self.tabla.scroll_to_top()
+        self.update_table(self._indice.buscar(nombre, identificacion))
+
+        # Solo se consulta al servidor si lo cargado no contiene todos los posibles resultados
+        if not (self._conjunto_completo() and self._es_refinamiento(nombre, identificacion)):
+            await self.buscar(None)
+
+    def _clave(self, h):
+        """Identifica la atención de la fila para que conserve su fila al desplazarse."""
+        return (h.get("identificacion"), h.get("fecha"), h.get("hora_cita"))
+
+    def _valores(self, h):
+        """Textos que se muestran en cada celda de la fila."""
         # Función auxiliar para truncar texto
         def format_text(text, max_len=60):
             t = h.get(text, "") or ""
             return t[:max_len] + "..." if len(t) > max_len else t
 
-        for h in data:
-            fecha_str = h.get("fecha")
-            hora_str = h.get("hora_cita")
-            
-            fecha_display = "N/A"
-
-            if fecha_str:
-                try:
-                    fecha_obj = datetime.strptime(fecha_str, "%Y-%m-%d")
-                    fecha_formateada = fecha_obj.strftime("%d/%m/%Y")
-                    hora_formateada = hora_str[:5] if hora_str else ""
-                    fecha_display = f"{fecha_formateada} {hora_formateada}".strip()
-                except ValueError:
-                    fecha_display = f"{fecha_str} {hora_str}"
-            
-            rows.append(ft.DataRow(cells=[
-                ft.DataCell(ft.Text(h.get("paciente", "N/A"), font_family="Roboto", color=self.COLOR_TEXTO, weight=ft.FontWeight.W_500)),
-                ft.DataCell(ft.Text(h.get("identificacion", "N/A"), font_family="Roboto", color=self.COLOR_TEXTO)),
-                ft.DataCell(ft.Text(fecha_display, font_family="Roboto", color=self.COLOR_TEXTO)), 
-                ft.DataCell(ft.Text(format_text("diagnostico"), font_family="Roboto", color=self.COLOR_TEXTO, italic=True)),
-                ft.DataCell(ft.Text(format_text("recomendaciones"), font_family="Roboto", color=self.COLOR_TEXTO, italic=True)),
-                ft.DataCell(ft.Text(format_text("sistema"), font_family="Roboto", color=self.COLOR_TEXTO, italic=True)),
-                ft.DataCell(ft.Text(format_text("especialidad"), font_family="Roboto", color=self.COLOR_TEXTO, italic=True)),
-            ]))
-        self.table.rows = rows
-        self.page.update()
+        fecha_str = h.get("fecha")
+        hora_str = h.get("hora_cita")
+        
+        fecha_display = "N/A"
+
+        if fecha_str:
+            try:
+                fecha_obj = datetime.strptime(fecha_str, "%Y-%m-%d")
+                fecha_formateada = fecha_obj.strftime("%d/%m/%Y")
+                hora_formateada = hora_str[:5] if hora_str else ""
+                fecha_display = f"{fecha_formateada} {hora_formateada}".strip()
+            except ValueError:
+                fecha_display = f"{fecha_str} {hora_str}"
+
+        return (
+            h.get("paciente", "N/A"),
+            h.get("identificacion", "N/A"),
+            fecha_display,
+            format_text("diagnostico"),
+            format_text("recomendaciones"),
+            format_text("sistema"),
+            format_text("especialidad"),
+        )
+
+    def update_table(self, data, desplazamiento: int = 0):
+        """
+        Actualiza los registros de la tabla con los datos proporcionados.
+        Solo se materializan las filas visibles y solo cambian las celdas distintas.
+        `desplazamiento`: registros quitados (+) o añadidos (-) al principio de la lista.
+        """
+        return self.tabla.set_data(data, desplazamiento)
+
+    def reanudar(self):
+        """Al volver a la vista desde la caché del router: misma búsqueda y posición."""
+        self.tabla.restaurar_scroll()
 
     def show(self):
         self.page.clean()
@@ -149,12 +295,7 @@ class HistorialView:
 
         # 🎯 MEJORA CLAVE: Contenedor de tabla que ocupa todo el espacio
         tabla_container = ft.Container(
-            content=ft.Column(
-                [self.table],
-                scroll=ft.ScrollMode.AUTO,
-                expand=True,
-                horizontal_alignment=ft.CrossAxisAlignment.STRETCH  # Estira horizontalmente
-            ),
+            content=self.tabla.control,
             expand=True,  # Ocupa todo el espacio vertical disponible
             padding=10,
             alignment=ft.alignment.top_center,
@@ -205,4 +346,7 @@ class HistorialView:
                 padding=10,
             )
         )
-        self.page.update()
\ No newline at end of file
+        self.page.update()
+
+        # Inicializa la tabla con todos los registros sin bloquear el primer pintado
+        self.page.run_task(self.buscar, None)
\ No newline at end of file
@@ -62,7 +62,7 @@ class LoginView:
             on_click=self.do_login
         )
 
-    def do_login(self, e):
+    async def do_login(self, e):
         # Validación de campos vacíos
         if not self.username.value or not self.password.value:
             self.login_status.value = "Por favor complete todos los campos"
@@ -76,8 +76,8 @@ class LoginView:
         self.login_status.color = self.COLOR_PRIMARIO
         self.page.update()
 
-        # Realizar login
-        result = self.api.login(self.username.value, self.password.value)
+        # Realizar login sin bloquear el bucle de eventos
+        result = await self.api.login(self.username.value, self.password.value)
         
         # Habilitar botón nuevamente
         self.login_btn.disabled = False
@@ -12,11 +12,53 @@ class MainView:
         self.COLOR_FONDO_CLARO = "#F8F9FA"
         self.COLOR_SALIR = "#DC3545"
 
+    async def cargar_perfil(self):
+        """Obtiene el perfil en segundo plano y actualiza los textos del encabezado."""
+        profile = await self.api.get_profile()
+        datos = profile.get("datos_especificos", {})
+
+        self.nombre_text.value = f"Dr. {profile.get('nombre', 'N/A')} {profile.get('apellido', 'N/A')}"
+        self.especialidad_text.value = datos.get('especialidad', 'N/A')
+        self.edad_text.value = f"{profile.get('edad', 'N/A')} años"
+        self.ubicacion_text.value = profile.get('ubicacion', 'N/A')
+        self.page.update()
+
+    async def cerrar_sesion(self, e):
+        """Cancela la precarga, olvida la sesión y vuelve al login."""
+        await self.api.logout()
+        self.on_navigate("login")
+
     def show(self):
         self.page.clean()
 
-        profile = self.api.get_profile()
-        datos = profile.get("datos_especificos", {})
+        # Textos del perfil: se muestran de inmediato y se completan al llegar los datos
+        self.nombre_text = ft.Text(
+            "Cargando...", 
+            size=28, 
+            weight=ft.FontWeight.W_900, 
+            color=self.COLOR_TEXTO, 
+            font_family="Roboto"
+        )
+        self.especialidad_text = ft.Text(
+            "", 
+            size=18, 
+            weight=ft.FontWeight.W_500,
+            color=self.COLOR_PRIMARIO, 
+            font_family="Roboto",
+            italic=True
+        )
+        self.edad_text = ft.Text(
+            "...", 
+            size=16, 
+            color=self.COLOR_TEXTO,
+            font_family="Roboto"
+        )
+        self.ubicacion_text = ft.Text(
+            "...", 
+            size=16, 
+            color=self.COLOR_TEXTO,
+            font_family="Roboto"
+        )
 
         # 🎯 Header con ícono de médico y nombre
         header = ft.Container(
@@ -27,21 +69,8 @@ class MainView:
                     color=self.COLOR_PRIMARIO
                 ),
                 ft.Column([
-                    ft.Text(
-                        f"Dr. {profile.get('nombre', 'N/A')} {profile.get('apellido', 'N/A')}", 
-                        size=28, 
-                        weight=ft.FontWeight.W_900, 
-                        color=self.COLOR_TEXTO, 
-                        font_family="Roboto"
-                    ),
-                    ft.Text(
-                        datos.get('especialidad', 'N/A'), 
-                        size=18, 
-                        weight=ft.FontWeight.W_500,
-                        color=self.COLOR_PRIMARIO, 
-                        font_family="Roboto",
-                        italic=True
-                    ),
+                    self.nombre_text,
+                    self.especialidad_text,
                 ], 
                 spacing=5,
                 alignment=ft.MainAxisAlignment.CENTER),
@@ -75,12 +104,7 @@ class MainView:
                         color=self.COLOR_TEXTO,
                         font_family="Roboto"
                     ),
-                    ft.Text(
-                        f"{profile.get('edad', 'N/A')} años", 
-                        size=16, 
-                        color=self.COLOR_TEXTO,
-                        font_family="Roboto"
-                    ),
+                    self.edad_text,
                 ], spacing=10),
                 
                 # Ubicación
@@ -93,12 +117,7 @@ class MainView:
                         color=self.COLOR_TEXTO,
                         font_family="Roboto"
                     ),
-                    ft.Text(
-                        profile.get('ubicacion', 'N/A'), 
-                        size=16, 
-                        color=self.COLOR_TEXTO,
-                        font_family="Roboto"
-                    ),
+                    self.ubicacion_text,
                 ], spacing=10),
                 
             ], 
@@ -162,7 +181,7 @@ class MainView:
                         style=ft.ButtonStyle(
                             shape=ft.RoundedRectangleBorder(radius=10),
                         ),
-                        on_click=lambda e: self.page.window.destroy()
+                        on_click=self.cerrar_sesion
                     )
                 ], 
                 alignment=ft.MainAxisAlignment.CENTER),
@@ -204,4 +223,7 @@ class MainView:
                 expand=True
             )
         )
-        self.page.update()
\ No newline at end of file
+        self.page.update()
+
+        # Cargar el perfil sin bloquear el primer pintado
+        self.page.run_task(self.cargar_perfil)
\ No newline at end of file
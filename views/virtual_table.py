@@ -0,0 +1,240 @@
+import math
+import flet as ft
+
+from . import estilos
+
+
+class VirtualColumn:
+    """
+    Definición de una columna de VirtualTable.
+    - width: ancho fijo en píxeles; si es None la columna se reparte el espacio con `expand`.
+    - text_kwargs: estilo de los ft.Text de la columna (font_family, color, italic...).
+    - build: si se indica, función sin argumentos que crea el control de la celda
+      (por ejemplo un botón); el valor de la celda se asigna a su `data`.
+    """
+
+    def __init__(self, titulo: str, width: int = None, expand: int = 1, text_kwargs: dict = None, build=None):
+        self.titulo = titulo
+        self.width = width
+        self.expand = expand
+        self.text_kwargs = text_kwargs or {}
+        self.build = build
+
+
+class VirtualTable:
+    """
+    Tabla con filas virtualizadas para listados grandes.
+
+    Solo se materializan como controles de Flet las filas visibles más un margen
+    (`overscan`) por arriba y por abajo; el resto del alto se simula con dos
+    espaciadores. Al desplazarse, las mismas filas se reciclan asignándoles los
+    valores de otros registros, y solo se envían a la interfaz las celdas cuyo
+    valor cambió.
+
+    `values_fn(registro)` devuelve la tupla de valores de las celdas, en el orden
+    de las columnas. Las celdas ft.Text reciben el valor en `value`; las creadas
+    con `VirtualColumn.build` lo reciben en `data`.
+
+    Con `key_fn(registro)` las filas se reciclan por clave y no por posición: un
+    registro que sigue en la ventana conserva su fila y sus celdas aunque cambie
+    de lugar, y solo las filas de los registros que entran se reasignan.
+    """
+
+    def __init__(
+        self,
+        columns,
+        values_fn,
+        key_fn=None,
+        row_height: int = 56,
+        overscan: int = 10,
+        viewport_rows: int = 15,
+        header_color: str = "#007BFF",
+        text_color: str = "#343A40",
+        on_near_end=None,
+        on_near_start=None,
+    ):
+        self.columns = columns
+        self.values_fn = values_fn
+        self.key_fn = key_fn
+        self.row_height = row_height
+        self.overscan = overscan
+        self.viewport_rows = viewport_rows
+        self.on_near_end = on_near_end
+        self.on_near_start = on_near_start
+
+        self._data = []
+        self._pixels = 0.0
+        self._first = 0
+        self._count = 0
+        self._pool = []  # filas recicladas: {"row", "cells", "values", "key"}
+
+        self.header = ft.Container(
+            content=ft.Row(
+                [
+                    self._celda(
+                        col,
+                        ft.Text(col.titulo, weight=ft.FontWeight.BOLD, color=text_color)
+                    )
+                    for col in columns
+                ],
+                spacing=20,
+            ),
+            height=self.row_height,
+            padding=estilos.PADDING_FILA,
+            bgcolor=ft.Colors.with_opacity(0.1, header_color),
+            border_radius=ft.border_radius.only(top_left=10, top_right=10),
+        )
+        self._top = ft.Container(height=0)
+        self._bottom = ft.Container(height=0)
+        self.body = ft.Column(
+            [self._top, self._bottom],
+            spacing=0,
+            scroll=ft.ScrollMode.AUTO,
+            expand=True,
+            on_scroll=self._on_scroll,
+            on_scroll_interval=50,
+        )
+        self.control = ft.Container(
+            content=ft.Column([self.header, self.body], spacing=0, expand=True),
+            border=estilos.BORDE_GRIS,
+            border_radius=10,
+            expand=True,
+        )
+
+    def _celda(self, col: VirtualColumn, contenido):
+        return ft.Container(
+            content=contenido,
+            width=col.width,
+            expand=col.expand if col.width is None else None,
+            alignment=ft.alignment.center_left,
+        )
+
+    def _nueva_fila(self):
+        cells = []
+        for col in self.columns:
+            if col.build is not None:
+                cells.append(col.build())
+            else:
+                cells.append(ft.Text("", max_lines=2, overflow=ft.TextOverflow.ELLIPSIS, **col.text_kwargs))
+        row = ft.Container(
+            content=ft.Row([self._celda(col, c) for col, c in zip(self.columns, cells)], spacing=20),
+            height=self.row_height,
+            padding=estilos.PADDING_FILA,
+            border=estilos.BORDE_FILA,
+        )
+        return {"row": row, "cells": cells, "values": None, "key": None}
+
+    def _asignar(self, slot, valores) -> int:
+        """Asigna los valores de un registro a una fila reciclada; retorna las celdas cambiadas."""
+        previos = slot["values"]
+        cambiadas = 0
+        for i, valor in enumerate(valores):
+            if previos is not None and previos[i] == valor:
+                continue
+            celda = slot["cells"][i]
+            if isinstance(celda, ft.Text):
+                celda.value = valor
+            else:
+                celda.data = valor
+            cambiadas += 1
+        slot["values"] = valores
+        return cambiadas
+
+    def _render_por_posicion(self, registros) -> int:
+        while len(self._pool) < len(registros):
+            slot = self._nueva_fila()
+            self._pool.append(slot)
+            self.body.controls.insert(len(self.body.controls) - 1, slot["row"])
+
+        cambiadas = 0
+        for i, slot in enumerate(self._pool):
+            if i < len(registros):
+                cambiadas += self._asignar(slot, self.values_fn(registros[i]))
+                slot["row"].visible = True
+            else:
+                slot["row"].visible = False
+        return cambiadas
+
+    def _render_por_clave(self, registros) -> int:
+        por_clave = {slot["key"]: slot for slot in self._pool if slot["key"] is not None}
+        claves = [self.key_fn(r) for r in registros]
+        filas = [por_clave.pop(clave, None) for clave in claves]
+        ocupadas = {id(slot) for slot in filas if slot is not None}
+        libres = [slot for slot in self._pool if id(slot) not in ocupadas]
+
+        cambiadas = 0
+        for i, registro in enumerate(registros):
+            slot = filas[i]
+            if slot is None:
+                if libres:
+                    slot = libres.pop(0)
+                else:
+                    slot = self._nueva_fila()
+                    self._pool.append(slot)
+                slot["key"] = claves[i]
+                filas[i] = slot
+            cambiadas += self._asignar(slot, self.values_fn(registro))
+            slot["row"].visible = True
+        for slot in libres:
+            slot["row"].visible = False
+
+        # Las filas siguen el orden de los registros; Flet solo mueve las que cambiaron de lugar
+        self.body.controls = [self._top, *(s["row"] for s in filas), *(s["row"] for s in libres), self._bottom]
+        return cambiadas
+
+    def _render(self) -> dict:
+        n = len(self._data)
+        ventana = self.viewport_rows + 2 * self.overscan
+        first = int(self._pixels // self.row_height) - self.overscan
+        first = max(0, min(first, n - ventana))
+        count = min(ventana, n - first)
+
+        if self.key_fn is not None:
+            cambiadas = self._render_por_clave(self._data[first:first + count])
+        else:
+            cambiadas = self._render_por_posicion(self._data[first:first + count])
+
+        self._top.height = first * self.row_height
+        self._bottom.height = (n - first - count) * self.row_height
+        self._first = first
+        self._count = count
+        return {"filas_materializadas": count, "celdas_actualizadas": cambiadas}
+
+    def set_data(self, registros, desplazamiento: int = 0) -> dict:
+        """
+        Reemplaza los registros de la tabla.
+        `desplazamiento` es el número de registros quitados (positivo) o añadidos
+        (negativo) al principio de la lista, para mantener a la vista las mismas filas.
+        """
+        self._data = registros
+        if desplazamiento:
+            self._pixels = max(0.0, self._pixels - desplazamiento * self.row_height)
+        stats = self._render()
+        if self.body.page is not None:
+            self.body.update()
+            if desplazamiento:
+                self.body.scroll_to(offset=self._pixels, duration=0)
+        return stats
+
+    def restaurar_scroll(self):
+        """Vuelve a la posición de desplazamiento anterior tras volver a mostrar la tabla."""
+        if self._pixels and self.body.page is not None:
+            self.body.scroll_to(offset=self._pixels, duration=0)
+
+    def scroll_to_top(self):
+        self._pixels = 0.0
+        if self.body.page is not None:
+            self.body.scroll_to(offset=0, duration=0)
+
+    def _on_scroll(self, e: ft.OnScrollEvent):
+        self._pixels = e.pixels
+        if e.viewport_dimension:
+            self.viewport_rows = max(1, math.ceil(e.viewport_dimension / self.row_height))
+        self._render()
+        self.body.update()
+
+        n = len(self._data)
+        if self.on_near_end is not None and n and self._first + self._count >= n - self.overscan:
+            self.on_near_end()
+        elif self.on_near_start is not None and self._first == 0 and e.pixels <= e.min_scroll_extent + self.row_height:
+            self.on_near_start()